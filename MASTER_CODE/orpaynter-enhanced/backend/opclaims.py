@@ -5,7 +5,7 @@ Drone imagery analysis, roof damage detection, and automated claims processing.
 
 Features:
 - Visual Data Pipeline (drone image ingestion)
-- Computer Vision Damage Detection Model
+- Computer Vision Damage Detection Model (batched CPU inference, see opclaims_cv)
 - Claims Automation Workflow
 - Fraud Scoring
 - Cost Estimation
@@ -15,10 +15,14 @@ from flask import Blueprint, request, jsonify
 import uuid
 import hashlib
 import json
+import os
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 from enum import Enum
+from opclaims_cv import RoofDamageEngine, check_image_source, load_model
 
 # Create Blueprint
 opclaims_bp = Blueprint('opclaims', __name__, url_prefix='/api/opclaims')
@@ -76,6 +80,11 @@ def upload_inspection_images():
     if not images:
         return jsonify({"error": "images array is required"}), 400
     
+    for img in images:
+        error = check_image_source(img.get('url') or img.get('data') or '', cv_engine.image_hosts)
+        if error:
+            return jsonify({"error": error}), 400
+    
     inspection = {
         "inspection_id": inspection_id,
         "status": InspectionStatus.PENDING.value,
@@ -114,18 +123,37 @@ def upload_inspection_images():
         "message": "Inspection images uploaded successfully"
     }), 201
 
-def trigger_cv_analysis(inspection_id: str):
-    """Trigger computer vision analysis on inspection images"""
+def trigger_cv_analysis(inspection_id: str) -> bool:
+    """
+    Queue computer vision analysis of an inspection's images. Returns False
+    when an analysis of that inspection is already queued or running.
+    """
     inspection = inspections_db.get(inspection_id)
     if not inspection:
-        return
-    
-    inspection['status'] = InspectionStatus.IN_PROGRESS.value
-    inspection['analysis_started'] = datetime.now().isoformat()
-    
-    # Mock CV analysis - in production, call ML model
-    # This would integrate with PyTorch/TensorFlow model
-    pass
+        return False
+    
+    with cv_lock:
+        if inspection.get('analysis_queued'):
+            return False
+        inspection['analysis_queued'] = True
+        inspection['status'] = InspectionStatus.IN_PROGRESS.value
+        inspection['analysis_started'] = datetime.now().isoformat()
+    
+    # Inference runs off the request thread; uploads return immediately
+    cv_executor.submit(run_cv_analysis_safely, inspection)
+    return True
+
+def run_cv_analysis_safely(inspection: dict):
+    """Background wrapper: a failed analysis marks the inspection failed"""
+    try:
+        run_cv_analysis(inspection)
+    except Exception as e:
+        inspection['status'] = InspectionStatus.FAILED.value
+        inspection['analysis_error'] = str(e)
+        print(f"[OPCLAIMS] CV analysis failed for {inspection['inspection_id']}: {e}")
+    finally:
+        with cv_lock:
+            inspection['analysis_queued'] = False
 
 # ============================================================================
 # ROOF CV MODEL (Task 3.4)
@@ -147,81 +175,128 @@ DAMAGE_TYPES = [
     "soft_spot"
 ]
 
-@opclaims_bp.route('/cv/analyze', methods=['POST'])
-def analyze_roof_images():
-    """Run CV model on inspection images"""
-    data = request.get_json()
-    
-    inspection_id = data.get('inspection_id')
-    
-    if not inspection_id:
-        return jsonify({"error": "inspection_id is required"}), 400
+# CV inference engine. OPCLAIMS_CV_MODEL_PATH selects an ONNX model (run
+# with ONNX Runtime on CPU); unset, the untrained NumPy reference model is
+# used and every result is flagged production_model: false.
+CV_MODEL_PATH = os.environ.get('OPCLAIMS_CV_MODEL_PATH', '')
+CV_BATCH_SIZE = int(os.environ.get('OPCLAIMS_CV_BATCH_SIZE', 16))
+CV_TILE_SIZE = int(os.environ.get('OPCLAIMS_CV_TILE_SIZE', 512))
+CV_TILE_OVERLAP = int(os.environ.get('OPCLAIMS_CV_TILE_OVERLAP', 64))
+CV_INPUT_SIZE = int(os.environ.get('OPCLAIMS_CV_INPUT_SIZE', 224))
+CV_THRESHOLD = float(os.environ.get('OPCLAIMS_CV_THRESHOLD', 0.5))
+CV_THREADS = int(os.environ.get('OPCLAIMS_CV_THREADS', 0))
+# Comma-separated storage hosts image URLs may be fetched from; with none
+# configured only base64 / data-URI images are accepted
+CV_IMAGE_HOSTS = [host.strip() for host in os.environ.get('OPCLAIMS_CV_IMAGE_HOSTS', '').split(',') if host.strip()]
+
+cv_engine = RoofDamageEngine(
+    load_model(CV_MODEL_PATH, DAMAGE_TYPES, CV_INPUT_SIZE, CV_THREADS),
+    batch_size=CV_BATCH_SIZE,
+    tile_size=CV_TILE_SIZE,
+    overlap=CV_TILE_OVERLAP,
+    input_size=CV_INPUT_SIZE,
+    threshold=CV_THRESHOLD,
+    image_hosts=CV_IMAGE_HOSTS
+)
+if not cv_engine.model.production:
+    print("[OPCLAIMS] OPCLAIMS_CV_MODEL_PATH is not set: using the untrained reference CV model; "
+          "damage results are flagged as non-production")
+
+# One background analysis at a time; the engine batches within it
+cv_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="opclaims-cv")
+# Guards analysis_queued so an inspection is never analysed twice at once
+cv_lock = threading.Lock()
+
+def run_cv_analysis(inspection: dict) -> dict:
+    """Run the CV engine over every inspection image and store the results"""
+    inspection['status'] = InspectionStatus.IN_PROGRESS.value
+    inspection['analysis_started'] = datetime.now().isoformat()
     
-    inspection = inspections_db.get(inspection_id)
-    if not inspection:
-        return jsonify({"error": "Inspection not found"}), 404
+    images = inspection['images']
+    results, stats = cv_engine.analyze([image['url'] or '' for image in images])
     
-    # Run analysis on each image
     analysis_results = []
     total_damage_score = 0
     
-    for image in inspection['images']:
-        # Mock CV analysis result
-        # In production: call ML model (PyTorch/TensorFlow)
-        num_damages = random.randint(0, 4)
-        damages = random.sample(DAMAGE_TYPES, num_damages)
-        
-        image_analysis = {
-            "image_id": image['image_id'],
-            "damage_detected": len(damages) > 0,
-            "damages": damages,
-            "confidence_scores": {
-                d: round(random.uniform(0.75, 0.99), 3) 
-                for d in damages
-            },
-            "bounding_boxes": [
-                {
-                    "damage_type": d,
-                    "x": random.randint(10, 80),
-                    "y": random.randint(10, 80),
-                    "width": random.randint(5, 20),
-                    "height": random.randint(5, 20)
-                }
-                for d in damages
-            ],
-            "overall_confidence": round(random.uniform(0.85, 0.98), 3),
-            "analyzed_at": datetime.now().isoformat()
-        }
-        
-        analysis_results.append(image_analysis)
+    for image, result in zip(images, results):
+        image['status'] = "failed" if result.get('error') else "analyzed"
+        analysis_results.append({"image_id": image['image_id'], **result})
         
         # Calculate damage score
-        if damages:
-            damage_weight = len(damages) * 0.15
+        if result['damages']:
+            damage_weight = len(result['damages']) * 0.15
             total_damage_score += min(damage_weight, 0.6)
     
-    # Calculate overall assessment
-    overall_severity = calculate_severity(total_damage_score, len(inspection['images']))
+    # Calculate overall assessment over the images that could be analyzed
+    overall_severity = calculate_severity(total_damage_score, stats['images'])
     
     # Store analysis results
     inspection['analysis_results'] = analysis_results
-    inspection['cv_model_version'] = 'orpaynter-roof-cv-v2.1'
+    inspection['cv_model_version'] = cv_engine.model.version
+    inspection['cv_production_model'] = cv_engine.model.production
     inspection['analysis_completed'] = datetime.now().isoformat()
-    inspection['status'] = InspectionStatus.COMPLETED.value
+    inspection['analysis_stats'] = stats
+    inspection['status'] = (InspectionStatus.FAILED.value if images and not stats['images']
+                            else InspectionStatus.COMPLETED.value)
     inspection['damage_summary'] = {
         "overall_severity": overall_severity.value,
         "damage_score": round(total_damage_score, 3),
-        "images_analyzed": len(analysis_results),
-        "damages_found": sum(1 for r in analysis_results if r['damage_detected'])
+        "images_analyzed": stats['images'],
+        "images_failed": stats['failed_images'],
+        "damages_found": sum(1 for r in analysis_results if r['damage_detected']),
+        # False for the untrained reference model: not a real assessment
+        "production_model": cv_engine.model.production
     }
+    return inspection
+
+@opclaims_bp.route('/cv/analyze', methods=['POST'])
+def analyze_roof_images():
+    """Run CV model on inspection images"""
+    data = request.get_json()
+    
+    inspection_id = data.get('inspection_id')
+    
+    if not inspection_id:
+        return jsonify({"error": "inspection_id is required"}), 400
+    
+    inspection = inspections_db.get(inspection_id)
+    if not inspection:
+        return jsonify({"error": "Inspection not found"}), 404
+    
+    queued = trigger_cv_analysis(inspection_id)
+    
+    return jsonify({
+        "inspection_id": inspection_id,
+        "status": inspection['status'],
+        "message": "CV analysis queued" if queued else "CV analysis already in progress",
+        "results_url": f"{opclaims_bp.url_prefix}/inspection/{inspection_id}"
+    }), 202
+
+@opclaims_bp.route('/inspection/<inspection_id>', methods=['GET'])
+def get_inspection(inspection_id: str):
+    """Inspection status and, once complete, its CV analysis results"""
+    inspection = inspections_db.get(inspection_id)
+    if not inspection:
+        return jsonify({"error": "Inspection not found"}), 404
     
     return jsonify({
         "inspection_id": inspection_id,
-        "analysis_results": analysis_results,
-        "damage_summary": inspection['damage_summary'],
-        "model_version": inspection['cv_model_version']
+        "status": inspection['status'],
+        "images": inspection['images'],
+        "metadata": inspection['metadata'],
+        "analysis_results": inspection.get('analysis_results'),
+        "damage_summary": inspection.get('damage_summary'),
+        "model_version": inspection.get('cv_model_version'),
+        "production_model": inspection.get('cv_production_model'),
+        "throughput": inspection.get('analysis_stats'),
+        "analysis_error": inspection.get('analysis_error')
     })
 
+@opclaims_bp.route('/cv/model', methods=['GET'])
+def cv_model_info():
+    """CV model version, tiling settings and images/sec per batch size"""
+    return jsonify(cv_engine.info())
+
 def calculate_severity(damage_score: float, image_count: int) -> DamageSeverity:
     """Calculate overall damage severity based on score"""
     avg_score = damage_score / max(image_count, 1)
@@ -393,8 +468,11 @@ def run_claim_assessment(claim_id: str, inspection_id: str):
         },
         "assessed_at": datetime.now().isoformat(),
         "assessed_by": "OPCLAIMS-CV-Model",
-        "model_version": "assessment-v1.2"
+        "model_version": "assessment-v1.2",
+        "cv_production_model": damage_summary.get('production_model', False)
     }
+    if not assessment['cv_production_model']:
+        assessment['warning'] = "Damage severity comes from a non-production CV model; verify manually"
     
     claim['assessment'] = assessment
     claim['estimated_damage'] = round(final_estimate, 2)
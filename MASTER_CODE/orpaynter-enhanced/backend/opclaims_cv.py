@@ -0,0 +1,520 @@
+"""
+OPCLAIMS CV - Batched Roof Damage Inference
+===========================================
+CPU inference engine behind /api/opclaims/cv/analyze.
+
+Features:
+- Decodes base64 / data-URI inspection images with Pillow, plus http(s)
+  images from allowlisted storage hosts only (JPEG frames are downscaled
+  during decode when the model input allows it)
+- Cuts large drone frames into overlapping tiles
+- Stacks tiles from many images into fixed-size NumPy batches
+- Pluggable models: ONNX Runtime on the CPU execution provider, or a
+  deterministic NumPy reference model for tests and benchmarks (flagged
+  as non-production in every result)
+- Merges adjacent positive tiles into per-damage bounding boxes
+- Records images/sec and tiles/sec per batch size
+
+Benchmark (synthetic drone frames):
+    python opclaims_cv.py bench --images 16 --batch-sizes 1 4 8 16 32
+    python opclaims_cv.py bench --model roof_damage.onnx
+"""
+
+import argparse
+import base64
+import binascii
+import io
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+# Largest encoded image accepted from a URL or base64 payload
+MAX_IMAGE_BYTES = 64 * 1024 * 1024
+FETCH_TIMEOUT_SECONDS = 30
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+# ============================================================================
+# DECODE & TILE
+# ============================================================================
+
+def check_image_source(source: str, allowed_hosts: Collection[str] = ()) -> Optional[str]:
+    """Why an image URL may not be fetched (host not in allowed_hosts), or None"""
+    if not source.startswith(('http://', 'https://')):
+        return None
+    try:
+        host = (urlsplit(source).hostname or '').lower()
+    except ValueError:
+        return "image URL is not valid"
+    if host not in allowed_hosts:
+        return f"image host {host or '(none)'} is not an allowed storage host"
+    return None
+
+
+class _AllowlistRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def __init__(self, allowed_hosts: Collection[str]):
+        self.allowed_hosts = allowed_hosts
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        error = check_image_source(newurl, self.allowed_hosts)
+        if error or not newurl.startswith(('http://', 'https://')):
+            raise ValueError(f"image redirect refused: {error or newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def load_image_bytes(source: str, allowed_hosts: Collection[str] = ()) -> bytes:
+    """
+    Encoded bytes of a data URI, bare base64 string or http(s) URL. URLs
+    (and their redirects) are only fetched from hosts in allowed_hosts.
+    """
+    if source.startswith(('http://', 'https://')):
+        error = check_image_source(source, allowed_hosts)
+        if error:
+            raise ValueError(error)
+        opener = urllib.request.build_opener(_AllowlistRedirectHandler(allowed_hosts))
+        with opener.open(source, timeout=FETCH_TIMEOUT_SECONDS) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        if source.startswith('data:'):
+            header, _, source = source.partition(',')
+            if ';base64' not in header:
+                raise ValueError("only base64 data URIs are supported")
+        try:
+            data = base64.b64decode(source, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("image is neither an http(s) URL nor base64 data")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes")
+    return data
+
+
+def tile_starts(length: int, tile: int, stride: int) -> List[int]:
+    """Tile offsets covering [0, length); the last tile is flush with the edge"""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile + 1, stride))
+    if starts[-1] != length - tile:
+        starts.append(length - tile)
+    return starts
+
+
+class PreparedImage:
+    """Model-sized tiles of one image plus where each tile came from"""
+
+    __slots__ = ('tiles', 'rows', 'cols', 'boxes', 'size')
+
+    def __init__(self, tiles: np.ndarray, rows: int, cols: int, boxes: np.ndarray, size: Tuple[int, int]):
+        self.tiles = tiles    # (T, S, S, 3) uint8, row-major over the tile grid
+        self.rows = rows
+        self.cols = cols
+        self.boxes = boxes    # (T, 4) x, y, width, height as fractions of the image
+        self.size = size      # original (width, height)
+
+
+def prepare_image(source, tile_size: int, input_size: int, overlap: int,
+                  allowed_hosts: Collection[str] = ()) -> PreparedImage:
+    """
+    Decode and tile one image. Tiles cover tile_size source pixels and are
+    resized to input_size; the whole frame is scaled once rather than per
+    tile. Frames smaller than a tile become a single (stretched) tile.
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    else:
+        image = Image.open(io.BytesIO(load_image_bytes(source, allowed_hosts)))
+    width, height = image.size
+    scale = input_size / tile_size
+    target = (max(input_size, round(width * scale)), max(input_size, round(height * scale)))
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly
+    image.draft('RGB', target)
+    image = image.convert('RGB')
+    if image.size != target:
+        image = image.resize(target, Image.BILINEAR)
+    pixels = np.asarray(image)
+
+    stride = max(1, round((tile_size - overlap) * scale))
+    xs = tile_starts(target[0], input_size, stride)
+    ys = tile_starts(target[1], input_size, stride)
+    tiles = np.stack([pixels[y:y + input_size, x:x + input_size] for y in ys for x in xs])
+    boxes = np.array([(x / target[0], y / target[1], input_size / target[0], input_size / target[1])
+                      for y in ys for x in xs], dtype=np.float32)
+    return PreparedImage(tiles, len(ys), len(xs), boxes, (width, height))
+
+
+# ============================================================================
+# MODELS
+# ============================================================================
+
+class ReferenceModel:
+    """
+    Deterministic NumPy model with the production interface: average-pooled
+    tile -> 64 ReLU units -> one sigmoid per damage type, from fixed seeded
+    weights. It exercises the full pipeline in tests and benchmarks; it is
+    not a trained detector.
+    """
+
+    layout = "NCHW"
+    fixed_batch = None
+    # Untrained: results are marked non-production
+    production = False
+    POOLED = 28
+
+    def __init__(self, labels: Sequence[str], input_size: int = 224, hidden: int = 64, seed: int = 2024):
+        self.labels = list(labels)
+        self.input_size = input_size
+        self.version = "orpaynter-roof-cv-reference-numpy-1"
+        rng = np.random.default_rng(seed)
+        features = 3 * self.POOLED * self.POOLED
+        self.w1 = (rng.standard_normal((features, hidden)) / np.sqrt(features)).astype(np.float32)
+        self.b1 = np.zeros(hidden, dtype=np.float32)
+        self.w2 = (rng.standard_normal((hidden, len(self.labels))) / np.sqrt(hidden)).astype(np.float32)
+        # Biased towards "no damage" so clean tiles stay under the threshold
+        self.b2 = np.full(len(self.labels), -2.0, dtype=np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """(N, 3, S, S) normalised float32 -> (N, labels) probabilities"""
+        n = batch.shape[0]
+        factor = self.input_size // self.POOLED
+        side = factor * self.POOLED
+        pooled = batch[:, :, :side, :side].reshape(n, 3, self.POOLED, factor, self.POOLED, factor).mean(axis=(3, 5))
+        hidden = np.maximum(pooled.reshape(n, -1) @ self.w1 + self.b1, 0)
+        return 1.0 / (1.0 + np.exp(-(hidden @ self.w2 + self.b2)))
+
+
+class OnnxModel:
+    """
+    ONNX Runtime session on the CPU execution provider. The model takes one
+    image batch (NCHW or NHWC, ImageNet-normalised float32) and returns
+    per-label probabilities, or logits when its metadata has output=logits.
+    Labels come from a comma-separated 'labels' metadata entry if present.
+    """
+
+    production = True
+
+    def __init__(self, path: str, labels: Sequence[str], threads: int = 0):
+        import onnxruntime  # optional: only needed when an ONNX model is configured
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        shape = model_input.shape
+        self.input_name = model_input.name
+        self.layout = "NHWC" if shape[-1] == 3 else "NCHW"
+        self.fixed_batch = shape[0] if isinstance(shape[0], int) else None
+        side = shape[1] if self.layout == "NHWC" else shape[2]
+        self.input_size = side if isinstance(side, int) else None
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.labels = metadata["labels"].split(",") if metadata.get("labels") else list(labels)
+        self.logits = metadata.get("output") == "logits"
+        self.version = f"onnx:{os.path.basename(path)}"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        scores = self.session.run(None, {self.input_name: batch})[0]
+        if self.logits:
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+
+def load_model(path: str, labels: Sequence[str], input_size: int = 224, threads: int = 0):
+    """ONNX model at path, or the reference model when path is empty"""
+    if path:
+        return OnnxModel(path, labels, threads)
+    return ReferenceModel(labels, input_size)
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def tile_components(hits: np.ndarray, rows: int, cols: int) -> List[List[int]]:
+    """4-connected groups of positive tiles on the tile grid"""
+    grid = hits.reshape(rows, cols)
+    seen = np.zeros_like(grid, dtype=bool)
+    components = []
+    for row, col in zip(*np.nonzero(grid)):
+        if seen[row, col]:
+            continue
+        seen[row, col] = True
+        stack = [(row, col)]
+        members = []
+        while stack:
+            r, c = stack.pop()
+            members.append(r * cols + c)
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols and grid[nr, nc] and not seen[nr, nc]:
+                    seen[nr, nc] = True
+                    stack.append((nr, nc))
+        components.append(members)
+    return components
+
+
+class RoofDamageEngine:
+    """
+    analyze(sources) decodes and tiles images on a small thread pool (a few
+    images ahead of inference), runs the model over fixed-size tile batches
+    and returns one result per source in the analysis_results schema.
+    """
+
+    def __init__(self, model, batch_size: int = 16, tile_size: int = 512, overlap: int = 64,
+                 input_size: int = 224, threshold: float = 0.5, decode_workers: int = 2,
+                 image_hosts: Collection[str] = ()):
+        self.model = model
+        self.labels = list(model.labels)
+        self.batch_size = model.fixed_batch or max(1, batch_size)
+        self.tile_size = tile_size
+        self.overlap = min(overlap, tile_size - 1)
+        self.input_size = model.input_size or input_size
+        self.threshold = threshold
+        self.decode_workers = max(1, decode_workers)
+        # Storage hosts image URLs may be fetched from; others are refused
+        self.image_hosts = frozenset(host.lower() for host in image_hosts)
+        self._lock = threading.Lock()
+        self.throughput: Dict[int, dict] = {}
+
+    def _prepared(self, sources: Sequence) -> Iterator[Tuple[int, Optional[PreparedImage], Optional[str]]]:
+        """(index, tiles, error) in source order, decoding a few images ahead"""
+        def prepare(source):
+            try:
+                return prepare_image(source, self.tile_size, self.input_size, self.overlap,
+                                     self.image_hosts), None
+            except Exception as e:
+                return None, str(e) or e.__class__.__name__
+
+        ahead = self.decode_workers * 2
+        with ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="opclaims-decode") as pool:
+            pending = deque()
+            for index, source in enumerate(sources):
+                pending.append((index, pool.submit(prepare, source)))
+                if len(pending) > ahead:
+                    index_done, future = pending.popleft()
+                    yield (index_done, *future.result())
+            while pending:
+                index_done, future = pending.popleft()
+                yield (index_done, *future.result())
+
+    def _normalise(self, tiles: np.ndarray) -> np.ndarray:
+        batch = tiles.astype(np.float32)
+        batch *= 1.0 / 255.0
+        batch -= IMAGENET_MEAN
+        batch /= IMAGENET_STD
+        if self.model.layout == "NCHW":
+            batch = batch.transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch)
+
+    def analyze(self, sources: Sequence, batch_size: Optional[int] = None) -> Tuple[List[dict], dict]:
+        """Per-source analysis results plus throughput stats for this call"""
+        batch_size = self.model.fixed_batch or batch_size or self.batch_size
+        side = self.input_size
+        buffer = np.empty((batch_size, side, side, 3), dtype=np.uint8)
+        owners: List[Tuple[int, int]] = []
+        images: Dict[int, PreparedImage] = {}
+        scores: Dict[int, np.ndarray] = {}
+        errors: Dict[int, str] = {}
+        counters = {"batches": 0, "tiles": 0, "inference_seconds": 0.0}
+
+        def flush():
+            count = len(owners)
+            batch = buffer if self.model.fixed_batch else buffer[:count]
+            if self.model.fixed_batch and count < batch_size:
+                buffer[count:] = 0
+            started = time.perf_counter()
+            predicted = self.model.predict(self._normalise(batch))
+            counters["inference_seconds"] += time.perf_counter() - started
+            for row, (index, tile) in enumerate(owners):
+                scores[index][tile] = predicted[row]
+            counters["batches"] += 1
+            counters["tiles"] += count
+            owners.clear()
+
+        started = time.perf_counter()
+        for index, prepared, error in self._prepared(sources):
+            if error:
+                errors[index] = error
+                continue
+            images[index] = prepared
+            scores[index] = np.zeros((len(prepared.tiles), len(self.labels)), dtype=np.float32)
+            for tile in range(len(prepared.tiles)):
+                buffer[len(owners)] = prepared.tiles[tile]
+                owners.append((index, tile))
+                if len(owners) == batch_size:
+                    flush()
+            # Tiles are copied into the batch buffer; drop the decoded frame
+            prepared.tiles = None
+        if owners:
+            flush()
+        seconds = time.perf_counter() - started
+
+        analyzed_at = datetime.now().isoformat()
+        results = []
+        for index in range(len(sources)):
+            if index in errors:
+                results.append({
+                    "damage_detected": False, "damages": [], "confidence_scores": {}, "bounding_boxes": [],
+                    "overall_confidence": 0.0, "tiles": 0, "error": errors[index], "analyzed_at": analyzed_at
+                })
+            else:
+                results.append({**self._detections(images[index], scores[index]), "analyzed_at": analyzed_at})
+
+        stats = {
+            "batch_size": batch_size,
+            "images": len(sources) - len(errors),
+            "failed_images": len(errors),
+            "tiles": counters["tiles"],
+            "batches": counters["batches"],
+            "seconds": round(seconds, 4),
+            "inference_seconds": round(counters["inference_seconds"], 4),
+            "images_per_second": round((len(sources) - len(errors)) / seconds, 2) if seconds else None,
+            "tiles_per_second": round(counters["tiles"] / seconds, 1) if seconds else None
+        }
+        self._record(stats)
+        return results, stats
+
+    def _detections(self, prepared: PreparedImage, scores: np.ndarray) -> dict:
+        """Tile scores -> damages, confidences and merged bounding boxes (percent of image)"""
+        hits = scores >= self.threshold
+        damages = []
+        confidence_scores = {}
+        bounding_boxes = []
+        for label_index in np.nonzero(hits.any(axis=0))[0]:
+            label = self.labels[label_index]
+            label_scores = scores[:, label_index]
+            damages.append(label)
+            confidence_scores[label] = round(float(label_scores.max()), 3)
+            for members in tile_components(hits[:, label_index], prepared.rows, prepared.cols):
+                boxes = prepared.boxes[members]
+                x0, y0 = boxes[:, 0].min(), boxes[:, 1].min()
+                x1 = min(1.0, float((boxes[:, 0] + boxes[:, 2]).max()))
+                y1 = min(1.0, float((boxes[:, 1] + boxes[:, 3]).max()))
+                bounding_boxes.append({
+                    "damage_type": label,
+                    "x": round(float(x0) * 100, 1),
+                    "y": round(float(y0) * 100, 1),
+                    "width": round((x1 - float(x0)) * 100, 1),
+                    "height": round((y1 - float(y0)) * 100, 1),
+                    "confidence": round(float(label_scores[members].max()), 3),
+                    "tiles": len(members)
+                })
+        return {
+            "damage_detected": bool(damages),
+            "damages": damages,
+            "confidence_scores": confidence_scores,
+            "bounding_boxes": bounding_boxes,
+            # How decisive the model was across every tile and label
+            "overall_confidence": round(float(np.maximum(scores, 1 - scores).mean()), 3),
+            "tiles": len(scores),
+            "image_size": {"width": prepared.size[0], "height": prepared.size[1]}
+        }
+
+    def _record(self, stats: dict):
+        with self._lock:
+            totals = self.throughput.setdefault(stats["batch_size"], {"runs": 0, "images": 0, "tiles": 0,
+                                                                       "seconds": 0.0})
+            totals["runs"] += 1
+            totals["images"] += stats["images"]
+            totals["tiles"] += stats["tiles"]
+            totals["seconds"] += stats["seconds"]
+
+    def info(self) -> dict:
+        with self._lock:
+            throughput = {
+                str(size): {
+                    **totals,
+                    "seconds": round(totals["seconds"], 4),
+                    "images_per_second": round(totals["images"] / totals["seconds"], 2) if totals["seconds"] else None,
+                    "tiles_per_second": round(totals["tiles"] / totals["seconds"], 1) if totals["seconds"] else None
+                }
+                for size, totals in sorted(self.throughput.items())
+            }
+        return {
+            "model_version": self.model.version,
+            "production_model": self.model.production,
+            "labels": self.labels,
+            "batch_size": self.batch_size,
+            "tile_size": self.tile_size,
+            "tile_overlap": self.overlap,
+            "input_size": self.input_size,
+            "threshold": self.threshold,
+            "throughput_by_batch_size": throughput
+        }
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def synthetic_frames(count: int, width: int, height: int, seed: int = 3) -> List[str]:
+    """Base64 JPEG drone-like frames (shingle texture plus noise)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    ys, xs = np.mgrid[0:height, 0:width]
+    texture = ((xs // 40 + ys // 25) % 2 * 40 + 90).astype(np.int16)
+    for _ in range(count):
+        noise = rng.integers(-25, 25, size=(height, width, 3), dtype=np.int16)
+        pixels = np.clip(texture[..., None] + noise, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+        frames.append(base64.b64encode(buffer.getvalue()).decode())
+    return frames
+
+
+def bench(engine: RoofDamageEngine, frames: List[str], batch_sizes: Iterable[int]) -> List[dict]:
+    """analyze() the same frames once per batch size (after one warm-up run)"""
+    engine.analyze(frames[:1], batch_size=1)
+    rows = []
+    for batch_size in batch_sizes:
+        _, stats = engine.analyze(frames, batch_size=batch_size)
+        rows.append(stats)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OPCLAIMS roof damage inference tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    command = sub.add_parser("bench", help="images/sec per batch size on synthetic drone frames")
+    command.add_argument("--model", default="", help="ONNX model path (default: NumPy reference model)")
+    command.add_argument("--images", type=int, default=16)
+    command.add_argument("--width", type=int, default=4000)
+    command.add_argument("--height", type=int, default=3000)
+    command.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    command.add_argument("--tile-size", type=int, default=512)
+    command.add_argument("--input-size", type=int, default=224)
+    command.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    command.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    from opclaims import DAMAGE_TYPES
+
+    model = load_model(args.model, DAMAGE_TYPES, args.input_size, args.threads)
+    engine = RoofDamageEngine(model, tile_size=args.tile_size, input_size=args.input_size)
+    frames = synthetic_frames(args.images, args.width, args.height)
+    rows = bench(engine, frames, args.batch_sizes)
+    if args.json:
+        print(json.dumps({"model_version": model.version, "frame": [args.width, args.height], "results": rows}))
+        return
+    print(f"model {model.version}, {args.images} frames of {args.width}x{args.height}, "
+          f"{rows[0]['tiles'] // max(1, rows[0]['images'])} tiles/frame")
+    print(f"{'batch':>6} {'images/s':>10} {'tiles/s':>10} {'infer_s':>9} {'total_s':>9}")
+    for row in rows:
+        print(f"{row['batch_size']:>6} {row['images_per_second']:>10} {row['tiles_per_second']:>10} "
+              f"{row['inference_seconds']:>9} {row['seconds']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,13 +12,35 @@ Features:
 """
 
 from flask import Blueprint, request, jsonify
+import atexit
+import base64
+import binascii
 import uuid
 import hashlib
 import json
 import re
+import os
+import ipaddress
+import random
+import threading
+import time
+import zlib
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from enum import Enum
+from opsec_index import CorrelationIndex, IncidentListIndex, IoCSearchIndex, parse_ip_networks
+from opsec_pipeline import CorrelationPipeline, PipelineFull
+from opsec_shard import ShardedCorrelator
+from opsec_syslog import SyslogListener
+from opsec_logstore import LogStore, parse_timestamp
+from opsec_expiry import TimingWheel
+from opsec_graph import IoCGraph
+from opsec_feeds import (FEED_KEY_ENV_PREFIX, FeedPoller, check_feed_endpoint, ingest_in_batches,
+                         iter_feed_indicators)
+from opsec_persist import OpsecStore
+from opsec_retrohunt import RetroHunter, build_hunt_index, match_segment
+from opsec_rules import RuleEngine, validate_rule
 
 # Create Blueprint
 opsec_bp = Blueprint('opsec', __name__, url_prefix='/api/opsec')
@@ -36,6 +58,7 @@ class ThreatSeverity(Enum):
 
 class IoCType(Enum):
     IP_ADDRESS = "ip"
+    IP_RANGE = "ip_range"
     DOMAIN = "domain"
     URL = "url"
     FILE_HASH = "file_hash"
@@ -55,12 +78,172 @@ cti_feeds_db: Dict[str, dict] = {}
 # IoC Database
 ioc_db: Dict[str, dict] = {}
 
-# Internal Logs (simulated)
-internal_logs_db: List[dict] = []
+# Internal Logs: hourly segments, evicted by age or approximate size
+LOG_RETENTION_HOURS = float(os.environ.get('OPSEC_LOG_RETENTION_HOURS', 72))
+LOG_MAX_BYTES = int(os.environ.get('OPSEC_LOG_MAX_BYTES', 256 * 1024 * 1024))
+internal_logs_db = LogStore(retention_hours=LOG_RETENTION_HOURS, max_bytes=LOG_MAX_BYTES)
 
 # Incidents Database
 incidents_db: Dict[str, dict] = {}
 
+# Correlation indexes over active IoCs (kept in sync with ioc_db).
+# The Bloom prefilter grows past its capacity; OPSEC_BLOOM_FP_RATE=0 disables it.
+correlation_index = CorrelationIndex(
+    bloom_capacity=int(os.environ.get('OPSEC_BLOOM_CAPACITY', 100000)),
+    bloom_fp_rate=float(os.environ.get('OPSEC_BLOOM_FP_RATE', 0.01))
+)
+
+# Search indexes over every stored IoC (trigram, type, severity)
+ioc_search_index = IoCSearchIndex()
+
+# Campaign clusters from log co-occurrence and shared feed metadata
+ioc_graph = IoCGraph()
+
+# Guards ioc_db and the indexes/aggregates built over it
+ioc_lock = threading.RLock()
+
+# IoC expiry: feed IoCs live IOC_TTL_FEED_INTERVALS update intervals past
+# their last sighting; other sources use the default (0 = never expire)
+IOC_DEFAULT_TTL_HOURS = float(os.environ.get('OPSEC_IOC_DEFAULT_TTL_HOURS', 0))
+IOC_TTL_FEED_INTERVALS = float(os.environ.get('OPSEC_IOC_TTL_FEED_INTERVALS', 4))
+ioc_expiry_wheel = TimingWheel(tick_seconds=float(os.environ.get('OPSEC_IOC_EXPIRY_TICK_SECONDS', 60)))
+ioc_expiry_stats = {"last_sweep": None, "last_sweep_expired": 0}
+ioc_expired_by_source: Dict[str, int] = {}
+ioc_expiry_thread: Optional[threading.Thread] = None
+
+# Durable backing store (SQLite WAL); OPSEC_DB_PATH="" keeps OPSEC in memory only
+OPSEC_DB_PATH = os.environ.get('OPSEC_DB_PATH', 'backend/opsec.db')
+PERSIST_FLUSH_SECONDS = float(os.environ.get('OPSEC_PERSIST_FLUSH_SECONDS', 5))
+opsec_store: Optional[OpsecStore] = None
+
+def persist(table: str, key: str):
+    """Queue a changed ioc/incident/feed for the next write-behind flush"""
+    if opsec_store is not None:
+        opsec_store.mark(table, key)
+
+# ioc_id -> incident_id of its open/investigating incident (dedup index)
+open_incident_index: Dict[str, str] = {}
+
+ACTIVE_INCIDENT_STATUSES = (IncidentStatus.OPEN.value, IncidentStatus.INVESTIGATING.value)
+
+# Per-incident trigger bookkeeping: a reservoir sample of log ids plus
+# per-hour hit counts (oldest hours dropped beyond the bucket limit)
+TRIGGER_LOG_SAMPLE_SIZE = int(os.environ.get('OPSEC_TRIGGER_LOG_SAMPLE_SIZE', 50))
+TRIGGER_HOUR_BUCKETS = int(os.environ.get('OPSEC_TRIGGER_HOUR_BUCKETS', 168))
+
+# Incident ids by status / severity, newest first, for cursor-paged listing
+incident_list_index = IncidentListIndex()
+
+# Guards incidents_db / open_incident_index against concurrent correlation
+incident_lock = threading.RLock()
+
+# Dashboard aggregates, maintained on every mutation instead of recomputed
+RECENT_INCIDENTS_LIMIT = 10
+ioc_type_counts: Dict[str, int] = {}
+ioc_severity_counts: Dict[str, int] = {}
+incident_status_counts: Dict[str, int] = {}
+recent_incident_ids = deque(maxlen=RECENT_INCIDENTS_LIMIT)
+
+def bump_count(counts: Dict[str, int], key: str, delta: int = 1):
+    """Adjust an aggregate counter, dropping keys that reach zero"""
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+# Correlation pipeline settings (OPSEC_CORRELATION_WORKERS=0 correlates inline)
+CORRELATION_WORKERS = int(os.environ.get('OPSEC_CORRELATION_WORKERS', 2))
+# OPSEC_CORRELATION_PROCESSES>0 shards matching by source_ip across that
+# many worker processes instead of threads
+CORRELATION_PROCESSES = int(os.environ.get('OPSEC_CORRELATION_PROCESSES', 0))
+ASYNC_CORRELATION = CORRELATION_WORKERS > 0 or CORRELATION_PROCESSES > 0
+CORRELATION_QUEUE_SIZE = int(os.environ.get('OPSEC_CORRELATION_QUEUE_SIZE', 10000))
+# 'reject' answers 429 at once when the queue is full; 'block' waits first
+INGEST_BACKPRESSURE = os.environ.get('OPSEC_INGEST_BACKPRESSURE', 'reject')
+INGEST_BLOCK_TIMEOUT = float(os.environ.get('OPSEC_INGEST_BLOCK_TIMEOUT', 5))
+# Logs handed to the pipeline per submit by the streaming endpoint
+STREAM_SUBMIT_BATCH = 500
+
+if CORRELATION_PROCESSES > 0:
+    correlation_pipeline = ShardedCorrelator(
+        lambda log, matches: handle_correlation_matches(log, matches),
+        # Lock-free read: IoC changes are forwarded after ioc_db is updated
+        snapshot=lambda: [ioc for ioc in list(ioc_db.values()) if not ioc.get('false_positive')],
+        workers=CORRELATION_PROCESSES,
+        capacity=CORRELATION_QUEUE_SIZE
+    )
+else:
+    correlation_pipeline = CorrelationPipeline(
+        lambda log: check_correlation(log),
+        workers=CORRELATION_WORKERS,
+        capacity=CORRELATION_QUEUE_SIZE
+    )
+
+def index_ioc(ioc: dict):
+    """Add an IoC to the correlation index (and any worker replicas)"""
+    correlation_index.add(ioc)
+    if CORRELATION_PROCESSES > 0:
+        correlation_pipeline.update("add", ioc)
+
+def unindex_ioc(ioc: dict):
+    """Drop an IoC from the correlation index (and any worker replicas)"""
+    correlation_index.remove(ioc)
+    if CORRELATION_PROCESSES > 0:
+        correlation_pipeline.update("remove", ioc)
+
+# Optional syslog intake (RFC 5424/3164 over UDP and TCP); port 0 = disabled
+SYSLOG_ENABLED = os.environ.get('OPSEC_SYSLOG_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+SYSLOG_HOST = os.environ.get('OPSEC_SYSLOG_HOST', '127.0.0.1')
+SYSLOG_UDP_PORT = int(os.environ.get('OPSEC_SYSLOG_UDP_PORT', 5514))
+SYSLOG_TCP_PORT = int(os.environ.get('OPSEC_SYSLOG_TCP_PORT', 5514))
+SYSLOG_BATCH_SIZE = int(os.environ.get('OPSEC_SYSLOG_BATCH_SIZE', 500))
+SYSLOG_FLUSH_SECONDS = float(os.environ.get('OPSEC_SYSLOG_FLUSH_SECONDS', 0.5))
+# Batches waiting for the sink thread; beyond this new batches are dropped
+SYSLOG_MAX_PENDING_BATCHES = int(os.environ.get('OPSEC_SYSLOG_MAX_PENDING_BATCHES', 8))
+syslog_listener: Optional[SyslogListener] = None
+
+# Retro-hunt: newly ingested IoCs are also matched against retained logs
+RETROHUNT_ENABLED = os.environ.get('OPSEC_RETROHUNT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+def active_ioc(ioc_id: str) -> Optional[dict]:
+    """The IoC if it still exists and is not a false positive"""
+    ioc = ioc_db.get(ioc_id)
+    return ioc if ioc and not ioc.get('false_positive') else None
+
+retro_hunter = RetroHunter(
+    internal_logs_db,
+    get_ioc=active_ioc,
+    on_match=lambda log, ioc, correlation_type: create_incident(log, ioc, correlation_type, detection="retro_hunt")
+)
+
+# Sliding-window threshold rules evaluated on every correlated log
+DEFAULT_THRESHOLD_RULES = [
+    {
+        "rule_id": "ioc-burst-by-source",
+        "name": "Repeated high severity IoC hits from one source",
+        "group_by": "source_ip",
+        "threshold": 5,
+        "window_seconds": 300,
+        "min_ioc_severity": "high",
+        "severity": "critical"
+    },
+    {
+        "rule_id": "destination-fan-in",
+        "name": "IoC-matching destination contacted by many distinct sources",
+        "group_by": "destination_ip",
+        "distinct": "source_ip",
+        "threshold": 20,
+        "window_seconds": 300,
+        # Only IoC-matched traffic counts; ordinary busy servers never fire
+        "min_ioc_severity": "medium",
+        "severity": "high"
+    }
+]
+
+rule_engine = RuleEngine(DEFAULT_THRESHOLD_RULES,
+                         on_fire=lambda rule, evidence, log: create_threshold_incident(rule, evidence, log))
+
 # ============================================================================
 # CTI FEED MANAGEMENT (Task 3.1)
 # ============================================================================
@@ -107,16 +290,29 @@ def add_feed():
     feed_name = data.get('name')
     feed_type = data.get('type')  # api, csv, stix, taxii, rss
     endpoint = data.get('endpoint')
-    api_key = data.get('api_key')
+    api_key_env = data.get('api_key_env')
     
     if not feed_name or not feed_type:
         return jsonify({"error": "name and type are required"}), 400
+    if 'api_key' in data:
+        # Feed records are persisted; secrets stay in the environment
+        return jsonify({"error": f"api_key is not stored; set it in an environment variable named "
+                                 f"{FEED_KEY_ENV_PREFIX}* and pass its name as api_key_env"}), 400
+    if api_key_env and not api_key_env.startswith(FEED_KEY_ENV_PREFIX):
+        return jsonify({"error": f"api_key_env must start with {FEED_KEY_ENV_PREFIX}"}), 400
+    if endpoint:
+        error = check_feed_endpoint(endpoint, FEED_ALLOW_PRIVATE_HOSTS)
+        if error:
+            return jsonify({"error": error}), 400
     
     feed = {
         "feed_id": feed_id,
         "name": feed_name,
         "type": feed_type,
         "endpoint": endpoint,
+        "api_key_env": api_key_env,
+        "api_key_header": data.get('api_key_header'),
+        "csv_column": data.get('csv_column', 0),
         "enabled": data.get('enabled', True),
         "indicator_types": data.get('indicator_types', ["ip", "domain"]),
         "update_interval_hours": data.get('update_interval_hours', 6),
@@ -126,6 +322,7 @@ def add_feed():
     }
     
     cti_feeds_db[feed_id] = feed
+    persist('feeds', feed_id)
     
     return jsonify({
         "feed_id": feed_id,
@@ -140,6 +337,7 @@ def enable_feed(feed_id: str):
     
     cti_feeds_db[feed_id]['enabled'] = True
     cti_feeds_db[feed_id]['status'] = 'enabled'
+    persist('feeds', feed_id)
     
     return jsonify({"message": "Feed enabled", "feed_id": feed_id})
 
@@ -151,47 +349,262 @@ def disable_feed(feed_id: str):
     
     cti_feeds_db[feed_id]['enabled'] = False
     cti_feeds_db[feed_id]['status'] = 'disabled'
+    persist('feeds', feed_id)
     
     return jsonify({"message": "Feed disabled", "feed_id": feed_id})
 
+# Background polling of configured feeds (those with an endpoint)
+FEED_POLLING_ENABLED = os.environ.get('OPSEC_FEED_POLLING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+FEED_POLL_WORKERS = int(os.environ.get('OPSEC_FEED_POLL_WORKERS', 4))
+FEED_POLL_TIMEOUT_SECONDS = float(os.environ.get('OPSEC_FEED_POLL_TIMEOUT_SECONDS', 30))
+# Feed endpoints on loopback / private / link-local addresses are refused unless set
+FEED_ALLOW_PRIVATE_HOSTS = os.environ.get('OPSEC_FEED_ALLOW_PRIVATE_HOSTS', 'false').lower() in ('1', 'true', 'yes')
+
+def apply_feed_update(feed_id: str, feed: dict, added: List[str], removed: List[str], current: set):
+    """
+    Apply one poll's indicator diff: ingest additions (and retro-hunt them),
+    drop indicators the feed no longer lists, and keep the rest alive.
+    """
+    result = ingest_indicators(added, source=feed_id) if added else {"ioc_ids": []}
+    retro_hunt_new_iocs(result['ioc_ids'])
+
+    with ioc_lock:
+        for indicator in removed:
+            ioc = ioc_db.get(hashlib.sha256(indicator.encode()).hexdigest()[:16])
+            if ioc and ioc['source'] == feed_id:
+                remove_ioc(ioc['ioc_id'])
+
+        # Unchanged indicators only need their TTL pushed out once half of
+        # it has elapsed, so a steady feed does not rewrite every IoC per poll
+        ttl = resolve_ioc_ttl_hours(feed_id)
+        if not ttl:
+            return
+        horizon = (datetime.now() + timedelta(hours=ttl / 2)).isoformat()
+        added_ids = set(result['ioc_ids'])
+        for indicator in current:
+            ioc = ioc_db.get(hashlib.sha256(indicator.encode()).hexdigest()[:16])
+            if ioc and ioc['ioc_id'] not in added_ids and (ioc.get('expires_at') or '') < horizon:
+                ioc['last_seen'] = datetime.now().isoformat()
+                schedule_ioc_expiry(ioc, ttl)
+                persist('iocs', ioc['ioc_id'])
+
+feed_poller = FeedPoller(
+    get_feeds=lambda: cti_feeds_db,
+    on_update=apply_feed_update,
+    on_saved=lambda feed_id: persist('feeds', feed_id),
+    max_workers=FEED_POLL_WORKERS,
+    timeout=FEED_POLL_TIMEOUT_SECONDS,
+    allow_private=FEED_ALLOW_PRIVATE_HOSTS
+)
+
+def start_feed_polling():
+    """Start the feed scheduler when enabled"""
+    if FEED_POLLING_ENABLED:
+        feed_poller.start()
+        atexit.register(feed_poller.stop)
+
+@opsec_bp.route('/feeds/metrics', methods=['GET'])
+def feed_poll_metrics():
+    """Per-feed poll latency, diff sizes, 304 and error counts"""
+    return jsonify({"enabled": FEED_POLLING_ENABLED, **feed_poller.metrics()})
+
+@opsec_bp.route('/feeds/<feed_id>/poll', methods=['POST'])
+def poll_feed_now(feed_id: str):
+    """Fetch a feed immediately and apply its diff"""
+    feed = cti_feeds_db.get(feed_id)
+    if not feed:
+        return jsonify({"error": "Feed not found"}), 404
+    if not feed.get('endpoint'):
+        return jsonify({"error": "Feed has no endpoint"}), 400
+    result = feed_poller.poll_now(feed_id, feed)
+    if result['status'] == 'busy':
+        return jsonify({"error": "Feed is already being polled", "feed_id": feed_id}), 409
+    return jsonify(result), 502 if result['status'] == 'error' else 200
+
 # ============================================================================
 # IoC MANAGEMENT (Task 3.1)
 # ============================================================================
 
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+
+# One anchored alternation decides the type in a single pass. The branches
+# overlap (a hyphenated hex domain like 'ab.cd-ef.ba' also fits ip_range, and
+# the loose ipv6/ip_range shapes accept many hex strings), and the first branch
+# that fullmatches wins. The order is therefore a precedence list: keep
+# the specific shapes (ip, url, domain, file_hash, cve) ahead of the catch-alls.
+IOC_CLASSIFIER = re.compile(r'''
+      (?P<ip>(?:{octet}\.){{3}}{octet})
+    | (?P<url>https?://[\s\S]*)
+    | (?P<domain>(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{{0,61}}[a-zA-Z0-9])?\.)+[a-zA-Z]{{2,}})
+    | (?P<file_hash>[a-fA-F0-9]{{32}}|[a-fA-F0-9]{{40}}|[a-fA-F0-9]{{64}})
+    | (?P<cve>CVE-\d{{4}}-\d{{4,}})
+    | (?P<ipv6>[0-9a-fA-F:]*:[0-9a-fA-F:]*)
+    | (?P<ip_range>[0-9A-Fa-f:.]+(?:/\d{{1,3}}|\s*-\s*[0-9A-Fa-f:.]+))
+'''.format(octet=_OCTET), re.VERBOSE)
+
+CLASSIFIER_TYPES = {
+    'ip': IoCType.IP_ADDRESS.value,
+    'url': IoCType.URL.value,
+    'domain': IoCType.DOMAIN.value,
+    'file_hash': IoCType.FILE_HASH.value,
+    'cve': IoCType.CVE.value
+}
+
 def parse_ioc_type(indicator: str) -> Optional[str]:
     """Determine IoC type from indicator string"""
-    # IP address pattern
-    ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if re.match(ip_pattern, indicator):
+    if not isinstance(indicator, str):
+        return None
+    match = IOC_CLASSIFIER.fullmatch(indicator)
+    if not match:
+        return None
+    
+    kind = match.lastgroup
+    if kind == 'ipv6':
+        # Shape matched; let ipaddress reject things like 'dead::beef::1'
+        try:
+            ipaddress.IPv6Address(indicator)
+        except ValueError:
+            return None
         return IoCType.IP_ADDRESS.value
+    if kind == 'ip_range':
+        return IoCType.IP_RANGE.value if parse_ip_networks(indicator) else None
+    return CLASSIFIER_TYPES[kind]
+
+def classify_iocs(indicators: List[str]) -> List[Optional[str]]:
+    """Batch parse_ioc_type; result[i] is the type of indicators[i] (or None)"""
+    classify = parse_ioc_type
+    return [classify(indicator) for indicator in indicators]
+
+def resolve_ioc_ttl_hours(source: str, ttl_hours=None) -> float:
+    """
+    TTL for indicators from a source: explicit ttl_hours, else the feed's
+    ttl_hours, else IOC_TTL_FEED_INTERVALS missed feed updates; 0 = never.
+    """
+    if ttl_hours is not None:
+        return float(ttl_hours)
+    feed = cti_feeds_db.get(source) or DEFAULT_FEEDS.get(source)
+    if feed:
+        if feed.get('ttl_hours') is not None:
+            return float(feed['ttl_hours'])
+        if feed.get('update_interval_hours'):
+            return float(feed['update_interval_hours']) * IOC_TTL_FEED_INTERVALS
+    return IOC_DEFAULT_TTL_HOURS
+
+def schedule_ioc_expiry(ioc: dict, ttl_hours: float):
+    """(Re)arm an IoC's expiry on the timing wheel"""
+    ioc['ttl_hours'] = ttl_hours or None
+    if not ttl_hours:
+        ioc['expires_at'] = None
+        ioc_expiry_wheel.cancel(ioc['ioc_id'])
+        return
+    expires_at = datetime.now() + timedelta(hours=ttl_hours)
+    ioc['expires_at'] = expires_at.isoformat()
+    ioc_expiry_wheel.schedule(ioc['ioc_id'], expires_at.timestamp())
+
+def register_ioc(ioc: dict):
+    """Add a new IoC to ioc_db and every index/aggregate built over it"""
+    with ioc_lock:
+        ioc_db[ioc['ioc_id']] = ioc
+        index_ioc(ioc)
+        ioc_search_index.add(ioc)
+        bump_count(ioc_type_counts, ioc['type'])
+        bump_count(ioc_severity_counts, ioc['severity'])
+        persist('iocs', ioc['ioc_id'])
+        sync_related_iocs(ioc_graph.add(ioc))
+
+def sync_related_iocs(ioc_ids):
+    """Copy the graph's neighbour lists into the IoCs' related_iocs"""
+    with ioc_lock:
+        for ioc_id in ioc_ids:
+            ioc = ioc_db.get(ioc_id)
+            if ioc:
+                ioc['related_iocs'] = ioc_graph.related(ioc_id)
+                persist('iocs', ioc_id)
+
+def remove_ioc(ioc_id: str) -> Optional[dict]:
+    """Drop an IoC from ioc_db and every index/aggregate built over it"""
+    with ioc_lock:
+        ioc = ioc_db.pop(ioc_id, None)
+        if not ioc:
+            return None
+        unindex_ioc(ioc)
+        ioc_search_index.remove(ioc)
+        bump_count(ioc_type_counts, ioc['type'], -1)
+        bump_count(ioc_severity_counts, ioc['severity'], -1)
+        ioc_expiry_wheel.cancel(ioc_id)
+        persist('iocs', ioc_id)
+        sync_related_iocs(ioc_graph.remove(ioc_id))
+        return ioc
+
+def ingest_indicators(indicators: list, source: str = 'manual',
+                      severity: str = ThreatSeverity.MEDIUM.value, tags: Optional[list] = None,
+                      confidence: float = 0.8, ttl_hours=None) -> dict:
+    """
+    Classify and store a batch of indicators (strings or dicts with an
+    'indicator' key). Re-sent indicators refresh last_seen; their TTL is
+    re-armed by their own source and only extended by other sources.
+    """
+    tags = tags or []
+    ttl = resolve_ioc_ttl_hours(source, ttl_hours)
+    ingested = []
+    duplicates = 0
     
-    # URL pattern
-    url_pattern = r'^https?://'
-    if re.match(url_pattern, indicator):
-        return IoCType.URL.value
-    
-    # Domain pattern
-    domain_pattern = r'^[a-zA-Z0-9][a-zA-Z0-9-]{0,61}[a-zA-Z0-9]?\.[a-zA-Z]{2,}$'
-    if re.match(domain_pattern, indicator):
-        return IoCType.DOMAIN.value
-    
-    # File hash patterns (MD5, SHA1, SHA256)
-    md5_pattern = r'^[a-fA-F0-9]{32}$'
-    sha1_pattern = r'^[a-fA-F0-9]{40}$'
-    sha256_pattern = r'^[a-fA-F0-9]{64}$'
-    if re.match(md5_pattern, indicator):
-        return IoCType.FILE_HASH.value
-    if re.match(sha1_pattern, indicator):
-        return IoCType.FILE_HASH.value
-    if re.match(sha256_pattern, indicator):
-        return IoCType.FILE_HASH.value
-    
-    # CVE pattern
-    cve_pattern = r'^CVE-\d{4}-\d{4,}$'
-    if re.match(cve_pattern, indicator):
-        return IoCType.CVE.value
-    
-    return None
+    raw_indicators = [item if isinstance(item, str) else item.get('indicator')
+                      for item in indicators]
+    ioc_types = classify_iocs(raw_indicators)
+    
+    with ioc_lock:
+        for indicator_data, indicator, ioc_type in zip(indicators, raw_indicators, ioc_types):
+            if not ioc_type:
+                continue
+            
+            ioc_id = hashlib.sha256(indicator.encode()).hexdigest()[:16]
+            
+            # Check for duplicate (a feed re-sending an indicator keeps it alive)
+            existing = ioc_db.get(ioc_id)
+            if existing:
+                duplicates += 1
+                existing['last_seen'] = datetime.now().isoformat()
+                if existing.get('source') == source:
+                    schedule_ioc_expiry(existing, ttl)
+                elif ttl and existing.get('expires_at') and \
+                        datetime.now() + timedelta(hours=ttl) > datetime.fromisoformat(existing['expires_at']):
+                    # Another source only ever extends an existing expiry; it
+                    # never makes a permanent IoC expire or cancels a feed TTL
+                    schedule_ioc_expiry(existing, ttl)
+                persist('iocs', ioc_id)
+                continue
+            
+            ioc = {
+                "ioc_id": ioc_id,
+                "indicator": indicator,
+                "type": ioc_type,
+                "severity": severity,
+                "source": source,
+                "tags": tags,
+                "first_seen": datetime.now().isoformat(),
+                "last_seen": datetime.now().isoformat(),
+                "confidence": confidence,
+                "metadata": indicator_data if isinstance(indicator_data, dict) else {},
+                "related_iocs": [],
+                "false_positive": False
+            }
+            
+            schedule_ioc_expiry(ioc, ttl)
+            register_ioc(ioc)
+            ingested.append(ioc_id)
+    
+    return {
+        "ingested_count": len(ingested),
+        "duplicates": duplicates,
+        "ioc_ids": ingested
+    }
+
+def retro_hunt_new_iocs(ioc_ids: List[str]) -> Optional[str]:
+    """Queue a retro-hunt for freshly ingested IoCs; returns the job id"""
+    if not RETROHUNT_ENABLED or not ioc_ids:
+        return None
+    return retro_hunter.submit([ioc_db[i] for i in ioc_ids if i in ioc_db])
 
 @opsec_bp.route('/ioc/ingest', methods=['POST'])
 def ingest_ioc():
@@ -199,57 +612,135 @@ def ingest_ioc():
     data = request.get_json()
     
     indicators = data.get('indicators', [])
-    source = data.get('source', 'manual')
-    severity = data.get('severity', ThreatSeverity.MEDIUM.value)
-    tags = data.get('tags', [])
     
     if not indicators:
         return jsonify({"error": "indicators array is required"}), 400
     
-    ingested = []
-    duplicates = 0
+    result = ingest_indicators(
+        indicators,
+        source=data.get('source', 'manual'),
+        severity=data.get('severity', ThreatSeverity.MEDIUM.value),
+        tags=data.get('tags', []),
+        confidence=data.get('confidence', 0.8),
+        ttl_hours=data.get('ttl_hours')
+    )
     
-    for indicator_data in indicators:
-        if isinstance(indicator_data, str):
-            indicator = indicator_data
-        else:
-            indicator = indicator_data.get('indicator')
-        
-        ioc_type = parse_ioc_type(indicator)
-        if not ioc_type:
-            continue
-        
-        ioc_id = hashlib.sha256(indicator.encode()).hexdigest()[:16]
-        
-        # Check for duplicate
-        if ioc_id in ioc_db:
-            duplicates += 1
-            continue
-        
-        ioc = {
-            "ioc_id": ioc_id,
-            "indicator": indicator,
-            "type": ioc_type,
-            "severity": severity,
-            "source": source,
-            "tags": tags,
-            "first_seen": datetime.now().isoformat(),
-            "last_seen": datetime.now().isoformat(),
-            "confidence": data.get('confidence', 0.8),
-            "metadata": indicator_data if isinstance(indicator_data, dict) else {},
-            "related_iocs": [],
-            "false_positive": False
-        }
-        
-        ioc_db[ioc_id] = ioc
-        ingested.append(ioc_id)
+    job_id = retro_hunt_new_iocs(result['ioc_ids'])
+    if job_id:
+        result['retro_hunt_job'] = job_id
+    
+    return jsonify(result), 201
+
+# Feed documents streamed into /ioc/ingest/stream are indexed per batch
+FEED_INGEST_BATCH = int(os.environ.get('OPSEC_FEED_INGEST_BATCH', 5000))
+# New IoCs from one stream are retro-hunted in groups of this many
+RETROHUNT_STREAM_GROUP = 100000
+
+@opsec_bp.route('/ioc/ingest/stream', methods=['POST'])
+def ingest_ioc_stream():
+    """
+    Streaming ingest of a whole feed document (STIX 2.1 bundle or CSV) in
+    constant memory. ?format=stix|csv (default csv), &column= for the CSV
+    indicator column (index or header name), plus source, severity,
+    confidence, ttl_hours and comma-separated tags. Add Content-Encoding:
+    gzip (or ?gzip=true) for compressed documents.
+    """
+    feed_format = request.args.get('format', 'csv')
+    if feed_format not in ('csv', 'stix'):
+        return jsonify({"error": "format must be csv or stix"}), 400
+    column = request.args.get('column', '0')
+    column = int(column) if column.isdigit() else column
+    compressed = (request.headers.get('Content-Encoding', '').lower() == 'gzip'
+                  or request.args.get('gzip', '').lower() in ('1', 'true'))
+    ttl_hours = request.args.get('ttl_hours')
+    options = {
+        "source": request.args.get('source', 'manual'),
+        "severity": request.args.get('severity', ThreatSeverity.MEDIUM.value),
+        "tags": [tag for tag in request.args.get('tags', '').split(',') if tag],
+        "confidence": float(request.args.get('confidence', 0.8)),
+        "ttl_hours": float(ttl_hours) if ttl_hours is not None else None
+    }
+    
+    totals = {"ingested_count": 0, "duplicates": 0}
+    new_ids: List[str] = []
+    hunt_jobs: List[str] = []
+    
+    def retro_hunt_pending():
+        job_id = retro_hunt_new_iocs(new_ids)
+        if job_id:
+            hunt_jobs.append(job_id)
+        new_ids.clear()
+    
+    def index_batch(batch: List[str]):
+        result = ingest_indicators(batch, **options)
+        totals["ingested_count"] += result['ingested_count']
+        totals["duplicates"] += result['duplicates']
+        if RETROHUNT_ENABLED:
+            new_ids.extend(result['ioc_ids'])
+            if len(new_ids) >= RETROHUNT_STREAM_GROUP:
+                retro_hunt_pending()
+    
+    try:
+        indicators = iter_feed_indicators(feed_format, iter_stream_chunks(request.stream, compressed), column)
+        stats = ingest_in_batches(indicators, index_batch, FEED_INGEST_BATCH)
+    except zlib.error:
+        return jsonify({"error": "invalid gzip stream", **totals}), 400
+    except ValueError as e:
+        return jsonify({"error": f"invalid {feed_format} feed: {e}", **totals}), 400
+    retro_hunt_pending()
     
     return jsonify({
-        "ingested_count": len(ingested),
-        "duplicates": duplicates,
-        "ioc_ids": ingested
+        **totals,
+        "parsed_count": stats['indicators'],
+        "unclassified": stats['indicators'] - totals['ingested_count'] - totals['duplicates'],
+        "batches": stats['batches'],
+        "seconds": stats['seconds'],
+        "indicators_per_second": stats['indicators_per_second'],
+        "retro_hunt_jobs": hunt_jobs
     }), 201
 
+def expire_iocs(now: Optional[float] = None) -> int:
+    """Advance the expiry wheel and drop every IoC whose TTL has lapsed"""
+    expired = ioc_expiry_wheel.advance(now)
+    with ioc_lock:
+        for ioc_id in expired:
+            ioc = remove_ioc(ioc_id)
+            if ioc:
+                bump_count(ioc_expired_by_source, ioc['source'])
+    ioc_expiry_stats['last_sweep'] = datetime.now().isoformat()
+    ioc_expiry_stats['last_sweep_expired'] = len(expired)
+    return len(expired)
+
+def run_ioc_expiry_loop():
+    """Background sweeper; one wheel tick per iteration"""
+    while True:
+        time.sleep(ioc_expiry_wheel.tick_seconds)
+        try:
+            expired = expire_iocs()
+            if expired:
+                print(f"[OPSEC] Expired {expired} IoCs")
+        except Exception as e:
+            print(f"[OPSEC] IoC expiry sweep failed: {e}")
+
+def start_ioc_expiry():
+    """Start the expiry sweeper thread once per process"""
+    global ioc_expiry_thread
+    if ioc_expiry_thread is None:
+        ioc_expiry_thread = threading.Thread(target=run_ioc_expiry_loop,
+                                             name="opsec-ioc-expiry", daemon=True)
+        ioc_expiry_thread.start()
+
+@opsec_bp.route('/ioc/expiry', methods=['GET'])
+def ioc_expiry_metrics():
+    """IoC TTL wheel state and expiry counters"""
+    return jsonify({
+        **ioc_expiry_wheel.stats(),
+        **ioc_expiry_stats,
+        "expired_by_source": dict(ioc_expired_by_source),
+        "default_ttl_hours": IOC_DEFAULT_TTL_HOURS,
+        "feed_ttl_intervals": IOC_TTL_FEED_INTERVALS
+    })
+
 @opsec_bp.route('/ioc/<ioc_id>', methods=['GET'])
 def get_ioc(ioc_id: str):
     """Get IoC details"""
@@ -258,6 +749,46 @@ def get_ioc(ioc_id: str):
         return jsonify({"error": "IoC not found"}), 404
     return jsonify(ioc)
 
+def cluster_response(ioc_id: str, limit: int) -> Optional[dict]:
+    """Members of an IoC's cluster with their open incidents (None if untracked)"""
+    cluster = ioc_graph.cluster(ioc_id, limit)
+    if cluster is None:
+        # Removed between the caller's ioc_db check and the graph lookup
+        return None
+    cluster_id, size, members = cluster
+    iocs = []
+    for member_id in members:
+        member = ioc_db.get(member_id)
+        if member:
+            iocs.append({
+                "ioc_id": member_id,
+                "indicator": member['indicator'],
+                "type": member['type'],
+                "severity": member['severity'],
+                "source": member['source'],
+                "open_incident": open_incident_index.get(member_id)
+            })
+    return {
+        "cluster_id": cluster_id,
+        "size": size,
+        "truncated": size > len(members),
+        "iocs": iocs
+    }
+
+@opsec_bp.route('/ioc/<ioc_id>/cluster', methods=['GET'])
+def get_ioc_cluster(ioc_id: str):
+    """Every IoC in the same campaign cluster"""
+    limit = min(max(int(request.args.get('limit', 500)), 1), 10000)
+    cluster = cluster_response(ioc_id, limit) if ioc_id in ioc_db else None
+    if cluster is None:
+        return jsonify({"error": "IoC not found"}), 404
+    return jsonify({"ioc_id": ioc_id, **cluster})
+
+@opsec_bp.route('/graph/stats', methods=['GET'])
+def graph_stats():
+    """IoC relationship graph: cluster counts, sizes and link sources"""
+    return jsonify(ioc_graph.stats())
+
 @opsec_bp.route('/ioc/search', methods=['GET'])
 def search_ioc():
     """Search IoCs by indicator, type, or severity"""
@@ -265,34 +796,36 @@ def search_ioc():
     ioc_type = request.args.get('type')
     severity = request.args.get('severity')
     limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
     
-    results = list(ioc_db.values())
-    
-    if query:
-        results = [ioc for ioc in results 
-                  if query.lower() in ioc['indicator'].lower()]
-    
-    if ioc_type:
-        results = [ioc for ioc in results if ioc['type'] == ioc_type]
-    
-    if severity:
-        results = [ioc for ioc in results if ioc['severity'] == severity]
+    total, ioc_ids = ioc_search_index.search(
+        query, {"type": ioc_type, "severity": severity}, offset=offset, limit=limit)
     
     return jsonify({
-        "total": len(results),
-        "iocs": results[:limit]
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "iocs": [ioc_db[ioc_id] for ioc_id in ioc_ids if ioc_id in ioc_db]
     })
 
 @opsec_bp.route('/ioc/<ioc_id>/fp', methods=['POST'])
 def mark_false_positive(ioc_id: str):
     """Mark an IoC as false positive"""
-    ioc = ioc_db.get(ioc_id)
-    if not ioc:
-        return jsonify({"error": "IoC not found"}), 404
-    
-    ioc['false_positive'] = True
-    ioc['marked_fp_at'] = datetime.now().isoformat()
-    ioc['marked_fp_by'] = request.get_json().get('analyst', 'system')
+    data = request.get_json(silent=True) or {}
+    with ioc_lock:
+        ioc = ioc_db.get(ioc_id)
+        if not ioc:
+            return jsonify({"error": "IoC not found"}), 404
+        
+        ioc['false_positive'] = True
+        ioc['marked_fp_at'] = datetime.now().isoformat()
+        ioc['marked_fp_by'] = data.get('analyst', 'system')
+        # Keep the FP verdict on record instead of letting its TTL drop it
+        ioc_expiry_wheel.cancel(ioc_id)
+        ioc.pop('expires_at', None)
+        persist('iocs', ioc_id)
+        unindex_ioc(ioc)
     
     return jsonify({"message": "IoC marked as false positive", "ioc_id": ioc_id})
 
@@ -300,6 +833,37 @@ def mark_false_positive(ioc_id: str):
 # SOC AUTOMATION AGENTS (Task 3.2)
 # ============================================================================
 
+def build_log(log_entry, source_system: str) -> dict:
+    """Normalise a raw log entry (dict or plain message) into a stored log"""
+    if isinstance(log_entry, str):
+        log_entry = {"message": log_entry}
+    
+    return {
+        "log_id": str(uuid.uuid4()),
+        "timestamp": log_entry.get('timestamp') or datetime.now().isoformat(),
+        "source_ip": log_entry.get('source_ip'),
+        "destination_ip": log_entry.get('destination_ip'),
+        "action": log_entry.get('action', 'unknown'),
+        "message": log_entry.get('message', ''),
+        "source_system": source_system,
+        "metadata": log_entry.get('metadata', {})
+    }
+
+def store_and_correlate(built: List[dict], block: bool = False):
+    """
+    Store built logs and correlate them (queued or inline). Raises
+    PipelineFull when the correlation queue rejects the batch, in which
+    case nothing is stored.
+    """
+    if ASYNC_CORRELATION:
+        correlation_pipeline.submit(built, block=block, timeout=INGEST_BLOCK_TIMEOUT)
+        internal_logs_db.extend(built)
+    else:
+        for log in built:
+            internal_logs_db.append(log)
+            # Trigger correlation check
+            check_correlation(log)
+
 @opsec_bp.route('/logs/ingest', methods=['POST'])
 def ingest_logs():
     """Ingest internal system logs for correlation"""
@@ -311,128 +875,498 @@ def ingest_logs():
     if not logs:
         return jsonify({"error": "logs array is required"}), 400
     
-    ingested = []
+    built = [build_log(log_entry, source_system) for log_entry in logs]
     
-    for log_entry in logs:
-        if isinstance(log_entry, str):
-            log_entry = {"message": log_entry}
-        
-        log_id = str(uuid.uuid4())
-        
-        log = {
-            "log_id": log_id,
-            "timestamp": log_entry.get('timestamp') or datetime.now().isoformat(),
-            "source_ip": log_entry.get('source_ip'),
-            "destination_ip": log_entry.get('destination_ip'),
-            "action": log_entry.get('action', 'unknown'),
-            "message": log_entry.get('message', ''),
-            "source_system": source_system,
-            "metadata": log_entry.get('metadata', {})
-        }
+    try:
+        store_and_correlate(built, block=INGEST_BACKPRESSURE == 'block')
+    except PipelineFull as e:
+        return backpressure_response(str(e))
+    
+    return jsonify({
+        "ingested_count": len(built),
+        "log_ids": [log['log_id'] for log in built],
+        "correlation": "queued" if ASYNC_CORRELATION else "inline"
+    }), 201
+
+def backpressure_response(reason: str, **extra):
+    """429 telling the forwarder to retry once the correlation queue drains"""
+    response = jsonify({
+        "error": "correlation queue is full, retry later",
+        "detail": reason,
+        "queue": correlation_pipeline.metrics(),
+        **extra
+    })
+    response.headers['Retry-After'] = str(max(1, int(INGEST_BLOCK_TIMEOUT)))
+    return response, 429
+
+# Streaming ingest reads the body in fixed-size chunks
+STREAM_CHUNK_SIZE = 64 * 1024
+# Longer NDJSON lines are dropped (and counted as malformed) without buffering
+MAX_NDJSON_LINE_BYTES = 1024 * 1024
+
+def iter_stream_chunks(stream, compressed: bool = False) -> Iterator[bytes]:
+    """Read a request stream in bounded chunks, inflating gzip incrementally"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+    
+    while True:
+        chunk = stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        if not decompressor:
+            yield chunk
+            continue
+        # Cap inflated output per step so a compression bomb stays bounded
+        while chunk:
+            yield decompressor.decompress(chunk, STREAM_CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+    
+    if decompressor:
+        yield decompressor.flush()
+
+def iter_ndjson_lines(stream, compressed: bool = False) -> Iterator[Optional[bytes]]:
+    """
+    Yield newline-delimited records from a byte stream, optionally gzip'd.
+    Memory is bounded by STREAM_CHUNK_SIZE plus one record; over-long
+    records are skipped and reported as None.
+    """
+    buffer = b''
+    skipping = False
+    
+    for chunk in iter_stream_chunks(stream, compressed):
+        lines = (buffer + chunk).split(b'\n')
+        buffer = lines.pop()
         
-        internal_logs_db.append(log)
-        ingested.append(log_id)
+        for line in lines:
+            if skipping:
+                # Tail end of an over-long record
+                skipping = False
+                continue
+            yield line
         
-        # Trigger correlation check
-        check_correlation(log)
+        if len(buffer) > MAX_NDJSON_LINE_BYTES:
+            if not skipping:
+                yield None
+            skipping = True
+            buffer = b''
+    
+    if buffer and not skipping:
+        yield buffer
+
+@opsec_bp.route('/logs/ingest/stream', methods=['POST'])
+def ingest_logs_stream():
+    """
+    Streaming bulk ingest of newline-delimited JSON logs.
+    Send with Content-Type application/x-ndjson; add Content-Encoding: gzip
+    (or ?gzip=true) for compressed batches. Returns summary counts only.
+    """
+    source_system = request.args.get('source', 'unknown')
+    compressed = (request.headers.get('Content-Encoding', '').lower() == 'gzip'
+                  or request.args.get('gzip', '').lower() in ('1', 'true'))
+    
+    ingested = 0
+    malformed = 0
+    incidents_before = len(incidents_db)
+    pending: List[dict] = []
+    
+    def flush_pending():
+        # Streams always block: a slow queue slows the reader, not memory
+        correlation_pipeline.submit(pending, block=True, timeout=INGEST_BLOCK_TIMEOUT)
+        internal_logs_db.extend(pending)
+        pending.clear()
+    
+    try:
+        for line in iter_ndjson_lines(request.stream, compressed):
+            if line is None:
+                malformed += 1
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                log_entry = json.loads(line)
+            except ValueError:
+                malformed += 1
+                continue
+            if not isinstance(log_entry, (dict, str)):
+                malformed += 1
+                continue
+            
+            log = build_log(log_entry, source_system)
+            ingested += 1
+            if ASYNC_CORRELATION:
+                pending.append(log)
+                if len(pending) >= min(STREAM_SUBMIT_BATCH, correlation_pipeline.capacity):
+                    flush_pending()
+            else:
+                internal_logs_db.append(log)
+                check_correlation(log)
+        if pending:
+            flush_pending()
+    except PipelineFull as e:
+        return backpressure_response(str(e), accepted_count=ingested - len(pending))
+    except zlib.error:
+        return jsonify({
+            "error": "invalid gzip stream",
+            "ingested_count": ingested,
+            "malformed_count": malformed
+        }), 400
+    
+    if not ingested and not malformed:
+        return jsonify({"error": "request body is empty"}), 400
+    
+    summary = {
+        "ingested_count": ingested,
+        "malformed_count": malformed,
+        "correlation": "queued" if ASYNC_CORRELATION else "inline"
+    }
+    if not ASYNC_CORRELATION:
+        summary["incidents_created"] = len(incidents_db) - incidents_before
+    return jsonify(summary), 201
+
+def ingest_syslog_batch(entries: List[dict]):
+    """Syslog listener sink (own thread); waits for correlation queue space when it is full"""
+    store_and_correlate([build_log(entry, 'syslog') for entry in entries], block=True)
+
+def start_syslog_listener():
+    """Start the syslog listener once per process when enabled"""
+    global syslog_listener
+    if not SYSLOG_ENABLED or syslog_listener is not None:
+        return
+    listener = SyslogListener(
+        ingest_syslog_batch,
+        host=SYSLOG_HOST,
+        udp_port=SYSLOG_UDP_PORT or None,
+        tcp_port=SYSLOG_TCP_PORT or None,
+        batch_size=SYSLOG_BATCH_SIZE,
+        flush_interval=SYSLOG_FLUSH_SECONDS,
+        max_pending_batches=SYSLOG_MAX_PENDING_BATCHES
+    )
+    try:
+        listener.start()
+    except OSError as e:
+        print(f"[OPSEC] Syslog listener failed to start: {e}")
+        return
+    syslog_listener = listener
+    atexit.register(listener.stop)
+
+@opsec_bp.route('/syslog', methods=['GET'])
+def syslog_status():
+    """Syslog listener ports, batching settings and intake counters"""
+    if syslog_listener is None:
+        return jsonify({"running": False, "enabled": SYSLOG_ENABLED})
+    return jsonify({"enabled": SYSLOG_ENABLED, **syslog_listener.info()})
+
+@opsec_bp.route('/logs', methods=['GET'])
+def search_logs():
+    """Time-range scan of retained logs (only overlapping segments are read)"""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    source_ip = request.args.get('source_ip')
+    destination_ip = request.args.get('destination_ip')
+    limit = int(request.args.get('limit', 100))
+    
+    results = []
+    for log in internal_logs_db.scan(start, end, source_ip=source_ip, destination_ip=destination_ip):
+        results.append(log)
+        if len(results) >= limit:
+            break
     
     return jsonify({
-        "ingested_count": len(ingested),
-        "log_ids": ingested
-    }), 201
+        "count": len(results),
+        "logs": results
+    })
+
+@opsec_bp.route('/logs/stats', methods=['GET'])
+def log_store_stats():
+    """Log store segments, size and eviction counters"""
+    return jsonify(internal_logs_db.stats())
+
+@opsec_bp.route('/correlation/stats', methods=['GET'])
+def correlation_stats():
+    """Correlation index sizes and Bloom prefilter effectiveness"""
+    return jsonify(correlation_index.stats())
+
+@opsec_bp.route('/pipeline/metrics', methods=['GET'])
+def pipeline_metrics():
+    """Correlation queue depth, lag and worker utilisation"""
+    if not ASYNC_CORRELATION:
+        return jsonify({"mode": "inline"})
+    mode = "processes" if CORRELATION_PROCESSES > 0 else "async"
+    return jsonify({"mode": mode, **correlation_pipeline.metrics()})
+
+@opsec_bp.route('/retrohunt', methods=['GET'])
+def list_retro_hunts():
+    """Recent retro-hunt jobs with progress, newest first"""
+    jobs = retro_hunter.jobs()
+    return jsonify({"total": len(jobs), "jobs": jobs, "enabled": RETROHUNT_ENABLED})
+
+@opsec_bp.route('/retrohunt/<job_id>', methods=['GET'])
+def get_retro_hunt(job_id: str):
+    """Progress of one retro-hunt job"""
+    job = retro_hunter.job(job_id)
+    if not job:
+        return jsonify({"error": "Retro-hunt job not found"}), 404
+    return jsonify(job)
+
+@opsec_bp.route('/retrohunt', methods=['POST'])
+def start_retro_hunt():
+    """Re-run a retro-hunt over retained logs for existing IoCs"""
+    data = request.get_json()
+    ioc_ids = data.get('ioc_ids', [])
+
+    if not ioc_ids:
+        return jsonify({"error": "ioc_ids array is required"}), 400
+
+    iocs = [ioc for ioc in map(active_ioc, ioc_ids) if ioc]
+    job_id = retro_hunter.submit(iocs)
+    if not job_id:
+        return jsonify({"error": "No active IoCs of a huntable type"}), 400
+
+    return jsonify({"job_id": job_id, "ioc_count": len(iocs)}), 202
 
 def check_correlation(log: dict):
     """Check if log entry matches any known IoCs"""
-    # Extract IPs from log
-    source_ip = log.get('source_ip')
-    dest_ip = log.get('destination_ip')
+    # Indexed lookup on IPs and message domains instead of a full ioc_db scan
+    handle_correlation_matches(log, correlation_index.match(log))
+
+def handle_correlation_matches(log: dict, matches: list):
+    """Raise incidents for a log's IoC matches and feed the threshold rules"""
+    matched_severities = []
+    matched_ids = []
+    for ioc_id, correlation_type in matches:
+        ioc = active_ioc(ioc_id)
+        if ioc:
+            matched_severities.append(ioc['severity'])
+            matched_ids.append(ioc_id)
+            create_incident(log, ioc, correlation_type)
     
-    # Check against IoC database
-    for ioc_id, ioc in ioc_db.items():
-        if ioc.get('false_positive'):
-            continue
+    # IoCs seen in the same log belong to the same campaign cluster
+    if len(matched_ids) > 1:
+        sync_related_iocs(ioc_graph.link_cooccurring(matched_ids))
+    
+    rule_engine.observe(log, parse_timestamp(log.get('timestamp')), matched_severities)
+
+def create_incident(trigger_log: dict, ioc: dict, correlation_type: str, detection: str = "realtime"):
+    """Create a security incident from IoC correlation (live or retro-hunt)"""
+    # Correlation workers run concurrently; dedup and insert must be atomic
+    with incident_lock:
+        incident_id = str(uuid.uuid4())[:8]
         
-        # IP-based correlation
-        if ioc['type'] == IoCType.IP_ADDRESS.value:
-            if source_ip == ioc['indicator'] or dest_ip == ioc['indicator']:
-                # Match found - create incident
-                create_incident(log, ioc, "ip_match")
+        # Check for existing open incident with same IoC
+        existing = incidents_db.get(open_incident_index.get(ioc['ioc_id']))
         
-        # Domain-based correlation in message
-        if ioc['type'] == IoCType.DOMAIN.value:
-            if ioc['indicator'] in log.get('message', ''):
-                create_incident(log, ioc, "domain_match")
-
-def create_incident(trigger_log: dict, ioc: dict, correlation_type: str):
-    """Create a security incident from IoC correlation"""
-    incident_id = str(uuid.uuid4())[:8]
-    
-    # Check for existing open incident with same IoC
-    existing = [inc for inc in incidents_db.values() 
-              if inc['ioc_id'] == ioc['ioc_id'] 
-              and inc['status'] in [IncidentStatus.OPEN.value, IncidentStatus.INVESTIGATING.value]]
-    
-    if existing:
-        # Update existing incident
-        existing[0]['trigger_count'] = existing[0].get('trigger_count', 1) + 1
-        existing[0]['last_triggered'] = datetime.now().isoformat()
-        existing[0]['trigger_logs'].append(trigger_log['log_id'])
-        return
+        if existing:
+            # Update existing incident
+            record_trigger(existing, trigger_log)
+            persist('incidents', existing['incident_id'])
+            return
+        
+        # Calculate severity based on IoC severity + correlation
+        severity = ioc['severity']
+        if correlation_type == "ip_match":
+            # Elevated severity for direct IP match
+            severity_map = {
+                "low": "medium",
+                "medium": "high",
+                "high": "critical",
+                "critical": "critical"
+            }
+            severity = severity_map.get(severity, severity)
+        
+        incident = {
+            "incident_id": incident_id,
+            "title": f"Threat Detection: {ioc['indicator']} ({correlation_type})",
+            "description": f"Automated detection from SOC agent. IoC: {ioc['indicator']}, Type: {ioc['type']}, Source: {ioc['source']}",
+            "severity": severity,
+            "status": IncidentStatus.OPEN.value,
+            "ioc_id": ioc['ioc_id'],
+            "ioc_indicator": ioc['indicator'],
+            "correlation_type": correlation_type,
+            "detection": detection,
+            "trigger_logs": [],
+            "trigger_count": 0,
+            "trigger_hours": {},
+            "assigned_to": None,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "resolved_at": None,
+            "false_positive_reason": None,
+            "notes": []
+        }
+        
+        record_trigger(incident, trigger_log)
+        register_incident(incident)
+        print(f"[OPSEC] Created incident {incident_id} - {severity} severity")
+
+def record_trigger(incident: dict, trigger_log: dict):
+    """
+    Count a triggering log: reservoir-sample its id into trigger_logs and
+    bump the hit bucket of its hour, so incidents stay bounded in size
+    (the full list is served by GET /incidents/<id>/logs)
+    """
+    sample = incident['trigger_logs']
+    count = incident.get('trigger_count', len(sample)) + 1
+    incident['trigger_count'] = count
+    incident['last_triggered'] = datetime.now().isoformat()
     
-    # Calculate severity based on IoC severity + correlation
-    severity = ioc['severity']
-    if correlation_type == "ip_match":
-        # Elevated severity for direct IP match
-        severity_map = {
-            "low": "medium",
-            "medium": "high",
-            "high": "critical",
-            "critical": "critical"
+    if len(sample) < TRIGGER_LOG_SAMPLE_SIZE:
+        sample.append(trigger_log['log_id'])
+    else:
+        slot = random.randrange(count)
+        if slot < TRIGGER_LOG_SAMPLE_SIZE:
+            sample[slot] = trigger_log['log_id']
+    
+    hours = incident.setdefault('trigger_hours', {})
+    hour = datetime.fromtimestamp(parse_timestamp(trigger_log.get('timestamp'))).strftime('%Y-%m-%dT%H:00')
+    hours[hour] = hours.get(hour, 0) + 1
+    if len(hours) > TRIGGER_HOUR_BUCKETS:
+        del hours[min(hours)]
+
+def register_incident(incident: dict):
+    """Add a new incident to incidents_db and every index/aggregate over it"""
+    with incident_lock:
+        incidents_db[incident['incident_id']] = incident
+        open_incident_index[incident_dedup_key(incident)] = incident['incident_id']
+        incident_list_index.add(incident)
+        bump_count(incident_status_counts, incident['status'])
+        recent_incident_ids.append(incident['incident_id'])
+        persist('incidents', incident['incident_id'])
+
+def set_incident_status(incident: dict, status: str):
+    """Change an incident's status, keeping indexes and aggregates consistent"""
+    with incident_lock:
+        old_status = incident['status']
+        bump_count(incident_status_counts, old_status, -1)
+        bump_count(incident_status_counts, status)
+        incident['status'] = status
+        incident_list_index.move(incident, old_status)
+        sync_open_incident_index(incident)
+
+def incident_dedup_key(incident: dict) -> str:
+    """open_incident_index key: the IoC, or the rule and its group key"""
+    return incident.get('rule_key') or incident['ioc_id']
+
+def sync_open_incident_index(incident: dict):
+    """Keep open_incident_index consistent after an incident status change"""
+    key = incident_dedup_key(incident)
+    with incident_lock:
+        if incident['status'] in ACTIVE_INCIDENT_STATUSES:
+            open_incident_index.setdefault(key, incident['incident_id'])
+        elif open_incident_index.get(key) == incident['incident_id']:
+            del open_incident_index[key]
+
+def create_threshold_incident(rule: dict, evidence: dict, trigger_log: dict):
+    """Create (or extend) the incident for a tripped threshold rule"""
+    rule_key = f"rule:{rule['rule_id']}:{evidence['key']}"
+    with incident_lock:
+        existing = incidents_db.get(open_incident_index.get(rule_key))
+        
+        if existing:
+            record_trigger(existing, trigger_log)
+            existing['rule_evidence'] = evidence
+            persist('incidents', existing['incident_id'])
+            return
+        
+        incident_id = str(uuid.uuid4())[:8]
+        incident = {
+            "incident_id": incident_id,
+            "title": f"Threshold Detection: {rule['name']} ({evidence['key']})",
+            "description": f"{evidence['count']} matching events for {rule['group_by']} {evidence['key']} within {int(rule['window_seconds'])}s",
+            "severity": rule['severity'],
+            "status": IncidentStatus.OPEN.value,
+            "ioc_id": None,
+            "ioc_indicator": None,
+            "correlation_type": "threshold_rule",
+            "detection": "threshold_rule",
+            "rule_id": rule['rule_id'],
+            "rule_key": rule_key,
+            "rule_evidence": evidence,
+            "trigger_logs": [],
+            "trigger_count": 0,
+            "trigger_hours": {},
+            "assigned_to": None,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "resolved_at": None,
+            "false_positive_reason": None,
+            "notes": []
         }
-        severity = severity_map.get(severity, severity)
+        
+        record_trigger(incident, trigger_log)
+        register_incident(incident)
+        print(f"[OPSEC] Created incident {incident_id} - rule {rule['rule_id']} tripped for {evidence['key']}")
+
+@opsec_bp.route('/rules', methods=['GET'])
+def list_threshold_rules():
+    """Threshold rules with their window state and fire counts"""
+    rules = rule_engine.rules()
+    return jsonify({"total_rules": len(rules), "logs_observed": rule_engine.observed, "rules": rules})
+
+@opsec_bp.route('/rules', methods=['POST'])
+def upsert_threshold_rule():
+    """Add or replace a threshold rule"""
+    data = request.get_json()
     
-    incident = {
-        "incident_id": incident_id,
-        "title": f"Threat Detection: {ioc['indicator']} ({correlation_type})",
-        "description": f"Automated detection from SOC agent. IoC: {ioc['indicator']}, Type: {ioc['type']}, Source: {ioc['source']}",
-        "severity": severity,
-        "status": IncidentStatus.OPEN.value,
-        "ioc_id": ioc['ioc_id'],
-        "ioc_indicator": ioc['indicator'],
-        "correlation_type": correlation_type,
-        "trigger_logs": [trigger_log['log_id']],
-        "assigned_to": None,
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat(),
-        "resolved_at": None,
-        "false_positive_reason": None,
-        "notes": []
-    }
+    try:
+        rule = rule_engine.upsert(validate_rule(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    incidents_db[incident_id] = incident
-    print(f"[OPSEC] Created incident {incident_id} - {severity} severity")
+    return jsonify({"message": "Rule saved", "rule": rule}), 201
+
+@opsec_bp.route('/rules/<rule_id>/enable', methods=['POST'])
+def enable_threshold_rule(rule_id: str):
+    """Enable a threshold rule"""
+    if not rule_engine.set_enabled(rule_id, True):
+        return jsonify({"error": "Rule not found"}), 404
+    return jsonify({"message": f"Rule {rule_id} enabled"})
+
+@opsec_bp.route('/rules/<rule_id>/disable', methods=['POST'])
+def disable_threshold_rule(rule_id: str):
+    """Disable a threshold rule"""
+    if not rule_engine.set_enabled(rule_id, False):
+        return jsonify({"error": "Rule not found"}), 404
+    return jsonify({"message": f"Rule {rule_id} disabled"})
+
+MAX_INCIDENT_PAGE = 500
+
+def encode_incident_cursor(cursor) -> Optional[str]:
+    """Opaque page cursor for a (created_at, incident_id) sort key"""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode('|'.join(cursor).encode()).decode()
+
+def decode_incident_cursor(token: Optional[str]):
+    """Inverse of encode_incident_cursor; raises ValueError if malformed"""
+    if not token:
+        return None
+    try:
+        created_at, incident_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("malformed cursor")
+    return created_at, incident_id
 
 @opsec_bp.route('/incidents', methods=['GET'])
 def list_incidents():
-    """List security incidents"""
+    """List security incidents, newest first, one cursor page at a time"""
     status = request.args.get('status')
     severity = request.args.get('severity')
-    limit = int(request.args.get('limit', 50))
-    
-    results = list(incidents_db.values())
+    limit = min(max(int(request.args.get('limit', 50)), 1), MAX_INCIDENT_PAGE)
     
-    if status:
-        results = [inc for inc in results if inc['status'] == status]
-    if severity:
-        results = [inc for inc in results if inc['severity'] == severity]
+    try:
+        cursor = decode_incident_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     
-    # Sort by severity then timestamp
-    severity_order = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
-    results.sort(key=lambda x: (severity_order.get(x['severity'], 5), x['created_at']), reverse=True)
+    with incident_lock:
+        total, incident_ids, next_cursor = incident_list_index.page(status, severity, cursor, limit)
+        results = [incidents_db[incident_id] for incident_id in incident_ids]
     
     return jsonify({
-        "total": len(results),
-        "incidents": results[:limit]
+        "total": total,
+        "limit": limit,
+        "next_cursor": encode_incident_cursor(next_cursor),
+        "incidents": results
     })
 
 @opsec_bp.route('/incidents/<incident_id>', methods=['GET'])
@@ -443,6 +1377,64 @@ def get_incident(incident_id: str):
         return jsonify({"error": "Incident not found"}), 404
     return jsonify(incident)
 
+@opsec_bp.route('/incidents/<incident_id>/cluster', methods=['GET'])
+def get_incident_cluster(incident_id: str):
+    """The campaign cluster of the IoC behind an incident"""
+    incident = incidents_db.get(incident_id)
+    if not incident:
+        return jsonify({"error": "Incident not found"}), 404
+    ioc_id = incident.get('ioc_id')
+    if not ioc_id:
+        return jsonify({"error": "Incident is not tied to a single IoC"}), 400
+    limit = min(max(int(request.args.get('limit', 500)), 1), 10000)
+    cluster = cluster_response(ioc_id, limit) if ioc_id in ioc_db else None
+    if cluster is None:
+        return jsonify({"error": "The incident's IoC no longer exists"}), 404
+    return jsonify({"incident_id": incident_id, "ioc_id": ioc_id, **cluster})
+
+@opsec_bp.route('/incidents/<incident_id>/logs', methods=['GET'])
+def get_incident_logs(incident_id: str):
+    """Page through every retained log that triggers an incident"""
+    incident = incidents_db.get(incident_id)
+    if not incident:
+        return jsonify({"error": "Incident not found"}), 404
+    
+    limit = min(max(int(request.args.get('limit', 50)), 1), MAX_INCIDENT_PAGE)
+    try:
+        cursor = request.args.get('cursor')
+        cursor = tuple(int(part) for part in cursor.split(':')) if cursor else None
+        if cursor is not None and len(cursor) != 2:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    
+    evidence = incident.get('rule_evidence')
+    if evidence:
+        # Threshold incidents: every log of the grouped key
+        rule = rule_engine.get(incident['rule_id']) or {}
+        field = evidence.get('group_by') or rule.get('group_by')
+        if not field:
+            return jsonify({"error": "Rule no longer exists"}), 404
+        matcher = lambda segment, row_count: segment.offsets_where(field, evidence['key'], row_count)
+    else:
+        ioc = ioc_db.get(incident['ioc_id'])
+        if not ioc:
+            return jsonify({"error": "IoC no longer exists; trigger logs cannot be resolved"}), 404
+        # Re-correlate retained logs against the incident's IoC, even if it
+        # has since been marked a false positive
+        index = build_hunt_index([dict(ioc, false_positive=False)])
+        matcher = lambda segment, row_count: (offset for offset, _ in match_segment(index, segment, row_count)[0])
+    
+    logs, next_cursor = internal_logs_db.find(matcher, cursor, limit)
+    
+    return jsonify({
+        "incident_id": incident_id,
+        "trigger_count": incident.get('trigger_count', len(incident['trigger_logs'])),
+        "limit": limit,
+        "next_cursor": f"{next_cursor[0]}:{next_cursor[1]}" if next_cursor else None,
+        "logs": logs
+    })
+
 @opsec_bp.route('/incidents/<incident_id>/update', methods=['POST'])
 def update_incident(incident_id: str):
     """Update incident status"""
@@ -453,7 +1445,7 @@ def update_incident(incident_id: str):
         return jsonify({"error": "Incident not found"}), 404
     
     if 'status' in data:
-        incident['status'] = data['status']
+        set_incident_status(incident, data['status'])
         if data['status'] == IncidentStatus.RESOLVED.value:
             incident['resolved_at'] = datetime.now().isoformat()
         elif data['status'] == IncidentStatus.FALSE_POSITIVE.value:
@@ -470,6 +1462,7 @@ def update_incident(incident_id: str):
         })
     
     incident['updated_at'] = datetime.now().isoformat()
+    persist('incidents', incident_id)
     
     return jsonify({
         "incident_id": incident_id,
@@ -486,11 +1479,12 @@ def close_as_false_positive(incident_id: str):
     if not incident:
         return jsonify({"error": "Incident not found"}), 404
     
-    incident['status'] = IncidentStatus.FALSE_POSITIVE.value
+    set_incident_status(incident, IncidentStatus.FALSE_POSITIVE.value)
     incident['false_positive_reason'] = data.get('reason', 'Analyst determined false positive')
     incident['resolved_at'] = datetime.now().isoformat()
     incident['resolved_by'] = data.get('analyst', 'system')
     incident['updated_at'] = datetime.now().isoformat()
+    persist('incidents', incident_id)
     
     return jsonify({
         "incident_id": incident_id,
@@ -505,43 +1499,26 @@ def close_as_false_positive(incident_id: str):
 @opsec_bp.route('/dashboard/threats', methods=['GET'])
 def threat_dashboard():
     """Get threat intelligence dashboard"""
-    
-    # Count IoCs by type
-    ioc_type_counts = {}
-    for ioc in ioc_db.values():
-        ioc_type = ioc['type']
-        ioc_type_counts[ioc_type] = ioc_type_counts.get(ioc_type, 0) + 1
-    
-    # Count IoCs by severity
-    ioc_severity_counts = {}
-    for ioc in ioc_db.values():
-        sev = ioc['severity']
-        ioc_severity_counts[sev] = ioc_severity_counts.get(sev, 0) + 1
-    
-    # Incident stats
-    incident_status_counts = {}
-    for inc in incidents_db.values():
-        status = inc['status']
-        incident_status_counts[status] = incident_status_counts.get(status, 0) + 1
-    
-    # Recent incidents
-    recent_incidents = sorted(incidents_db.values(), 
-                            key=lambda x: x['created_at'], 
-                            reverse=True)[:10]
+    # Aggregates are maintained incrementally; this is O(1) in data size
+    with incident_lock:
+        recent_incidents = [incidents_db[incident_id]
+                            for incident_id in reversed(recent_incident_ids)
+                            if incident_id in incidents_db]
+        by_status = dict(incident_status_counts)
     
     return jsonify({
         "summary": {
             "total_iocs": len(ioc_db),
             "total_incidents": len(incidents_db),
-            "open_incidents": incident_status_counts.get(IncidentStatus.OPEN.value, 0),
+            "open_incidents": by_status.get(IncidentStatus.OPEN.value, 0),
             "critical_threats": ioc_severity_counts.get(ThreatSeverity.CRITICAL.value, 0)
         },
         "ioc_breakdown": {
-            "by_type": ioc_type_counts,
-            "by_severity": ioc_severity_counts
+            "by_type": dict(ioc_type_counts),
+            "by_severity": dict(ioc_severity_counts)
         },
         "incidents": {
-            "by_status": incident_status_counts,
+            "by_status": by_status,
             "recent": recent_incidents
         },
         "feeds": {
@@ -550,8 +1527,111 @@ def threat_dashboard():
         }
     })
 
+# ============================================================================
+# PERSISTENCE & WARM START
+# ============================================================================
+
+def serialized_loader(db: Dict[str, dict], lock):
+    """Loader for OpsecStore.flush: JSON of db[key] taken under lock"""
+    def load(key: str) -> Optional[str]:
+        with lock:
+            item = db.get(key)
+            return json.dumps(item, default=str) if item is not None else None
+    return load
+
+PERSIST_LOADERS = {
+    "iocs": serialized_loader(ioc_db, ioc_lock),
+    "incidents": serialized_loader(incidents_db, incident_lock),
+    "feeds": serialized_loader(cti_feeds_db, threading.RLock())
+}
+
+def load_persisted_state():
+    """Bulk-load the durable store and rebuild every index in one pass"""
+    started = time.monotonic()
+    
+    with ioc_lock:
+        for ioc in opsec_store.load('iocs'):
+            ioc_db[ioc['ioc_id']] = ioc
+            ioc_search_index.add(ioc)
+            bump_count(ioc_type_counts, ioc['type'])
+            bump_count(ioc_severity_counts, ioc['severity'])
+            if ioc.get('expires_at'):
+                # Already-lapsed IoCs are dropped on the first sweep
+                ioc_expiry_wheel.schedule(ioc['ioc_id'], datetime.fromisoformat(ioc['expires_at']).timestamp())
+        correlation_index.rebuild(ioc_db.values())
+        for ioc in ioc_db.values():
+            ioc_graph.add(ioc)
+    
+    with incident_lock:
+        for incident in opsec_store.load('incidents'):
+            sample = incident['trigger_logs']
+            if len(sample) > TRIGGER_LOG_SAMPLE_SIZE:
+                # Stored before trigger_logs was bounded
+                incident['trigger_count'] = max(incident.get('trigger_count', 0), len(sample))
+                incident['trigger_logs'] = random.sample(sample, TRIGGER_LOG_SAMPLE_SIZE)
+                persist('incidents', incident['incident_id'])
+            incidents_db[incident['incident_id']] = incident
+            incident_list_index.add(incident)
+            bump_count(incident_status_counts, incident['status'])
+            sync_open_incident_index(incident)
+        for incident in sorted(incidents_db.values(), key=lambda x: x['created_at'])[-RECENT_INCIDENTS_LIMIT:]:
+            recent_incident_ids.append(incident['incident_id'])
+    
+    for feed in opsec_store.load('feeds'):
+        cti_feeds_db[feed['feed_id']] = feed
+        if feed.pop('api_key', None) is not None:
+            # Written before keys moved to the environment; drop it from disk
+            persist('feeds', feed['feed_id'])
+    
+    print(f"[OPSEC] Warm start: {len(ioc_db)} IoCs, {len(incidents_db)} incidents, "
+          f"{len(cti_feeds_db)} feeds in {time.monotonic() - started:.2f}s")
+
+def init_persistence():
+    """Open the store and warm-start from it"""
+    global opsec_store
+    if not OPSEC_DB_PATH or opsec_store is not None:
+        return
+    opsec_store = OpsecStore(OPSEC_DB_PATH, flush_interval=PERSIST_FLUSH_SECONDS)
+    load_persisted_state()
+
+def start_persist_flushing():
+    """Start write-behind flushing of the store (no-op when persistence is off)"""
+    if opsec_store is None:
+        return
+    opsec_store.start(PERSIST_LOADERS)
+    atexit.register(lambda: opsec_store.flush(PERSIST_LOADERS))
+
+@opsec_bp.route('/persistence', methods=['GET'])
+def persistence_status():
+    """Durable store size, pending writes and flush/checkpoint counters"""
+    if opsec_store is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **opsec_store.info()})
+
+@opsec_bp.route('/persistence/snapshot', methods=['POST'])
+def persistence_snapshot():
+    """Flush pending writes and compact the store into a single file"""
+    if opsec_store is None:
+        return jsonify({"error": "Persistence is disabled"}), 400
+    written, deleted = opsec_store.flush(PERSIST_LOADERS)
+    opsec_store.compact()
+    return jsonify({
+        "written": written,
+        "deleted": deleted,
+        **opsec_store.info()
+    })
+
 # Register routes with app
 def register_opsec_routes(app):
     """Register OPSEC Blueprint with Flask app"""
     app.register_blueprint(opsec_bp)
+    init_persistence()
+    if CORRELATION_PROCESSES > 0:
+        # Fork the workers now, seeded with the warm-started IoCs, while this
+        # process has no other threads (not lazily from a request thread)
+        correlation_pipeline.start()
+    start_persist_flushing()
+    start_ioc_expiry()
+    start_syslog_listener()
+    start_feed_polling()
     print("[OPSEC] Security Overlay module registered successfully")
@@ -0,0 +1,593 @@
+"""
+OPSEC BENCH - Correlation Benchmarks
+====================================
+Stand-alone timing harness for the OPSEC correlation indexes, plus an
+end-to-end load generator for the ingest endpoints.
+
+Usage:
+    python opsec_bench.py domains [--sizes 10000 100000 1000000]
+    python opsec_bench.py classify [--count 200000]
+    python opsec_bench.py rules [--logs 500000]
+    python opsec_bench.py shards [--workers 1 2 4 8]
+    python opsec_bench.py ingest [--iocs 100000] [--match-rate 0.01]
+    python opsec_bench.py suite --output results.json [--iocs 10000 100000 1000000]
+    python opsec_bench.py compare base.json new.json [--threshold 0.10]
+
+ingest drives /api/opsec/ioc/ingest and /api/opsec/logs/ingest through
+the Flask test client (full request handling, no sockets), so numbers are
+reproducible on one machine. suite runs each configuration in a fresh
+process and writes machine-readable results that compare can diff
+between commits.
+
+benchmarks/opsec_ingest_baseline.json is the committed baseline (1 vCPU,
+inline correlation), produced with:
+    python opsec_bench.py suite --iocs 10000 100000 --repeat 3 \
+        --output benchmarks/opsec_ingest_baseline.json
+Re-run the same command on the same machine into another file and
+compare it against the baseline; numbers from other hardware are not
+comparable.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import resource
+import string
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from opsec_index import AhoCorasick
+
+TLDS = ["com", "net", "org", "io", "ru", "cn", "info", "biz", "xyz", "top"]
+
+# Naive scans above this size take minutes and add nothing to the comparison
+NAIVE_SCAN_LIMIT = 100000
+
+
+def synthetic_domains(count: int, seed: int = 7) -> List[str]:
+    """Generate unique random domain indicators"""
+    rng = random.Random(seed)
+    domains = set()
+    while len(domains) < count:
+        label = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(6, 14)))
+        domains.add(f"{label}.{rng.choice(TLDS)}")
+    return list(domains)
+
+
+def synthetic_messages(domains: List[str], count: int, match_rate: float, seed: int = 11) -> List[str]:
+    """Generate log messages, a match_rate share of which mention a known domain"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        host = rng.choice(domains) if rng.random() < match_rate else "intranet.example.local"
+        messages.append(f"GET https://cdn.{host}/assets/app.js 200 ua=Mozilla/5.0 bytes={rng.randint(100, 90000)}")
+    return messages
+
+
+def bench_domains(sizes: List[int], messages: int, match_rate: float):
+    """Aho-Corasick vs per-indicator substring scan"""
+    print(f"{'domains':>10} {'build_s':>9} {'states':>10} {'ac_msg/s':>12} {'naive_msg/s':>12}")
+    for size in sizes:
+        domains = synthetic_domains(size)
+        sample = synthetic_messages(domains, messages, match_rate)
+
+        start = time.perf_counter()
+        automaton = AhoCorasick(domains)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for message in sample:
+            automaton.find(message)
+        ac_rate = len(sample) / (time.perf_counter() - start)
+
+        naive_rate = "-"
+        if size <= NAIVE_SCAN_LIMIT:
+            naive_sample = sample[:max(1, len(sample) // 20)]
+            start = time.perf_counter()
+            for message in naive_sample:
+                [d for d in domains if d in message]
+            naive_rate = f"{len(naive_sample) / (time.perf_counter() - start):.0f}"
+
+        print(f"{size:>10} {build_s:>9.2f} {len(automaton):>10} {ac_rate:>12.0f} {naive_rate:>12}")
+
+
+def legacy_parse_ioc_type(indicator: str) -> Optional[str]:
+    """parse_ioc_type as it was before the compiled classifier (baseline)"""
+    if re.match(r'^(\d{1,3}\.){3}\d{1,3}$', indicator):
+        return "ip"
+    if re.match(r'^https?://', indicator):
+        return "url"
+    if re.match(r'^[a-zA-Z0-9][a-zA-Z0-9-]{0,61}[a-zA-Z0-9]?\.[a-zA-Z]{2,}$', indicator):
+        return "domain"
+    if re.match(r'^[a-fA-F0-9]{32}$', indicator):
+        return "file_hash"
+    if re.match(r'^[a-fA-F0-9]{40}$', indicator):
+        return "file_hash"
+    if re.match(r'^[a-fA-F0-9]{64}$', indicator):
+        return "file_hash"
+    if re.match(r'^CVE-\d{4}-\d{4,}$', indicator):
+        return "cve"
+    return None
+
+
+def synthetic_indicators(count: int, seed: int = 5) -> List[str]:
+    """Feed-like mix of IPs, domains, URLs, hashes, CVEs and junk"""
+    rng = random.Random(seed)
+    hexdigits = "0123456789abcdef"
+    makers = [
+        lambda: ".".join(str(rng.randint(1, 254)) for _ in range(4)),
+        lambda: f"{''.join(rng.choices(string.ascii_lowercase, k=10))}.{rng.choice(TLDS)}",
+        lambda: f"https://{''.join(rng.choices(string.ascii_lowercase, k=8))}.com/p/{rng.randint(1, 9999)}",
+        lambda: ''.join(rng.choices(hexdigits, k=rng.choice([32, 40, 64]))),
+        lambda: f"CVE-20{rng.randint(10, 25)}-{rng.randint(1000, 99999)}",
+        lambda: ''.join(rng.choices(string.ascii_letters + " _", k=12)),
+    ]
+    return [rng.choice(makers)() for _ in range(count)]
+
+
+def bench_classify(count: int):
+    """Compiled single-pass classifier vs the legacy per-type re.match chain"""
+    from opsec import classify_iocs, parse_ioc_type
+
+    indicators = synthetic_indicators(count)
+    rows = [
+        ("legacy parse_ioc_type", lambda: [legacy_parse_ioc_type(i) for i in indicators]),
+        ("parse_ioc_type", lambda: [parse_ioc_type(i) for i in indicators]),
+        ("classify_iocs (batch)", lambda: classify_iocs(indicators)),
+    ]
+    print(f"{'implementation':<24} {'seconds':>8} {'indicators/s':>14}")
+    for name, run in rows:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {elapsed:>8.3f} {count / elapsed:>14.0f}")
+
+
+def synthetic_rule_logs(count: int, rate: float, match_rate: float, seed: int = 13) -> List[tuple]:
+    """(log, epoch, matched IoC severities) arriving at `rate` logs/sec"""
+    rng = random.Random(seed)
+    sources = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(20000)]
+    destinations = [f"203.0.113.{i}" for i in range(1, 255)] + [f"198.51.100.{i}" for i in range(1, 255)]
+    start = time.time()
+    events = []
+    for i in range(count):
+        log = {"source_ip": rng.choice(sources), "destination_ip": rng.choice(destinations)}
+        severities = [rng.choice(("medium", "high", "critical"))] if rng.random() < match_rate else []
+        events.append((log, start + i / rate, severities))
+    return events
+
+
+def bench_rules(count: int, rate: float, match_rate: float):
+    """Threshold rule engine throughput with the default rule set"""
+    from opsec import DEFAULT_THRESHOLD_RULES
+    from opsec_rules import RuleEngine
+
+    fired = []
+    engine = RuleEngine(DEFAULT_THRESHOLD_RULES, on_fire=lambda rule, evidence, log: fired.append(evidence))
+    events = synthetic_rule_logs(count, rate, match_rate)
+
+    start = time.perf_counter()
+    for log, epoch, severities in events:
+        engine.observe(log, epoch, severities)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'logs':>10} {'seconds':>8} {'logs/s':>10} {'alerts':>8}  tracked keys")
+    tracked = ", ".join(f"{rule['rule_id']}={rule['tracked_keys']}" for rule in engine.rules())
+    print(f"{count:>10} {elapsed:>8.2f} {count / elapsed:>10.0f} {len(fired):>8}  {tracked}")
+
+
+def synthetic_ioc_docs(ip_count: int, domain_count: int) -> List[dict]:
+    """IoC records (as stored in ioc_db) for IP and domain indicators"""
+    rng = random.Random(17)
+    ips = {f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+           for _ in range(ip_count)}
+    docs = [{"ioc_id": f"ip{i}", "indicator": ip, "type": "ip"} for i, ip in enumerate(ips)]
+    docs += [{"ioc_id": f"dom{i}", "indicator": domain, "type": "domain"}
+             for i, domain in enumerate(synthetic_domains(domain_count))]
+    return docs
+
+
+def synthetic_correlation_logs(iocs: List[dict], count: int, match_rate: float, seed: int = 19) -> List[dict]:
+    """Logs from many sources; a match_rate share hit an IoC IP or domain"""
+    rng = random.Random(seed)
+    ips = [ioc['indicator'] for ioc in iocs if ioc['type'] == 'ip']
+    domains = [ioc['indicator'] for ioc in iocs if ioc['type'] == 'domain']
+    logs = []
+    for _ in range(count):
+        host = "intranet.example.local"
+        destination = f"172.16.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        if rng.random() < match_rate:
+            if rng.random() < 0.5 and ips:
+                destination = rng.choice(ips)
+            elif domains:
+                host = rng.choice(domains)
+        logs.append({
+            "source_ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "destination_ip": destination,
+            "message": f"GET https://{host}/index.html 200 bytes={rng.randint(100, 90000)}",
+            "metadata": {}
+        })
+    return logs
+
+
+def bench_shards(worker_counts: List[int], count: int, ip_iocs: int, domain_iocs: int, match_rate: float):
+    """Multi-process sharded correlation throughput vs in-process matching"""
+    from opsec_index import CorrelationIndex
+    from opsec_shard import ShardedCorrelator
+
+    iocs = synthetic_ioc_docs(ip_iocs, domain_iocs)
+    logs = synthetic_correlation_logs(iocs, count, match_rate)
+    batch = 5000
+
+    index = CorrelationIndex()
+    index.rebuild(iocs)
+    start = time.perf_counter()
+    matched = sum(1 for log in logs if index.match(log))
+    baseline = count / (time.perf_counter() - start)
+
+    print(f"{'workers':>8} {'logs/s':>10} {'speedup':>8} {'matched':>8}")
+    print(f"{'inline':>8} {baseline:>10.0f} {1.0:>8.2f} {matched:>8}")
+    for workers in worker_counts:
+        hits = []
+        correlator = ShardedCorrelator(lambda log, matches: matches and hits.append(1), lambda: iocs,
+                                       workers=workers, capacity=batch * 4)
+        correlator.start()
+        start = time.perf_counter()
+        for offset in range(0, count, batch):
+            correlator.submit(logs[offset:offset + batch], block=True)
+        correlator.join()
+        rate = count / (time.perf_counter() - start)
+        correlator.stop()
+        print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>8.2f} {len(hits):>8}")
+
+
+# Default indicator mix of the synthetic IoC feed
+DEFAULT_IOC_MIX = "ip=0.5,domain=0.3,hash=0.2"
+
+# Metrics compare checks, and whether larger values are better
+COMPARED_METRICS = {
+    "ioc_ingest.indicators_per_second": True,
+    "log_ingest.logs_per_second": True,
+    "log_ingest.latency_p50_ms": False,
+    "log_ingest.latency_p99_ms": False,
+    "memory.peak_rss_mb": False,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'ip=0.5,domain=0.3,hash=0.2' -> normalised shares"""
+    shares = {}
+    for part in mix.split(","):
+        kind, _, share = part.partition("=")
+        if kind.strip() not in ("ip", "domain", "hash"):
+            raise ValueError(f"unknown indicator kind {kind!r} (ip, domain, hash)")
+        shares[kind.strip()] = float(share)
+    total = sum(shares.values())
+    if total <= 0:
+        raise ValueError("indicator mix must have a positive share")
+    return {kind: share / total for kind, share in shares.items()}
+
+
+def synthetic_feed(count: int, mix: Dict[str, float], seed: int = 23) -> Dict[str, List[str]]:
+    """Unique IP / domain / SHA-256 indicators in the given proportions"""
+    rng = random.Random(seed)
+    ip_count = int(count * mix.get("ip", 0))
+    hash_count = int(count * mix.get("hash", 0))
+    domain_count = count - ip_count - hash_count
+    ips = set()
+    while len(ips) < ip_count:
+        ips.add(f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}")
+    return {
+        "ip": sorted(ips),
+        "domain": synthetic_domains(domain_count, seed) if domain_count else [],
+        "hash": [hashlib.sha256(f"{seed}:{i}".encode()).hexdigest() for i in range(hash_count)]
+    }
+
+
+def synthetic_ingest_logs(feed: Dict[str, List[str]], count: int, match_rate: float,
+                          seed: int = 29) -> List[dict]:
+    """/logs/ingest entries; a match_rate share carries one feed indicator"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, values in feed.items() if values]
+    logs = []
+    for _ in range(count):
+        destination = f"172.16.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        host = "intranet.example.local"
+        digest = ""
+        if kinds and rng.random() < match_rate:
+            kind = rng.choice(kinds)
+            value = rng.choice(feed[kind])
+            if kind == "ip":
+                destination = value
+            elif kind == "domain":
+                host = value
+            else:
+                digest = f" sha256={value}"
+        logs.append({
+            "source_ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "destination_ip": destination,
+            "action": "allow",
+            "message": f"GET https://{host}/index.html 200 bytes={rng.randint(100, 90000)}{digest}"
+        })
+    return logs
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of unsorted values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size (Linux /proc; None elsewhere)"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return round(int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return round(peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def timed_requests(client, path: str, batches: List[list], key: str) -> dict:
+    """POST each batch as {key: batch}; per-request latency and status counts"""
+    latencies = []
+    statuses: Dict[str, int] = {}
+    start = time.perf_counter()
+    for batch in batches:
+        sent = time.perf_counter()
+        response = client.post(path, json={key: batch})
+        latencies.append((time.perf_counter() - sent) * 1000)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(batches),
+        "seconds": round(elapsed, 4),
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p99_ms": round(percentile(latencies, 99), 3),
+        "latency_max_ms": round(max(latencies, default=0.0), 3),
+        "status_codes": statuses
+    }
+
+
+def bench_ingest(ioc_count: int, mix: str, log_count: int, match_rate: float, ioc_batch: int,
+                 log_batch: int, mode: str, retrohunt: bool) -> dict:
+    """End-to-end IoC feed + log ingest through the OPSEC Flask routes"""
+    # Configure the module before it is imported
+    os.environ.update({
+        "OPSEC_DB_PATH": "",
+        "OPSEC_FEED_POLLING_ENABLED": "false",
+        "OPSEC_SYSLOG_ENABLED": "false",
+        "OPSEC_RETROHUNT_ENABLED": "true" if retrohunt else "false",
+        "OPSEC_INGEST_BACKPRESSURE": "block",
+        "OPSEC_CORRELATION_WORKERS": "2" if mode == "threads" else "0",
+        "OPSEC_CORRELATION_PROCESSES": str(os.cpu_count() or 1) if mode == "processes" else "0",
+    })
+    from flask import Flask
+    import opsec
+
+    app = Flask(__name__)
+    opsec.register_opsec_routes(app)
+    client = app.test_client()
+    shares = parse_mix(mix)
+    feed = synthetic_feed(ioc_count, shares)
+    indicators = [value for values in feed.values() for value in values]
+    random.Random(31).shuffle(indicators)
+    logs = synthetic_ingest_logs(feed, log_count, match_rate)
+    rss_start = rss_mb()
+
+    ioc_result = timed_requests(client, "/api/opsec/ioc/ingest",
+                                [indicators[i:i + ioc_batch] for i in range(0, len(indicators), ioc_batch)],
+                                "indicators")
+    ioc_result["indicators_per_second"] = round(len(indicators) / ioc_result["seconds"]) if indicators else 0
+    rss_iocs = rss_mb()
+
+    log_batches = [logs[i:i + log_batch] for i in range(0, len(logs), log_batch)]
+    start = time.perf_counter()
+    log_result = timed_requests(client, "/api/opsec/logs/ingest", log_batches, "logs")
+    # Asynchronous correlation is only done once the queue has drained
+    opsec.correlation_pipeline.join()
+    drained = time.perf_counter() - start
+    log_result.update(drain_seconds=round(drained, 4),
+                      logs_per_second=round(len(logs) / drained) if logs else 0,
+                      incidents=len(opsec.incidents_db))
+    opsec.correlation_pipeline.stop()
+
+    return {
+        "config": {
+            "iocs": ioc_count, "ioc_mix": {kind: round(share, 4) for kind, share in shares.items()},
+            "logs": log_count, "match_rate": match_rate, "ioc_batch": ioc_batch,
+            "log_batch": log_batch, "mode": mode, "retrohunt": retrohunt
+        },
+        "ioc_ingest": {"indicators": len(indicators), "stored": len(opsec.ioc_db), **ioc_result},
+        "log_ingest": {"logs": log_count, **log_result},
+        "memory": {
+            "rss_start_mb": rss_start,
+            "rss_after_iocs_mb": rss_iocs,
+            "rss_end_mb": rss_mb(),
+            "peak_rss_mb": peak_rss_mb()
+        }
+    }
+
+
+def median_result(runs: List[dict]) -> dict:
+    """First run with every compared metric replaced by its median over runs"""
+    result = json.loads(json.dumps(runs[0]))
+    for path in COMPARED_METRICS:
+        section, _, name = path.partition(".")
+        values = sorted(run[section][name] for run in runs if run[section].get(name) is not None)
+        if values:
+            result[section][name] = values[len(values) // 2]
+    result["config"]["repeats"] = len(runs)
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> dict:
+    """Each configuration in a fresh interpreter (clean module state and RSS)"""
+    results = []
+    for ioc_count in args.iocs:
+        for match_rate in args.match_rates:
+            command = [sys.executable, os.path.abspath(__file__), "ingest", "--json",
+                       "--iocs", str(ioc_count), "--mix", args.mix, "--logs", str(args.logs),
+                       "--match-rate", str(match_rate), "--ioc-batch", str(args.ioc_batch),
+                       "--log-batch", str(args.log_batch), "--mode", args.mode]
+            if args.retrohunt:
+                command.append("--retrohunt")
+            runs = []
+            for _ in range(args.repeat):
+                completed = subprocess.run(command, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"ingest run failed ({ioc_count} IoCs):\n{completed.stderr}")
+                runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            result = median_result(runs)
+            results.append(result)
+            print(f"{ioc_count:>9} IoCs  match {match_rate:<6} "
+                  f"{result['ioc_ingest']['indicators_per_second']:>8} ioc/s  "
+                  f"{result['log_ingest']['logs_per_second']:>8} logs/s  "
+                  f"p50 {result['log_ingest']['latency_p50_ms']:>8.2f} ms  "
+                  f"p99 {result['log_ingest']['latency_p99_ms']:>8.2f} ms  "
+                  f"peak {result['memory']['peak_rss_mb']:>7} MB", file=sys.stderr)
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+
+def _metric(result: dict, path: str) -> Optional[float]:
+    section, _, name = path.partition(".")
+    return result.get(section, {}).get(name)
+
+
+def _config_key(result: dict) -> str:
+    config = result["config"]
+    return f"iocs={config['iocs']} match={config['match_rate']} mode={config['mode']}"
+
+
+def compare_results(base: dict, new: dict, threshold: float) -> int:
+    """Print per-metric changes; returns the number of regressions past threshold"""
+    base_runs = {_config_key(result): result for result in base["results"]}
+    regressions = 0
+    print(f"base {base['meta'].get('revision')} -> new {new['meta'].get('revision')}")
+    for result in new["results"]:
+        key = _config_key(result)
+        if key not in base_runs:
+            print(f"{key}: no baseline")
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            before, after = _metric(base_runs[key], path), _metric(result, path)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{key} {path:<36} {before:>12} -> {after:>12} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OPSEC correlation benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    domains = sub.add_parser("domains", help="domain matching in log messages")
+    domains.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    domains.add_argument("--messages", type=int, default=20000)
+    domains.add_argument("--match-rate", type=float, default=0.01)
+
+    classify = sub.add_parser("classify", help="IoC type classification")
+    classify.add_argument("--count", type=int, default=200000)
+
+    rules = sub.add_parser("rules", help="sliding-window threshold rules")
+    rules.add_argument("--logs", type=int, default=500000)
+    rules.add_argument("--rate", type=float, default=50000, help="simulated event rate (logs/s of event time)")
+    rules.add_argument("--match-rate", type=float, default=0.01)
+
+    shards = sub.add_parser("shards", help="multi-process sharded correlation")
+    shards.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    shards.add_argument("--logs", type=int, default=200000)
+    shards.add_argument("--ip-iocs", type=int, default=100000)
+    shards.add_argument("--domain-iocs", type=int, default=10000)
+    shards.add_argument("--match-rate", type=float, default=0.01)
+
+    def add_ingest_options(command, sizes):
+        command.add_argument("--iocs", type=int, nargs=sizes, default=[10000, 100000] if sizes else 100000)
+        command.add_argument("--mix", default=DEFAULT_IOC_MIX, help="indicator shares, e.g. ip=0.5,domain=0.3,hash=0.2")
+        command.add_argument("--logs", type=int, default=100000)
+        command.add_argument("--ioc-batch", type=int, default=5000, help="indicators per /ioc/ingest request")
+        command.add_argument("--log-batch", type=int, default=100, help="logs per /logs/ingest request")
+        command.add_argument("--mode", choices=["inline", "threads", "processes"], default="inline",
+                             help="correlation mode (OPSEC_CORRELATION_WORKERS / _PROCESSES)")
+        command.add_argument("--retrohunt", action="store_true", help="keep retro-hunts of new IoCs running")
+
+    ingest = sub.add_parser("ingest", help="end-to-end /ioc/ingest + /logs/ingest load (one configuration)")
+    add_ingest_options(ingest, None)
+    ingest.add_argument("--match-rate", type=float, default=0.01)
+    ingest.add_argument("--json", action="store_true", help="print the result as one JSON line")
+
+    suite = sub.add_parser("suite", help="ingest across IoC sizes and match rates, written as JSON")
+    add_ingest_options(suite, "+")
+    suite.add_argument("--match-rates", type=float, nargs="+", default=[0.001, 0.01, 0.1])
+    suite.add_argument("--repeat", type=int, default=3, help="runs per configuration (medians are reported)")
+    suite.add_argument("--output", required=True, help="results file (JSON)")
+
+    compare = sub.add_parser("compare", help="diff two suite result files")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+
+    args = parser.parse_args()
+    if args.bench == "ingest":
+        result = bench_ingest(args.iocs, args.mix, args.logs, args.match_rate, args.ioc_batch,
+                              args.log_batch, args.mode, args.retrohunt)
+        print(json.dumps(result) if args.json else json.dumps(result, indent=2))
+    elif args.bench == "suite":
+        report = run_suite(args)
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+    elif args.bench == "compare":
+        with open(args.base) as base, open(args.new) as new:
+            regressions = compare_results(json.load(base), json.load(new), args.threshold)
+        sys.exit(1 if regressions else 0)
+    elif args.bench == "domains":
+        bench_domains(args.sizes, args.messages, args.match_rate)
+    elif args.bench == "classify":
+        bench_classify(args.count)
+    elif args.bench == "rules":
+        bench_rules(args.logs, args.rate, args.match_rate)
+    elif args.bench == "shards":
+        bench_shards(args.workers, args.logs, args.ip_iocs, args.domain_iocs, args.match_rate)
+
+
+if __name__ == "__main__":
+    main()
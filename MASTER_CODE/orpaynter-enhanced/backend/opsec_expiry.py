@@ -0,0 +1,126 @@
+"""
+OPSEC EXPIRY - Hierarchical Timing Wheel
+========================================
+Schedules IoC expiry deadlines so that ageing out indicators costs
+amortised O(1) per indicator instead of periodic full scans.
+
+Features:
+- Hierarchical wheel (64 slots per level) with cascading
+- O(1) schedule / reschedule (stale entries are skipped lazily)
+- Cancel by key
+- Batch advance returning every key whose deadline has passed
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+
+
+class TimingWheel:
+    """
+    Level L covers deadlines up to 64^(L+1) ticks ahead; each level-L slot
+    spans 64^L ticks and is cascaded into lower levels as time reaches it.
+    Deadlines beyond the top level are parked in its furthest slot and
+    re-cascaded until they come into range.
+    """
+
+    def __init__(self, tick_seconds: float = 60.0, levels: int = 4, now: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        self.levels = levels
+        self._lock = threading.RLock()
+        self._wheels: List[List[List[Tuple[str, int]]]] = [
+            [[] for _ in range(SLOTS)] for _ in range(levels)
+        ]
+        self._deadlines: Dict[str, int] = {}
+        self._current = self._tick(time.time() if now is None else now)
+        self.expired_total = 0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def _tick(self, when: float) -> int:
+        return int(when // self.tick_seconds)
+
+    def _place(self, key: str, deadline: int):
+        delta = max(deadline - self._current, 0)
+        for level in range(self.levels):
+            if delta < SLOTS ** (level + 1):
+                slot = (deadline >> (SLOT_BITS * level)) & SLOT_MASK
+                self._wheels[level][slot].append((key, deadline))
+                return
+        # Out of range: park just behind the top level's cursor
+        top = self.levels - 1
+        slot = ((self._current >> (SLOT_BITS * top)) - 1) & SLOT_MASK
+        self._wheels[top][slot].append((key, deadline))
+
+    def schedule(self, key: str, expires_at: float):
+        """Set (or move) the expiry of key to the epoch time expires_at"""
+        deadline = max(self._tick(expires_at), self._current + 1)
+        with self._lock:
+            self._deadlines[key] = deadline
+            self._place(key, deadline)
+
+    def cancel(self, key: str):
+        """Forget key; its slot entry is dropped when reached"""
+        with self._lock:
+            self._deadlines.pop(key, None)
+
+    def deadline(self, key: str) -> Optional[float]:
+        tick = self._deadlines.get(key)
+        return None if tick is None else tick * self.tick_seconds
+
+    def advance(self, now: Optional[float] = None) -> List[str]:
+        """Move the wheel to now and return keys that expired on the way"""
+        target = self._tick(time.time() if now is None else now)
+        expired: List[str] = []
+        with self._lock:
+            while self._current < target:
+                self._current += 1
+                tick = self._current
+                # Cascade higher levels whose slot boundary we just crossed
+                for level in range(1, self.levels):
+                    if tick & ((1 << (SLOT_BITS * level)) - 1):
+                        break
+                    slot = (tick >> (SLOT_BITS * level)) & SLOT_MASK
+                    entries = self._wheels[level][slot]
+                    self._wheels[level][slot] = []
+                    for key, deadline in entries:
+                        if self._deadlines.get(key) == deadline:
+                            if deadline <= tick:
+                                self._expire(key, expired)
+                            else:
+                                self._place(key, deadline)
+
+                slot = tick & SLOT_MASK
+                entries = self._wheels[0][slot]
+                self._wheels[0][slot] = []
+                for key, deadline in entries:
+                    if self._deadlines.get(key) != deadline:
+                        continue  # rescheduled or cancelled
+                    if deadline <= tick:
+                        self._expire(key, expired)
+                    else:
+                        self._place(key, deadline)
+        return expired
+
+    def _expire(self, key: str, expired: List[str]):
+        del self._deadlines[key]
+        expired.append(key)
+        self.expired_total += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "scheduled": len(self._deadlines),
+                "slot_entries": sum(len(slot) for wheel in self._wheels for slot in wheel),
+                "tick_seconds": self.tick_seconds,
+                "levels": self.levels,
+                "expired_total": self.expired_total
+            }
@@ -0,0 +1,695 @@
+"""
+OPSEC FEEDS - CTI Feed Polling Scheduler
+========================================
+Fetches enabled CTI feeds on their update interval and turns each fetch
+into an incremental diff of indicators.
+
+Features:
+- Scheduler thread dispatching due feeds to a bounded worker pool
+- Conditional requests (ETag / If-Modified-Since); 304s skip parsing
+- gzip transfer encoding
+- Streaming STIX 2.1 / CSV parsers: documents are consumed chunk by chunk,
+  so memory is bounded by one chunk plus one STIX object or CSV line
+- Added / removed indicator diffs against the previous fetch
+- Per-feed latency, throughput and error metrics with failure backoff
+- Only http(s) endpoints on public addresses are fetched (redirects are
+  re-checked); API keys come from OPSEC_FEED_KEY_* environment variables
+- Stand-alone HTTP stand-in for local testing, and a parser benchmark:
+    python opsec_feeds.py serve --dir ./feeds --port 8765
+    (poll it from OPSEC with OPSEC_FEED_ALLOW_PRIVATE_HOSTS=true)
+    python opsec_feeds.py parse --format stix bundle.json.gz
+"""
+
+import argparse
+import codecs
+import csv
+import gzip
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+from urllib.parse import urlsplit
+
+# Feed bodies larger than this (after decompression) are rejected
+MAX_FEED_BYTES = 256 * 1024 * 1024
+# Feeds are read in chunks of this size
+FEED_CHUNK_SIZE = 64 * 1024
+# Longer CSV lines are skipped; larger STIX objects abort the parse
+MAX_CSV_LINE_CHARS = 64 * 1024
+MAX_STIX_OBJECT_CHARS = 16 * 1024 * 1024
+
+# Values compared in STIX patterns: [ipv4-addr:value = '203.0.113.7'],
+# [ipv4-addr:value ISSUBSET '198.51.100.0/24'] (not !=, <=, LIKE, MATCHES)
+STIX_PATTERN_VALUE = re.compile(r"(?:(?<![!<>])=|\bISSUBSET)\s*'((?:[^'\\]|\\.)*)'")
+STIX_ESCAPE = re.compile(r"\\(['\\])")
+
+# Keys under which JSON API feeds commonly wrap their indicator lists
+API_LIST_KEYS = ("indicators", "results", "data", "objects")
+
+Column = Union[int, str]
+
+# Feed api_key_env values must name a variable with this prefix, so a feed
+# record cannot send arbitrary process secrets to its endpoint
+FEED_KEY_ENV_PREFIX = "OPSEC_FEED_KEY_"
+
+
+def check_feed_endpoint(url: str, allow_private: bool = False) -> Optional[str]:
+    """
+    Why url may not be fetched, or None when it may: the scheme must be
+    http(s) and, unless allow_private, every address the host resolves to
+    must be public (no loopback, private, link-local or metadata ranges).
+    """
+    try:
+        parts = urlsplit(url or '')
+        port = parts.port
+    except ValueError:
+        return "endpoint is not a valid URL"
+    if parts.scheme.lower() not in ('http', 'https'):
+        return "endpoint must be an http or https URL"
+    if not parts.hostname:
+        return "endpoint has no host"
+    if allow_private:
+        return None
+    try:
+        infos = socket.getaddrinfo(parts.hostname, port or (443 if parts.scheme.lower() == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        # Unresolvable now; checked again before every fetch
+        return None
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%', 1)[0])
+        mapped = getattr(address, 'ipv4_mapped', None)
+        if not (mapped or address).is_global:
+            return f"endpoint host {parts.hostname} resolves to non-public address {address}"
+    return None
+
+
+def feed_api_key(feed: dict) -> Optional[str]:
+    """The feed's API key, read from the environment variable it names"""
+    name = feed.get("api_key_env")
+    if not name or not name.startswith(FEED_KEY_ENV_PREFIX):
+        return None
+    return os.environ.get(name)
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Re-checks every redirect target; drops the API key on cross-host hops"""
+
+    def __init__(self, allow_private: bool, key_header: Optional[str]):
+        self.allow_private = allow_private
+        self.key_header = key_header
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        error = check_feed_endpoint(newurl, self.allow_private)
+        if error:
+            raise urllib.error.HTTPError(newurl, code, f"redirect refused: {error}", headers, fp)
+        new_request = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if new_request is not None and self.key_header and \
+                urlsplit(newurl).hostname != urlsplit(req.full_url).hostname:
+            new_request.remove_header(self.key_header.capitalize())
+        return new_request
+
+
+def iter_file_chunks(stream, chunk_size: int = FEED_CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a binary file object in fixed-size chunks"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Decode UTF-8 chunks into lines (newline kept); over-long lines are dropped"""
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    buffer = ""
+    skipping = False
+    for chunk in chunks:
+        lines = (buffer + decoder.decode(chunk)).splitlines(keepends=True)
+        buffer = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            yield line
+        if len(buffer) > MAX_CSV_LINE_CHARS:
+            skipping = True
+            buffer = ""
+    buffer += decoder.decode(b"", final=True)
+    if buffer and not skipping:
+        yield buffer
+
+
+def _column_index(names: List[str], column: str) -> Optional[int]:
+    wanted = column.strip().lower()
+    for index, name in enumerate(names):
+        if name.strip().strip('"').lower() == wanted:
+            return index
+    return None
+
+
+def iter_csv_indicators(chunks: Iterable[bytes], column: Column = 0) -> Iterator[str]:
+    """
+    Indicators from one CSV column. column is an index or a header name;
+    names are looked up in the first data row or, abuse.ch style, in the
+    last '#' comment line before the data.
+    """
+    state = {"comment": None}
+
+    def data_lines():
+        for line in iter_lines(chunks):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith(("#", "//")):
+                state["comment"] = stripped.lstrip("#/ ")
+                continue
+            yield line
+
+    index = column if isinstance(column, int) else None
+    for row in csv.reader(data_lines()):
+        if index is None:
+            index = _column_index(row, column)
+            if index is not None:
+                continue  # header row
+            comment = state["comment"]
+            index = _column_index(next(csv.reader([comment])), column) if comment else None
+            if index is None:
+                raise ValueError(f"CSV column {column!r} not found in feed header")
+        if index < len(row):
+            value = row[index].strip()
+            if value:
+                yield value
+
+
+# Characters that can open or close a value outside / inside a JSON string
+_JSON_STRUCTURAL = re.compile(r'["\[\]{}]')
+_JSON_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class _JsonStream:
+    """Pull parser over UTF-8 chunks yielding one JSON value at a time"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(chunk)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)"""
+        while True:
+            buffer, pos = self._buffer, self._pos
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str):
+        if self.peek() != expected:
+            raise ValueError(f"expected {expected!r} in JSON feed")
+        self._pos += 1
+
+    def _container_end(self) -> int:
+        """
+        Index just past the object, array or string starting at the cursor,
+        reading more input as needed. The scan resumes where the previous
+        chunk stopped, so a large value is walked once rather than re-decoded
+        after every read. At end of input the buffer length is returned and
+        raw_decode reports the truncation
+        """
+        depth = 0
+        in_string = False
+        scan = self._pos
+        while True:
+            buffer = self._buffer
+            while True:
+                match = (_JSON_STRING_SPECIAL if in_string else _JSON_STRUCTURAL).search(buffer, scan)
+                if match is None:
+                    scan = len(buffer)
+                    break
+                char, scan = match.group(), match.end()
+                if in_string:
+                    if char == '"':
+                        in_string = False
+                        if depth <= 0:
+                            return scan
+                    elif scan == len(buffer):
+                        # Escape split across chunks; re-read it after the fill
+                        scan -= 1
+                        break
+                    else:
+                        scan += 1
+                elif char == '"':
+                    in_string = True
+                elif char in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth <= 0:
+                        return scan
+            if len(buffer) - self._pos > MAX_STIX_OBJECT_CHARS:
+                raise ValueError(f"JSON value larger than {MAX_STIX_OBJECT_CHARS} characters")
+            consumed = self._pos
+            if not self._fill():
+                return len(self._buffer)
+            scan -= consumed
+
+    def value(self):
+        """Decode the next complete value, reading more input as needed"""
+        if self.peek() in ('{', '[', '"'):
+            self._container_end()
+            value, self._pos = self._json.raw_decode(self._buffer, self._pos)
+            return value
+        # Numbers and literals are short; retry until a delimiter follows
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                # A number cut at the chunk boundary ("2." of "2.1") also
+                # decodes, so only accept a value followed by a delimiter
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in " \t\r\n,:]}"):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if len(self._buffer) - self._pos > MAX_STIX_OBJECT_CHARS:
+                raise ValueError(f"JSON value larger than {MAX_STIX_OBJECT_CHARS} characters")
+            self._fill()
+
+    def array(self) -> Iterator:
+        self.take("[")
+        while True:
+            char = self.peek()
+            if char == "]":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            if not char:
+                raise ValueError("unterminated JSON array in feed")
+            yield self.value()
+
+
+def iter_stix_objects(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Objects of a STIX 2.1 bundle (or TAXII envelope, or bare object list)
+    one at a time; other top-level members are skipped as they stream past.
+    """
+    stream = _JsonStream(chunks)
+    char = stream.peek()
+    if char == "[":
+        yield from stream.array()
+        return
+    stream.take("{")
+    while True:
+        char = stream.peek()
+        if char == "}":
+            return
+        if char == ",":
+            stream.take(",")
+            continue
+        if not char:
+            raise ValueError("unterminated STIX bundle")
+        key = stream.value()
+        stream.take(":")
+        if key == "objects" and stream.peek() == "[":
+            yield from stream.array()
+        else:
+            stream.value()
+
+
+def iter_stix_indicators(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Values compared in the patterns of live STIX indicator objects"""
+    for obj in iter_stix_objects(chunks):
+        if not isinstance(obj, dict) or obj.get("type") != "indicator" or obj.get("revoked"):
+            continue
+        if obj.get("pattern_type", "stix") != "stix" or not obj.get("pattern"):
+            continue
+        for value in STIX_PATTERN_VALUE.findall(obj["pattern"]):
+            yield STIX_ESCAPE.sub(r"\1", value)
+
+
+def iter_feed_indicators(feed_type: str, chunks: Iterable[bytes], column: Column = 0) -> Iterator[str]:
+    """Raw indicator strings from a feed document, streamed where the format allows"""
+    if feed_type in ("stix", "taxii"):
+        return iter_stix_indicators(chunks)
+    if feed_type == "api":
+        # API responses are small pages; parse them whole
+        document = json.loads(b"".join(chunks))
+        if isinstance(document, dict):
+            document = next((document[key] for key in API_LIST_KEYS if isinstance(document.get(key), list)), [])
+        return (item if isinstance(item, str) else str(item.get("indicator", ""))
+                for item in document if isinstance(item, (str, dict)))
+    # csv / txt / rules
+    return iter_csv_indicators(chunks, column)
+
+
+def ingest_in_batches(indicators: Iterable[str], sink: Callable[[List[str]], None],
+                      batch_size: int = 5000) -> dict:
+    """Hand indicators to sink(batch) in fixed-size batches; returns throughput"""
+    started = time.monotonic()
+    count = 0
+    batches = 0
+    batch: List[str] = []
+    for indicator in indicators:
+        batch.append(indicator)
+        if len(batch) >= batch_size:
+            sink(batch)
+            count += len(batch)
+            batches += 1
+            batch = []
+    if batch:
+        sink(batch)
+        count += len(batch)
+        batches += 1
+    seconds = time.monotonic() - started
+    return {
+        "indicators": count,
+        "batches": batches,
+        "seconds": round(seconds, 4),
+        "indicators_per_second": round(count / seconds) if seconds else None
+    }
+
+
+class FeedPoller:
+    """
+    get_feeds() returns {feed_id: feed} (the live feed records; fetch state
+    such as etag/last_modified/status is written back into them).
+    on_update(feed_id, feed, added, removed, current) is called on the pool
+    thread after every successful fetch (added/removed are empty on 304).
+    """
+
+    # Scheduler wake-up period
+    TICK_SECONDS = 5.0
+    # First retry delay after a failure; doubles up to the feed interval
+    RETRY_SECONDS = 60.0
+
+    def __init__(self, get_feeds: Callable[[], Dict[str, dict]],
+                 on_update: Callable[[str, dict, List[str], List[str], Set[str]], None],
+                 on_saved: Optional[Callable[[str], None]] = None,
+                 max_workers: int = 4, timeout: float = 30.0, allow_private: bool = False):
+        self.get_feeds = get_feeds
+        self.on_update = on_update
+        self.on_saved = on_saved or (lambda feed_id: None)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        # Allow endpoints on loopback / private networks (local stand-ins)
+        self.allow_private = allow_private
+
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._in_flight: Set[str] = set()
+        self._next_due: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._indicators: Dict[str, Set[str]] = {}
+        self._metrics: Dict[str, dict] = {}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the scheduler thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="opsec-feed")
+            self._thread = threading.Thread(target=self._schedule, name="opsec-feed-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, pool = self._thread, self._pool
+            self._thread = self._pool = None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            pool.shutdown(wait=True)
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            try:
+                self.dispatch_due()
+            except Exception as e:
+                print(f"[OPSEC] Feed scheduler error: {e}")
+            self._stop.wait(self.TICK_SECONDS)
+
+    def dispatch_due(self, now: Optional[float] = None) -> List[str]:
+        """Submit every enabled feed whose next poll is due"""
+        now = time.time() if now is None else now
+        dispatched = []
+        for feed_id, feed in list(self.get_feeds().items()):
+            if not feed.get("enabled") or not feed.get("endpoint"):
+                continue
+            with self._lock:
+                if feed_id in self._in_flight or self._next_due.get(feed_id, 0) > now or self._pool is None:
+                    continue
+                self._in_flight.add(feed_id)
+                self._pool.submit(self._run, feed_id, feed)
+            dispatched.append(feed_id)
+        return dispatched
+
+    def poll_now(self, feed_id: str, feed: dict) -> dict:
+        """
+        Poll a feed on the caller's thread unless a poll of it is already in
+        flight, in which case the result has status "busy"
+        """
+        with self._lock:
+            if feed_id in self._in_flight:
+                return {"feed_id": feed_id, "status": "busy"}
+            self._in_flight.add(feed_id)
+        try:
+            return self.poll(feed_id, feed)
+        finally:
+            with self._lock:
+                self._in_flight.discard(feed_id)
+
+    def _run(self, feed_id: str, feed: dict):
+        try:
+            self.poll(feed_id, feed)
+        finally:
+            with self._lock:
+                self._in_flight.discard(feed_id)
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+
+    def poll(self, feed_id: str, feed: dict) -> dict:
+        """Fetch one feed now, apply its diff and return the poll result"""
+        metrics = self._metrics.setdefault(feed_id, {
+            "polls": 0, "not_modified": 0, "errors": 0,
+            "avg_latency_seconds": None, "indicators_added": 0, "indicators_removed": 0
+        })
+        started = time.monotonic()
+        result = {"feed_id": feed_id, "fetched_at": datetime.now().isoformat()}
+        interval = float(feed.get("update_interval_hours") or 6) * 3600
+
+        try:
+            # Without the previous indicator set (first poll since start) a
+            # 304 could not be diffed, so ask for the full document
+            status, headers, current, size, latency = self._fetch(feed, conditional=feed_id in self._indicators)
+            result.update(http_status=status, latency_seconds=round(latency, 4))
+
+            if status == 304:
+                metrics["not_modified"] += 1
+                current = self._indicators.get(feed_id, set())
+                added: List[str] = []
+                removed: List[str] = []
+                result["status"] = "not_modified"
+            else:
+                transfer_seconds = time.monotonic() - started
+                previous = self._indicators.get(feed_id, set())
+                added = sorted(current - previous)
+                removed = sorted(previous - current)
+                result.update(status="ok", bytes=size, indicators=len(current),
+                              transfer_seconds=round(transfer_seconds, 4),
+                              indicators_per_second=round(len(current) / transfer_seconds) if transfer_seconds else None)
+                feed["etag"] = headers.get("ETag")
+                feed["last_modified"] = headers.get("Last-Modified")
+
+            apply_started = time.monotonic()
+            self.on_update(feed_id, feed, added, removed, current)
+            self._indicators[feed_id] = current
+            result.update(added=len(added), removed=len(removed),
+                          apply_seconds=round(time.monotonic() - apply_started, 4))
+
+            metrics["indicators_added"] += len(added)
+            metrics["indicators_removed"] += len(removed)
+            previous_avg = metrics["avg_latency_seconds"]
+            metrics["avg_latency_seconds"] = round(latency if previous_avg is None
+                                                   else 0.8 * previous_avg + 0.2 * latency, 4)
+            self._failures.pop(feed_id, None)
+            next_due = time.time() + interval
+            feed["status"] = "active"
+            feed["last_fetch"] = result["fetched_at"]
+            feed.pop("last_error", None)
+        except Exception as e:
+            failures = self._failures.get(feed_id, 0) + 1
+            self._failures[feed_id] = failures
+            metrics["errors"] += 1
+            result.update(status="error", error=str(e), latency_seconds=round(time.monotonic() - started, 4))
+            next_due = time.time() + min(interval, self.RETRY_SECONDS * 2 ** (failures - 1))
+            feed["status"] = "error"
+            feed["last_error"] = str(e)
+            print(f"[OPSEC] Feed {feed_id} poll failed: {e}")
+
+        metrics["polls"] += 1
+        metrics["last_poll"] = result
+        with self._lock:
+            self._next_due[feed_id] = next_due
+        metrics["next_poll"] = datetime.fromtimestamp(next_due).isoformat()
+        self.on_saved(feed_id)
+        return result
+
+    def _fetch(self, feed: dict, conditional: bool = True):
+        """
+        GET and parse the feed as it downloads. Returns (status, headers,
+        indicators, bytes, latency); a 304 has no indicators.
+        """
+        headers = {"Accept-Encoding": "gzip", "User-Agent": "OrPaynter-OPSEC/1.0"}
+        if conditional and feed.get("etag"):
+            headers["If-None-Match"] = feed["etag"]
+        if conditional and feed.get("last_modified"):
+            headers["If-Modified-Since"] = feed["last_modified"]
+        error = check_feed_endpoint(feed["endpoint"], self.allow_private)
+        if error:
+            raise ValueError(error)
+        key_header = None
+        api_key = feed_api_key(feed)
+        if api_key:
+            key_header = feed.get("api_key_header") or "X-API-Key"
+            headers[key_header] = api_key
+
+        request = urllib.request.Request(feed["endpoint"], headers=headers)
+        opener = urllib.request.build_opener(_CheckedRedirectHandler(self.allow_private, key_header))
+        started = time.monotonic()
+        try:
+            with opener.open(request, timeout=self.timeout) as response:
+                latency = time.monotonic() - started
+                stream = response
+                if response.headers.get("Content-Encoding", "").lower() == "gzip":
+                    stream = gzip.GzipFile(fileobj=response)
+                size = [0]
+
+                def chunks():
+                    for chunk in iter_file_chunks(stream):
+                        size[0] += len(chunk)
+                        if size[0] > MAX_FEED_BYTES:
+                            raise ValueError(f"feed larger than {MAX_FEED_BYTES} bytes")
+                        yield chunk
+
+                current = set(iter_feed_indicators(feed.get("type", "csv"), chunks(), feed.get("csv_column", 0)))
+                return response.status, response.headers, current, size[0], latency
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, e.headers, None, 0, time.monotonic() - started
+            raise
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> dict:
+        with self._lock:
+            in_flight = sorted(self._in_flight)
+        return {
+            "running": self._thread is not None,
+            "max_workers": self.max_workers,
+            "in_flight": in_flight,
+            "feeds": {feed_id: dict(metrics) for feed_id, metrics in self._metrics.items()}
+        }
+
+
+class _StandInHandler(SimpleHTTPRequestHandler):
+    """Static file server honouring If-None-Match with content-hash ETags"""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            with open(path, "rb") as handle:
+                etag = '"' + hashlib.sha1(handle.read()).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return None
+            self._etag = etag
+        return super().send_head()
+
+    def end_headers(self):
+        etag = getattr(self, "_etag", None)
+        if etag:
+            self.send_header("ETag", etag)
+            self._etag = None
+        super().end_headers()
+
+
+def serve_stand_in(directory: str, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Local HTTP stand-in serving feed files from directory (call serve_forever)"""
+    handler = lambda *args, **kwargs: _StandInHandler(*args, directory=directory, **kwargs)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OPSEC feed tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve feed files locally with ETag/Last-Modified support")
+    serve.add_argument("--dir", default=".")
+    serve.add_argument("--port", type=int, default=8765)
+    parse = sub.add_parser("parse", help="stream-parse a feed file and report indicators/sec")
+    parse.add_argument("path", help="feed file (.gz is decompressed on the fly)")
+    parse.add_argument("--format", default="csv", choices=["csv", "stix", "api"])
+    parse.add_argument("--column", default="0", help="CSV column index or header name")
+    parse.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "parse":
+        column = int(args.column) if args.column.isdigit() else args.column
+        opener = gzip.open if args.path.endswith(".gz") else open
+        with opener(args.path, "rb") as handle:
+            indicators = iter_feed_indicators(args.format, iter_file_chunks(handle), column)
+            stats = ingest_in_batches(indicators, lambda batch: None, args.batch_size)
+        print(json.dumps({"path": args.path, "format": args.format, **stats}))
+
+    if args.command == "serve":
+        server = serve_stand_in(args.dir, args.port)
+        print(f"Serving {os.path.abspath(args.dir)} on http://127.0.0.1:{args.port}/")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+OPSEC GRAPH - IoC Relationship Graph
+====================================
+Incrementally groups IoCs into campaign clusters from the evidence the
+overlay already sees: indicators matched by the same log, and indicators
+whose feed metadata names the same campaign / malware family / actor.
+
+Features:
+- Union-find (union by size, path halving) for cluster membership, with a
+  member set per root so "every IoC in this cluster" costs one find
+- Bounded per-IoC neighbour lists backing the IoC `related_iocs` field
+- Metadata linking via one anchor IoC per (key, value), so a shared
+  campaign costs one union per IoC instead of a clique of edges
+
+Clusters only grow: removing an IoC drops it from its cluster's members
+but does not split the cluster. Removed IoCs stay in the forest as
+tombstones until they make up COMPACT_TOMBSTONE_RATIO of the nodes, when
+the forest is rebuilt from the live members.
+"""
+
+import itertools
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Feed metadata keys whose shared values place IoCs in one cluster. Only
+# identifying keys: category fields ("threat": "phishing") would merge
+# whole feeds into one cluster.
+CLUSTER_METADATA_KEYS = ("campaign", "malware", "malware_family", "threat_actor")
+
+# related_iocs entries kept per IoC
+MAX_RELATED_IOCS = 50
+
+# IoCs of one log linked pairwise; beyond this the rest hang off the first
+MAX_PAIRWISE_LINKS = 8
+
+# Rebuild the forest once tombstones are this share of its nodes...
+COMPACT_TOMBSTONE_RATIO = 0.5
+# ...and at least this many
+COMPACT_MIN_TOMBSTONES = 1024
+
+
+class IoCGraph:
+    """Thread-safe union-find over ioc_ids plus bounded neighbour lists"""
+
+    def __init__(self, max_related: int = MAX_RELATED_IOCS,
+                 metadata_keys: Iterable[str] = CLUSTER_METADATA_KEYS):
+        self.max_related = max_related
+        self.metadata_keys = tuple(metadata_keys)
+        self._lock = threading.Lock()
+        self._parent: Dict[str, str] = {}
+        self._size: Dict[str, int] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._related: Dict[str, List[str]] = {}
+        self._anchors: Dict[Tuple[str, str], str] = {}
+        self.links = {"co_occurrence": 0, "metadata": 0, "restored": 0}
+        self.unions = 0
+        self.compactions = 0
+
+    # ------------------------------------------------------------------
+    # Union-find
+    # ------------------------------------------------------------------
+
+    def _find(self, ioc_id: str) -> str:
+        parent = self._parent
+        while parent[ioc_id] != ioc_id:
+            parent[ioc_id] = parent[parent[ioc_id]]
+            ioc_id = parent[ioc_id]
+        return ioc_id
+
+    def _node(self, ioc_id: str):
+        if ioc_id not in self._parent:
+            self._parent[ioc_id] = ioc_id
+            self._size[ioc_id] = 1
+            self._members[ioc_id] = {ioc_id}
+        elif ioc_id not in self._related:
+            # Tombstone of a removed IoC that is back
+            self._members[self._find(ioc_id)].add(ioc_id)
+        self._related.setdefault(ioc_id, [])
+
+    def _union(self, a: str, b: str):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size.pop(root_b)
+        self._members[root_a] |= self._members.pop(root_b)
+        self.unions += 1
+
+    def _relate(self, a: str, b: str, changed: Set[str]):
+        for this, other in ((a, b), (b, a)):
+            related = self._related[this]
+            if other not in related and len(related) < self.max_related:
+                related.append(other)
+                changed.add(this)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add(self, ioc: dict) -> Set[str]:
+        """
+        Track an IoC, link it to earlier IoCs sharing its cluster metadata
+        and to any related_iocs it was stored with. Returns the ids whose
+        related list changed.
+        """
+        ioc_id = ioc['ioc_id']
+        changed: Set[str] = set()
+        with self._lock:
+            self._node(ioc_id)
+            for other in ioc.get('related_iocs') or ():
+                if other in self._related and other != ioc_id:
+                    self._union(ioc_id, other)
+                    self._relate(ioc_id, other, changed)
+                    self.links["restored"] += 1
+            metadata = ioc.get('metadata') or {}
+            for key in self.metadata_keys:
+                value = metadata.get(key)
+                if not isinstance(value, str) or not value.strip():
+                    continue
+                anchor_key = (key, value.strip().lower())
+                anchor = self._anchors.get(anchor_key)
+                if anchor is None or anchor not in self._parent:
+                    self._anchors[anchor_key] = ioc_id
+                elif anchor != ioc_id:
+                    self._union(ioc_id, anchor)
+                    self.links["metadata"] += 1
+                    if anchor in self._related:
+                        self._relate(ioc_id, anchor, changed)
+                    else:
+                        # The anchor was removed; hand its role to a live IoC
+                        self._anchors[anchor_key] = ioc_id
+        return changed
+
+    def link_cooccurring(self, ioc_ids: List[str]) -> Set[str]:
+        """Link IoCs matched by the same log; returns ids whose related list changed"""
+        changed: Set[str] = set()
+        if len(ioc_ids) < 2:
+            return changed
+        with self._lock:
+            ioc_ids = [ioc_id for ioc_id in dict.fromkeys(ioc_ids) if ioc_id in self._related]
+            head = ioc_ids[:MAX_PAIRWISE_LINKS]
+            for i, first in enumerate(head):
+                for second in head[i + 1:]:
+                    self._union(first, second)
+                    self._relate(first, second, changed)
+                    self.links["co_occurrence"] += 1
+            for second in ioc_ids[MAX_PAIRWISE_LINKS:]:
+                self._union(ioc_ids[0], second)
+                self._relate(ioc_ids[0], second, changed)
+                self.links["co_occurrence"] += 1
+        return changed
+
+    def remove(self, ioc_id: str) -> Set[str]:
+        """Drop an IoC; returns the ids whose related list changed"""
+        changed: Set[str] = set()
+        with self._lock:
+            related = self._related.pop(ioc_id, None)
+            if related is None:
+                return changed
+            # The node stays in the forest as a tombstone other paths may cross
+            self._members[self._find(ioc_id)].discard(ioc_id)
+            for other in related:
+                neighbours = self._related.get(other)
+                if neighbours and ioc_id in neighbours:
+                    neighbours.remove(ioc_id)
+                    changed.add(other)
+            tombstones = len(self._parent) - len(self._related)
+            if tombstones >= COMPACT_MIN_TOMBSTONES and tombstones >= len(self._parent) * COMPACT_TOMBSTONE_RATIO:
+                self._compact()
+        return changed
+
+    def _compact(self):
+        """Rebuild the forest from live members only, dropping tombstones"""
+        parent: Dict[str, str] = {}
+        size: Dict[str, int] = {}
+        members_by_root: Dict[str, Set[str]] = {}
+        for root, members in self._members.items():
+            if not members:
+                continue
+            new_root = root if root in members else next(iter(members))
+            for member in members:
+                parent[member] = new_root
+            size[new_root] = len(members)
+            members_by_root[new_root] = members
+        anchors = {}
+        for anchor_key, anchor in self._anchors.items():
+            # A removed anchor still stands for its cluster; hand the role to
+            # the cluster's new root, or forget it if nothing there is live
+            members = self._members.get(self._find(anchor))
+            if members:
+                anchors[anchor_key] = parent[next(iter(members))]
+        self._parent, self._size, self._members, self._anchors = parent, size, members_by_root, anchors
+        self.compactions += 1
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def related(self, ioc_id: str) -> List[str]:
+        with self._lock:
+            return list(self._related.get(ioc_id, ()))
+
+    def cluster(self, ioc_id: str, limit: Optional[int] = None) -> Optional[Tuple[str, int, List[str]]]:
+        """(cluster_id, size, up to limit member ioc_ids) of a tracked IoC, else None"""
+        with self._lock:
+            if ioc_id not in self._related:
+                return None
+            root = self._find(ioc_id)
+            members = self._members[root]
+            return root, len(members), sorted(itertools.islice(members, limit))
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = [len(members) for members in self._members.values() if members]
+            return {
+                "iocs": len(self._related),
+                "tombstones": len(self._parent) - len(self._related),
+                "clusters": len(sizes),
+                "multi_ioc_clusters": sum(1 for size in sizes if size > 1),
+                "largest_cluster": max(sizes, default=0),
+                "unions": self.unions,
+                "compactions": self.compactions,
+                "links": dict(self.links),
+                "metadata_anchors": len(self._anchors)
+            }
@@ -0,0 +1,993 @@
+"""
+OPSEC INDEX - IoC Correlation Indexes
+=====================================
+In-memory lookup structures used by OPSEC to correlate internal logs against
+active Indicators of Compromise without scanning the whole IoC database.
+
+Features:
+- Hash index of IP indicators
+- Hash index of file hashes (MD5/SHA1/SHA256), matched against log
+  metadata and hashes extracted from the message
+- Normalised-URL hash map plus a host/path trie (URL IoCs also match
+  deeper paths on the same host)
+- Aho-Corasick automaton finding every domain IoC in a message in one pass,
+  rebuilt in the background while newly added domains are matched from a
+  small pending set
+- Compressed radix trie for CIDR / address-range IoCs (IPv4 and IPv6)
+- Incremental add/remove as IoCs are ingested or marked false positive
+- Trigram inverted index plus type/severity postings for IoC search
+- Bloom filter prefilter over exact IP / hash indicators
+- Incident listing index by status / severity ordered by creation time
+"""
+
+import bisect
+import hashlib
+import ipaddress
+import math
+import re
+import threading
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import quote, unquote, urlsplit
+
+# Cheap shape check before handing a string to the ipaddress module
+IP_RANGE_SHAPE = re.compile(r'^[0-9A-Fa-f:.]+(/\d{1,3}|\s*-\s*[0-9A-Fa-f:.]+)$')
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# URLs and MD5/SHA1/SHA256 digests embedded in free-text log messages
+URL_IN_TEXT = re.compile(r'https?://[^\s"\'<>()\[\]{}|\\^`]+', re.IGNORECASE)
+HASH_IN_TEXT = re.compile(r'(?<![0-9A-Fa-f])(?:[0-9A-Fa-f]{64}|[0-9A-Fa-f]{40}|[0-9A-Fa-f]{32})(?![0-9A-Fa-f])')
+
+# Log metadata fields that carry a URL / a file hash
+URL_METADATA_KEYS = ('url', 'request_url', 'uri', 'referrer')
+HASH_METADATA_KEYS = ('file_hash', 'hash', 'md5', 'sha1', 'sha256')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Characters left unescaped when re-quoting a URL path
+URL_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+
+
+def parse_ip_networks(indicator: str) -> Optional[List[IPNetwork]]:
+    """
+    Parse a CIDR block ('10.0.0.0/8') or address range
+    ('192.0.2.10-192.0.2.80') into the minimal list of networks covering it.
+    Returns None when the indicator is not a valid range.
+    """
+    if not indicator or not IP_RANGE_SHAPE.match(indicator):
+        return None
+    try:
+        if '/' in indicator:
+            return [ipaddress.ip_network(indicator, strict=False)]
+        first, last = (part.strip() for part in indicator.split('-', 1))
+        start, end = ipaddress.ip_address(first), ipaddress.ip_address(last)
+        if start.version != end.version or start > end:
+            return None
+        return list(ipaddress.summarize_address_range(start, end))
+    except ValueError:
+        return None
+
+
+def normalize_ip(ip: str) -> str:
+    """Canonical text form; IPv6 has many spellings of the same address"""
+    ip = ip.strip()
+    if ':' in ip:
+        try:
+            return ipaddress.ip_address(ip).compressed
+        except ValueError:
+            pass
+    return ip
+
+def normalize_url(url: str) -> Optional[str]:
+    """
+    Scheme-less canonical form used as the URL index key: lower-case host,
+    default port dropped, duplicate slashes collapsed, percent-encoding
+    canonicalised, trailing slash and fragment removed, query parameters
+    sorted. Returns None when there is no usable host.
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip('.')
+    if ':' in host:
+        host = f"[{host}]"
+    if port is not None and DEFAULT_PORTS.get(parts.scheme.lower()) != port:
+        host = f"{host}:{port}"
+    path = quote(unquote(re.sub(r'/{2,}', '/', parts.path)), safe=URL_PATH_SAFE).rstrip('/')
+    query = '&'.join(sorted(param for param in parts.query.split('&') if param))
+    return host + path + ('?' + query if query else '')
+
+
+def url_segments(normalized: str) -> List[str]:
+    """Host followed by path segments of a normalised URL (query dropped)"""
+    return [segment for segment in normalized.split('?', 1)[0].split('/') if segment]
+
+
+class UrlPathTrie:
+    """
+    Trie keyed on host then path segments. 'evil.com/kits' is stored as
+    evil.com -> kits, so a lookup for 'evil.com/kits/a.exe' reports it.
+    """
+
+    _TERMINAL = None
+
+    def __init__(self):
+        self._root: Dict[Optional[str], dict] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, segments: List[str], ioc_id: str):
+        node = self._root
+        for segment in segments:
+            node = node.setdefault(segment, {})
+        if self._TERMINAL not in node:
+            self._size += 1
+        node[self._TERMINAL] = ioc_id
+
+    def remove(self, segments: List[str], ioc_id: str) -> bool:
+        """Remove the indicator stored at segments if it is ioc_id"""
+        path = []
+        node = self._root
+        for segment in segments:
+            child = node.get(segment)
+            if child is None:
+                return False
+            path.append((node, segment))
+            node = child
+        if node.get(self._TERMINAL) != ioc_id:
+            return False
+        del node[self._TERMINAL]
+        self._size -= 1
+        for parent, segment in reversed(path):
+            if parent[segment]:
+                break
+            del parent[segment]
+        return True
+
+    def match(self, segments: List[str]) -> List[str]:
+        """Return ioc_ids of every indicator that is a path prefix of segments"""
+        matches = []
+        node = self._root
+        for segment in segments:
+            node = node.get(segment)
+            if node is None:
+                break
+            ioc_id = node.get(self._TERMINAL)
+            if ioc_id is not None:
+                matches.append(ioc_id)
+        return matches
+
+
+class _RadixNode:
+    __slots__ = ('prefix', 'length', 'children', 'ioc_id')
+
+    def __init__(self, prefix: int, length: int, ioc_id: Optional[str] = None):
+        self.prefix = prefix
+        self.length = length
+        self.children: List[Optional['_RadixNode']] = [None, None]
+        self.ioc_id = ioc_id
+
+
+class RadixTrie:
+    """
+    Path-compressed binary trie of network prefixes for one address family.
+    Nodes only exist where prefixes branch, so a lookup visits at most
+    `width` bits and usually far fewer nodes.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self._root = _RadixNode(0, 0)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _bit(self, key: int, index: int) -> int:
+        return (key >> (self.width - 1 - index)) & 1
+
+    def _mask(self, key: int, length: int) -> int:
+        if length == 0:
+            return 0
+        return key & (((1 << length) - 1) << (self.width - length))
+
+    def _common_length(self, a: int, b: int, limit: int) -> int:
+        diff = a ^ b
+        if diff == 0:
+            return limit
+        return min(self.width - diff.bit_length(), limit)
+
+    def insert(self, prefix: int, length: int, ioc_id: str):
+        """Attach ioc_id to prefix/length"""
+        prefix = self._mask(prefix, length)
+        node = self._root
+        while True:
+            if node.length == length:
+                if node.ioc_id is None:
+                    self._size += 1
+                node.ioc_id = ioc_id
+                return
+            branch = self._bit(prefix, node.length)
+            child = node.children[branch]
+            if child is None:
+                node.children[branch] = _RadixNode(prefix, length, ioc_id)
+                self._size += 1
+                return
+            common = self._common_length(child.prefix, prefix, min(child.length, length))
+            if common == child.length:
+                node = child
+                continue
+            # Split the compressed edge at the first differing bit
+            middle = _RadixNode(self._mask(prefix, common), common)
+            node.children[branch] = middle
+            middle.children[self._bit(child.prefix, common)] = child
+            if common == length:
+                middle.ioc_id = ioc_id
+            else:
+                middle.children[self._bit(prefix, common)] = _RadixNode(prefix, length, ioc_id)
+            self._size += 1
+            return
+
+    def delete(self, prefix: int, length: int, ioc_id: Optional[str] = None) -> bool:
+        """Detach prefix/length (only if still owned by ioc_id, when given)"""
+        prefix = self._mask(prefix, length)
+        path = []
+        node = self._root
+        while node.length < length:
+            child = node.children[self._bit(prefix, node.length)]
+            if child is None or child.length > length or self._mask(prefix, child.length) != child.prefix:
+                return False
+            path.append(node)
+            node = child
+        if node.length != length or node.ioc_id is None:
+            return False
+        if ioc_id is not None and node.ioc_id != ioc_id:
+            return False
+        node.ioc_id = None
+        self._size -= 1
+
+        # Splice out nodes that no longer carry a prefix or a branch point
+        while path and node.ioc_id is None:
+            parent = path.pop()
+            slot = parent.children.index(node)
+            remaining = [c for c in node.children if c is not None]
+            if len(remaining) > 1:
+                break
+            parent.children[slot] = remaining[0] if remaining else None
+            node = parent
+        return True
+
+    def longest_match(self, address: int) -> Optional[str]:
+        """ioc_id of the most specific prefix containing address"""
+        node = self._root
+        best = node.ioc_id
+        while node.length < self.width:
+            child = node.children[self._bit(address, node.length)]
+            if child is None or self._mask(address, child.length) != child.prefix:
+                break
+            node = child
+            if node.ioc_id is not None:
+                best = node.ioc_id
+        return best
+
+
+class AhoCorasick:
+    """
+    Immutable multi-pattern automaton.
+    Built once over a set of patterns; find() reports every pattern occurring
+    in a text with a single left-to-right pass, regardless of pattern count.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        # State 0 is the root. Parallel lists keep per-state overhead small.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[str]] = [None]
+        self._dict_link: List[int] = [0]
+        self.pattern_count = 0
+
+        for pattern in patterns:
+            self._insert(pattern)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def __contains__(self, pattern: str) -> bool:
+        state = 0
+        for ch in pattern:
+            state = self._goto[state].get(ch)
+            if state is None:
+                return False
+        return self._out[state] == pattern
+
+    def _insert(self, pattern: str):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+                self._dict_link.append(0)
+                self._goto[state][ch] = nxt
+            state = nxt
+        if self._out[state] is None:
+            self.pattern_count += 1
+        self._out[state] = pattern
+
+    def _link(self):
+        """Breadth-first computation of failure and dictionary-suffix links"""
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # Nearest proper suffix state that terminates a pattern
+                dict_link[nxt] = fail[nxt] if out[fail[nxt]] is not None else dict_link[fail[nxt]]
+
+    def find(self, text: str) -> Set[str]:
+        """Return the set of patterns that occur in text"""
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = state if out[state] is not None else dict_link[state]
+            while hit:
+                found.add(out[hit])
+                hit = dict_link[hit]
+        return found
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized from an expected capacity and target
+    false-positive rate. Positions come from one 128-bit BLAKE2b digest
+    split into two halves (Kirsch-Mitzenmacher double hashing), so they are
+    stable across processes.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.bit_count = max(8, int(math.ceil(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.bit_count / self.capacity * math.log(2))))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self.bit_count
+        return [(h1 + i * h2) % m for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        bits = self._bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def estimated_fp_rate(self) -> float:
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.hash_count * self.count / self.bit_count)) ** self.hash_count
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "items": self.count,
+            "target_fp_rate": self.fp_rate,
+            "estimated_fp_rate": round(self.estimated_fp_rate(), 6),
+            "hash_count": self.hash_count,
+            "bits": self.bit_count,
+            "memory_bytes": len(self._bits)
+        }
+
+
+class CorrelationIndex:
+    """
+    Per-type indexes over active (non false-positive) IoCs.
+    Lookups cost O(1) per IP / hash, O(segments) per URL and one pass per
+    message for domains, independent of the number of loaded indicators.
+    """
+
+    # Rebuild the automaton once this share of its patterns has been removed
+    AUTOMATON_COMPACT_RATIO = 0.5
+    # Domains added since the last automaton build are matched from a pending
+    # set; the automaton is rebuilt in the background once this many are
+    # pending or AUTOMATON_REBUILD_DELAY seconds after the first of them
+    AUTOMATON_PENDING_LIMIT = 256
+    AUTOMATON_REBUILD_DELAY = 2.0
+    # Rebuild the Bloom filter once this share of its items has been removed
+    BLOOM_STALE_RATIO = 0.25
+
+    def __init__(self, bloom_capacity: int = 100000, bloom_fp_rate: float = 0.01):
+        self._lock = threading.RLock()
+        # bloom_fp_rate <= 0 disables the prefilter
+        self.bloom_fp_rate = bloom_fp_rate
+        self._bloom_capacity = bloom_capacity
+        self._bloom: Optional[BloomFilter] = None
+        self._bloom_stale = 0
+        self._bloom_builds = 0
+        self._bloom_rejects = 0
+        self._bloom_passes = 0
+        self._bloom_false_positives = 0
+        self._ips: Dict[str, str] = {}
+        self._hashes: Dict[str, str] = {}
+        self._urls: Dict[str, str] = {}
+        self._url_paths = UrlPathTrie()
+        self._domain_patterns: Dict[str, str] = {}
+        self._automaton: Optional[AhoCorasick] = None
+        self._automaton_dirty = False
+        self._automaton_builds = 0
+        self._automaton_timer: Optional[threading.Timer] = None
+        self._automaton_building = False
+        self._pending_patterns: Set[str] = set()
+        self._pending_lengths: Counter = Counter()
+        self._ranges = {4: RadixTrie(32), 6: RadixTrie(128)}
+        self._build_bloom()
+
+    def add(self, ioc: dict):
+        """Index an IoC (no-op for false positives and unsupported types)"""
+        if ioc.get('false_positive'):
+            return
+        indicator = ioc['indicator']
+        ioc_type = ioc['type']
+        with self._lock:
+            if ioc_type == 'ip':
+                key = normalize_ip(indicator)
+                self._ips[key] = ioc['ioc_id']
+                self._bloom_add('ip:' + key)
+            elif ioc_type == 'ip_range':
+                for network in parse_ip_networks(indicator) or []:
+                    self._ranges[network.version].insert(
+                        int(network.network_address), network.prefixlen, ioc['ioc_id'])
+            elif ioc_type == 'file_hash':
+                key = indicator.strip().lower()
+                self._hashes[key] = ioc['ioc_id']
+                self._bloom_add('hash:' + key)
+            elif ioc_type == 'url':
+                key = normalize_url(indicator)
+                if key:
+                    self._urls[key] = ioc['ioc_id']
+                    if '?' not in key:
+                        # Query-less URL IoCs also cover deeper paths
+                        self._url_paths.add(url_segments(key), ioc['ioc_id'])
+            elif ioc_type == 'domain':
+                pattern = indicator.strip().lower()
+                if pattern not in self._domain_patterns and (
+                        self._automaton is None or pattern not in self._automaton):
+                    # Matched from the pending set until the next build
+                    self._add_pending(pattern)
+                self._domain_patterns[pattern] = ioc['ioc_id']
+
+    def remove(self, ioc: dict):
+        """Drop an IoC from all indexes"""
+        indicator = ioc['indicator']
+        ioc_type = ioc['type']
+        with self._lock:
+            if ioc_type == 'ip':
+                key = normalize_ip(indicator)
+                if self._ips.get(key) == ioc['ioc_id']:
+                    del self._ips[key]
+                    self._bloom_discard()
+            elif ioc_type == 'ip_range':
+                for network in parse_ip_networks(indicator) or []:
+                    self._ranges[network.version].delete(
+                        int(network.network_address), network.prefixlen, ioc['ioc_id'])
+            elif ioc_type == 'file_hash':
+                key = indicator.strip().lower()
+                if self._hashes.get(key) == ioc['ioc_id']:
+                    del self._hashes[key]
+                    self._bloom_discard()
+            elif ioc_type == 'url':
+                key = normalize_url(indicator)
+                if key and self._urls.get(key) == ioc['ioc_id']:
+                    del self._urls[key]
+                    self._url_paths.remove(url_segments(key), ioc['ioc_id'])
+            elif ioc_type == 'domain':
+                pattern = indicator.strip().lower()
+                if self._domain_patterns.get(pattern) != ioc['ioc_id']:
+                    # Another IoC owns this normalised pattern
+                    return
+                # The built automaton keeps the pattern; matches are filtered
+                # against _domain_patterns until the next compaction.
+                del self._domain_patterns[pattern]
+                if pattern in self._pending_patterns:
+                    self._pending_patterns.discard(pattern)
+                    self._pending_lengths[len(pattern)] -= 1
+                automaton = self._automaton
+                if automaton and len(self._domain_patterns) < automaton.pattern_count * (1 - self.AUTOMATON_COMPACT_RATIO):
+                    self._automaton_dirty = True
+                    self._schedule_automaton_build(0)
+
+    def rebuild(self, iocs: Iterable[dict]):
+        """Rebuild every index from scratch"""
+        with self._lock:
+            self._ips = {}
+            self._hashes = {}
+            self._urls = {}
+            self._url_paths = UrlPathTrie()
+            self._domain_patterns = {}
+            self._automaton = None
+            self._automaton_dirty = False
+            self._pending_patterns = set()
+            self._pending_lengths = Counter()
+            self._ranges = {4: RadixTrie(32), 6: RadixTrie(128)}
+            # The automaton is built once below; keep add() from arming timers
+            self._automaton_building = True
+            try:
+                for ioc in iocs:
+                    self.add(ioc)
+            finally:
+                self._automaton_building = False
+            if self._automaton_timer is not None:
+                self._automaton_timer.cancel()
+                self._automaton_timer = None
+            self._install_automaton(AhoCorasick(self._domain_patterns) if self._domain_patterns else None)
+            self._build_bloom()
+
+    def _build_bloom(self):
+        """(Re)build the prefilter from the exact indexes, growing if needed"""
+        with self._lock:
+            if self.bloom_fp_rate <= 0:
+                self._bloom = None
+                return
+            members = len(self._ips) + len(self._hashes)
+            while members > self._bloom_capacity:
+                self._bloom_capacity *= 2
+            bloom = BloomFilter(self._bloom_capacity, self.bloom_fp_rate)
+            for key in self._ips:
+                bloom.add('ip:' + key)
+            for key in self._hashes:
+                bloom.add('hash:' + key)
+            self._bloom = bloom
+            self._bloom_stale = 0
+            self._bloom_builds += 1
+
+    def _bloom_add(self, key: str):
+        if self._bloom is None:
+            return
+        if self._bloom.count >= self._bloom.capacity:
+            self._build_bloom()
+        self._bloom.add(key)
+
+    def _bloom_discard(self):
+        # Bloom filters cannot delete; rebuild once enough bits are stale
+        if self._bloom is None:
+            return
+        self._bloom_stale += 1
+        if self._bloom_stale > self._bloom.count * self.BLOOM_STALE_RATIO:
+            self._build_bloom()
+
+    def _prefilter(self, key: str) -> bool:
+        """False when key is definitely not indexed"""
+        bloom = self._bloom
+        if bloom is None:
+            return True
+        if key in bloom:
+            self._bloom_passes += 1
+            return True
+        self._bloom_rejects += 1
+        return False
+
+    def _add_pending(self, pattern: str):
+        self._pending_patterns.add(pattern)
+        self._pending_lengths[len(pattern)] += 1
+        if len(self._pending_patterns) >= self.AUTOMATON_PENDING_LIMIT:
+            self._schedule_automaton_build(0)
+        else:
+            self._schedule_automaton_build(self.AUTOMATON_REBUILD_DELAY)
+
+    def _schedule_automaton_build(self, delay: float):
+        """Arm (or bring forward) the background automaton build; caller holds the lock"""
+        if self._automaton_building:
+            # The running build re-checks for leftover work when it finishes
+            return
+        timer = self._automaton_timer
+        if timer is not None:
+            if delay > 0 or timer.interval == 0:
+                return
+            timer.cancel()
+        timer = threading.Timer(delay, self._build_automaton)
+        timer.daemon = True
+        self._automaton_timer = timer
+        timer.start()
+
+    def _build_automaton(self):
+        """
+        Build a new automaton over the live patterns without holding the lock,
+        then swap it in. Lookups keep using the old automaton plus the pending
+        set meanwhile.
+        """
+        with self._lock:
+            self._automaton_timer = None
+            if self._automaton_building or not (self._pending_patterns or self._automaton_dirty):
+                return
+            self._automaton_building = True
+            patterns = list(self._domain_patterns)
+        try:
+            automaton = AhoCorasick(patterns) if patterns else None
+        finally:
+            with self._lock:
+                self._automaton_building = False
+        self._install_automaton(automaton)
+
+    def _install_automaton(self, automaton: Optional[AhoCorasick]):
+        with self._lock:
+            self._automaton = automaton
+            self._automaton_builds += 1
+            # Patterns added or re-added during the build stay pending
+            pending = {p for p in self._pending_patterns if automaton is None or p not in automaton}
+            self._pending_patterns = pending
+            self._pending_lengths = Counter(len(p) for p in pending)
+            self._automaton_dirty = automaton is not None and len(self._domain_patterns) < \
+                automaton.pattern_count * (1 - self.AUTOMATON_COMPACT_RATIO)
+            if self._automaton_dirty or len(pending) >= self.AUTOMATON_PENDING_LIMIT:
+                self._schedule_automaton_build(0)
+            elif pending:
+                self._schedule_automaton_build(self.AUTOMATON_REBUILD_DELAY)
+
+    def _match_pending(self, text: str) -> Set[str]:
+        """Pending patterns occurring in text"""
+        with self._lock:
+            pending = self._pending_patterns
+            if not pending:
+                return set()
+            if len(pending) <= self.AUTOMATON_PENDING_LIMIT:
+                return {pattern for pattern in pending if pattern in text}
+            # Many pending (bulk load during a build): probe each substring of
+            # a pending length instead of scanning for every pattern
+            found = set()
+            for length in [length for length, count in self._pending_lengths.items() if count > 0]:
+                for start in range(len(text) - length + 1):
+                    piece = text[start:start + length]
+                    if piece in pending:
+                        found.add(piece)
+            return found
+
+    def lookup_ip(self, ip: Optional[str]) -> Optional[str]:
+        """Exact IP match"""
+        if not ip:
+            return None
+        key = normalize_ip(ip)
+        if not self._prefilter('ip:' + key):
+            return None
+        ioc_id = self._ips.get(key)
+        if ioc_id is None and self._bloom is not None:
+            self._bloom_false_positives += 1
+        return ioc_id
+
+    def indicator_ips(self) -> List[str]:
+        """Every exact IP indicator (normalised)"""
+        return list(self._ips)
+
+    def lookup_ip_range(self, ip: Optional[str]) -> Optional[str]:
+        """Longest-prefix match of an address against CIDR / range IoCs"""
+        if not ip or not (len(self._ranges[4]) or len(self._ranges[6])):
+            return None
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except ValueError:
+            return None
+        return self._ranges[address.version].longest_match(int(address))
+
+    def lookup_hash(self, file_hash: Optional[str]) -> Optional[str]:
+        """Exact file hash match (case-insensitive)"""
+        if not file_hash:
+            return None
+        key = file_hash.strip().lower()
+        if not self._prefilter('hash:' + key):
+            return None
+        ioc_id = self._hashes.get(key)
+        if ioc_id is None and self._bloom is not None:
+            self._bloom_false_positives += 1
+        return ioc_id
+
+    def lookup_url(self, url: Optional[str]) -> List[str]:
+        """Exact normalised-URL match, then every path-prefix URL IoC"""
+        if not url or not self._urls:
+            return []
+        key = normalize_url(url)
+        if not key:
+            return []
+        matches = []
+        ioc_id = self._urls.get(key)
+        if ioc_id is not None:
+            matches.append(ioc_id)
+        for ioc_id in self._url_paths.match(url_segments(key)):
+            if ioc_id not in matches:
+                matches.append(ioc_id)
+        return matches
+
+    def match_urls(self, log: dict) -> List[str]:
+        """URL IoCs hit by URLs in the log metadata or message"""
+        if not self._urls:
+            return []
+        metadata = log.get('metadata') or {}
+        urls = [metadata[key] for key in URL_METADATA_KEYS if isinstance(metadata.get(key), str)]
+        message = log.get('message') or ''
+        if '://' in message:
+            urls.extend(match.rstrip('.,;:!?') for match in URL_IN_TEXT.findall(message))
+        matches = []
+        for url in urls:
+            for ioc_id in self.lookup_url(url):
+                if ioc_id not in matches:
+                    matches.append(ioc_id)
+        return matches
+
+    def match_hashes(self, log: dict) -> List[str]:
+        """File hash IoCs found in the log metadata or message"""
+        if not self._hashes:
+            return []
+        metadata = log.get('metadata') or {}
+        candidates = [metadata[key] for key in HASH_METADATA_KEYS if isinstance(metadata.get(key), str)]
+        message = log.get('message') or ''
+        if len(message) >= 32:
+            candidates.extend(HASH_IN_TEXT.findall(message))
+        matches = []
+        for candidate in candidates:
+            ioc_id = self.lookup_hash(candidate)
+            if ioc_id and ioc_id not in matches:
+                matches.append(ioc_id)
+        return matches
+
+    def match_domains(self, text: str) -> List[str]:
+        """Find every domain indicator occurring in text (single pass)"""
+        if not text or not self._domain_patterns:
+            return []
+        text = text.lower()
+        automaton = self._automaton
+        found = automaton.find(text) if automaton is not None else set()
+        found |= self._match_pending(text)
+        live = self._domain_patterns
+        matches = []
+        for pattern in found:
+            ioc_id = live.get(pattern)
+            if ioc_id is not None:
+                matches.append(ioc_id)
+        return matches
+
+    def match(self, log: dict) -> List[Tuple[str, str]]:
+        """Return (ioc_id, correlation_type) pairs for a log entry"""
+        matches = []
+        for ip in (log.get('source_ip'), log.get('destination_ip')):
+            ioc_id = self.lookup_ip(ip)
+            if ioc_id:
+                if (ioc_id, "ip_match") not in matches:
+                    matches.append((ioc_id, "ip_match"))
+                continue
+            ioc_id = self.lookup_ip_range(ip)
+            if ioc_id and (ioc_id, "cidr_match") not in matches:
+                matches.append((ioc_id, "cidr_match"))
+
+        for ioc_id in self.match_domains(log.get('message', '')):
+            matches.append((ioc_id, "domain_match"))
+
+        for ioc_id in self.match_urls(log):
+            matches.append((ioc_id, "url_match"))
+
+        for ioc_id in self.match_hashes(log):
+            matches.append((ioc_id, "hash_match"))
+
+        return matches
+
+    def stats(self) -> dict:
+        """Index sizes for diagnostics"""
+        return {
+            "ip_indicators": len(self._ips),
+            "hash_indicators": len(self._hashes),
+            "url_indicators": len(self._urls),
+            "url_path_prefixes": len(self._url_paths),
+            "ip_range_prefixes": len(self._ranges[4]) + len(self._ranges[6]),
+            "domain_indicators": len(self._domain_patterns),
+            "automaton_states": len(self._automaton) if self._automaton else 0,
+            "automaton_builds": self._automaton_builds,
+            "automaton_pending_patterns": len(self._pending_patterns),
+            "bloom": self.bloom_stats()
+        }
+
+    def bloom_stats(self) -> Optional[dict]:
+        """Prefilter size, configured/estimated/observed false-positive rates"""
+        bloom = self._bloom
+        if bloom is None:
+            return None
+        passes = self._bloom_passes
+        return {
+            **bloom.stats(),
+            "stale_items": self._bloom_stale,
+            "builds": self._bloom_builds,
+            "rejected_lookups": self._bloom_rejects,
+            "passed_lookups": passes,
+            "false_positive_lookups": self._bloom_false_positives,
+            "observed_fp_rate": round(self._bloom_false_positives / (self._bloom_rejects + self._bloom_false_positives), 6)
+            if (self._bloom_rejects + self._bloom_false_positives) else 0.0
+        }
+
+
+class IoCSearchIndex:
+    """
+    Inverted indexes for analyst search over all stored IoCs.
+    Substring queries intersect trigram posting lists (then verify the
+    candidates); type and severity filters are posting lists of their own.
+    Postings are insertion-ordered dicts so pages come back in ingest order.
+    """
+
+    FIELDS = ('type', 'severity')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Tuple[str, str, str]] = {}
+        self._trigrams: Dict[str, Dict[str, None]] = {}
+        self._by_field: Dict[str, Dict[str, Dict[str, None]]] = {field: {} for field in self.FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, ioc: dict):
+        """Index (or re-index) an IoC"""
+        ioc_id = ioc['ioc_id']
+        with self._lock:
+            if ioc_id in self._docs:
+                self.remove(ioc)
+            text = ioc['indicator'].lower()
+            self._docs[ioc_id] = (text, ioc['type'], ioc['severity'])
+            for gram in self.trigrams(text):
+                self._trigrams.setdefault(gram, {})[ioc_id] = None
+            for field in self.FIELDS:
+                self._by_field[field].setdefault(ioc[field], {})[ioc_id] = None
+
+    def remove(self, ioc: dict):
+        """Drop an IoC from every posting list"""
+        ioc_id = ioc['ioc_id']
+        with self._lock:
+            doc = self._docs.pop(ioc_id, None)
+            if doc is None:
+                return
+            text, ioc_type, severity = doc
+            for gram in self.trigrams(text):
+                posting = self._trigrams.get(gram)
+                if posting is not None:
+                    posting.pop(ioc_id, None)
+                    if not posting:
+                        del self._trigrams[gram]
+            for field, value in zip(self.FIELDS, (ioc_type, severity)):
+                posting = self._by_field[field].get(value)
+                if posting is not None:
+                    posting.pop(ioc_id, None)
+                    if not posting:
+                        del self._by_field[field][value]
+
+    def search(self, query: str = '', filters: Optional[Dict[str, str]] = None,
+               offset: int = 0, limit: int = 50) -> Tuple[int, List[str]]:
+        """
+        Return (total_matches, ioc_ids[offset:offset + limit]).
+        Cost is proportional to the smallest posting list involved, not to
+        the number of stored IoCs (queries under 3 characters without
+        filters fall back to a scan).
+        """
+        query = (query or '').lower()
+        with self._lock:
+            postings = []
+            if len(query) >= 3:
+                postings.extend(self._trigrams.get(gram, {}) for gram in self.trigrams(query))
+            for field, value in (filters or {}).items():
+                if value:
+                    postings.append(self._by_field[field].get(value, {}))
+
+            if postings:
+                postings.sort(key=len)
+                base, others = postings[0], postings[1:]
+            else:
+                base, others = self._docs, []
+
+            total = 0
+            page: List[str] = []
+            for ioc_id in base:
+                if any(ioc_id not in posting for posting in others):
+                    continue
+                if query and query not in self._docs[ioc_id][0]:
+                    continue
+                if offset <= total < offset + limit:
+                    page.append(ioc_id)
+                total += 1
+            return total, page
+
+
+class IncidentListIndex:
+    """
+    Incident ids kept sorted by (created_at, incident_id) in one list per
+    status, per severity, per (status, severity) pair and overall, so a
+    filtered page is a bisect plus a slice. Pages run newest first and
+    resume from a cursor (the sort key of the last item returned), which
+    stays stable while incidents are created or change status.
+    """
+
+    ANY = '*'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._postings.get((self.ANY, self.ANY), ()))
+
+    def _lists(self, status: str, severity: str):
+        any_ = self.ANY
+        for key in ((any_, any_), (status, any_), (any_, severity), (status, severity)):
+            yield self._postings.setdefault(key, [])
+
+    def add(self, incident: dict, status: Optional[str] = None):
+        """Index an incident under its (or the given) status"""
+        entry = (incident['created_at'], incident['incident_id'])
+        with self._lock:
+            for postings in self._lists(status or incident['status'], incident['severity']):
+                if not postings or postings[-1] < entry:
+                    postings.append(entry)  # the common case: newest incident
+                else:
+                    position = bisect.bisect_left(postings, entry)
+                    if position == len(postings) or postings[position] != entry:
+                        postings.insert(position, entry)
+
+    def remove(self, incident: dict, status: Optional[str] = None):
+        """Drop an incident from the lists of its (or the given) status"""
+        entry = (incident['created_at'], incident['incident_id'])
+        with self._lock:
+            for postings in self._lists(status or incident['status'], incident['severity']):
+                position = bisect.bisect_left(postings, entry)
+                if position < len(postings) and postings[position] == entry:
+                    del postings[position]
+
+    def move(self, incident: dict, old_status: str):
+        """Re-file an incident after its status changed from old_status"""
+        with self._lock:
+            self.remove(incident, old_status)
+            self.add(incident)
+
+    def page(self, status: Optional[str] = None, severity: Optional[str] = None,
+             cursor: Optional[Tuple[str, str]] = None,
+             limit: int = 50) -> Tuple[int, List[str], Optional[Tuple[str, str]]]:
+        """
+        Return (total_matches, incident_ids, next_cursor) for the page of
+        incidents created before cursor (or the newest page without one).
+        """
+        with self._lock:
+            postings = self._postings.get((status or self.ANY, severity or self.ANY), [])
+            end = bisect.bisect_left(postings, cursor) if cursor else len(postings)
+            start = max(end - limit, 0)
+            entries = postings[start:end][::-1]
+            next_cursor = entries[-1] if entries and start > 0 else None
+            return len(postings), [incident_id for _, incident_id in entries], next_cursor
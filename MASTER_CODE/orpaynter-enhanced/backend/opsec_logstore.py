@@ -0,0 +1,299 @@
+"""
+OPSEC LOG STORE - Time-Partitioned Internal Log Retention
+=========================================================
+Bounded replacement for the unbounded internal log list.
+
+Features:
+- Hourly segments keyed by event timestamp
+- Compact tuple rows with interned low-cardinality fields
+- Retention window and byte budget, enforced by evicting whole segments
+- Time-range scans that only touch overlapping segments
+- Per-segment IP posting lists (source/destination IP -> row offsets)
+- Cursor-paged lookups of the logs selected by a per-segment matcher
+"""
+
+import bisect
+import json
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SEGMENT_SECONDS = 3600
+
+# Row layout; kept as a tuple instead of a dict to cut per-log overhead
+ROW_FIELDS = ("epoch", "log_id", "timestamp", "source_ip", "destination_ip",
+              "action", "message", "source_system", "metadata")
+_EPOCH, _SOURCE_IP, _DESTINATION_IP, _MESSAGE = 0, 3, 4, 6
+
+
+def parse_timestamp(value) -> float:
+    """Epoch seconds for an ISO-8601 string, epoch number or datetime (now on failure)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class LogSegment:
+    """One hour of logs in arrival order"""
+
+    __slots__ = ('hour', 'rows', 'bytes', 'ip_index')
+
+    def __init__(self, hour: int):
+        self.hour = hour
+        self.rows: List[tuple] = []
+        self.bytes = 0
+        # source/destination IP -> offsets into rows
+        self.ip_index: Dict[str, List[int]] = {}
+
+    def add(self, row: tuple, size: int):
+        offset = len(self.rows)
+        self.rows.append(row)
+        self.bytes += size
+        for ip in (row[_SOURCE_IP], row[_DESTINATION_IP]):
+            if ip:
+                postings = self.ip_index.get(ip)
+                if postings is None:
+                    self.ip_index[ip] = [offset]
+                elif postings[-1] != offset:
+                    postings.append(offset)
+
+    def log(self, offset: int) -> dict:
+        return LogStore._decode(self.rows[offset])
+
+    def message(self, offset: int) -> str:
+        return self.rows[offset][_MESSAGE] or ''
+
+    def offsets_where(self, field: str, value, row_count: int) -> List[int]:
+        """Offsets below row_count whose field equals value"""
+        column = ROW_FIELDS.index(field)
+        rows = self.rows
+        if column in (_SOURCE_IP, _DESTINATION_IP):
+            candidates = self.ip_index.get(value, ())
+        else:
+            candidates = range(row_count)
+        return [offset for offset in candidates
+                if offset < row_count and rows[offset][column] == value]
+
+    @property
+    def start(self) -> float:
+        return self.hour * SEGMENT_SECONDS
+
+    @property
+    def end(self) -> float:
+        return self.start + SEGMENT_SECONDS
+
+
+class LogStore:
+    """
+    Hour-partitioned log store with retention by age and by approximate size.
+    Appends and whole-segment evictions are O(1) for in-order traffic.
+    """
+
+    def __init__(self, retention_hours: float = 72, max_bytes: int = 256 * 1024 * 1024):
+        self.retention_hours = retention_hours
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._segments: Dict[int, LogSegment] = {}
+        self._hours: Deque[int] = deque()
+        self._rows = 0
+        self._bytes = 0
+        self._evicted_segments = 0
+        self._evicted_rows = 0
+        self._expired_on_arrival = 0
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode(log: dict, epoch: float) -> tuple:
+        metadata = log.get('metadata')
+        return (
+            epoch,
+            log.get('log_id'),
+            log.get('timestamp'),
+            log.get('source_ip'),
+            log.get('destination_ip'),
+            sys.intern(log.get('action') or 'unknown'),
+            log.get('message', ''),
+            sys.intern(log.get('source_system') or 'unknown'),
+            json.dumps(metadata, separators=(',', ':')) if metadata else None
+        )
+
+    @staticmethod
+    def _decode(row: tuple) -> dict:
+        log = dict(zip(ROW_FIELDS[1:], row[1:]))
+        log['metadata'] = json.loads(row[-1]) if row[-1] else {}
+        return log
+
+    @staticmethod
+    def _row_bytes(row: tuple) -> int:
+        return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row if isinstance(v, str))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, log: dict) -> bool:
+        """Store a log; returns False if it is already outside retention"""
+        epoch = parse_timestamp(log.get('timestamp'))
+        hour = int(epoch // SEGMENT_SECONDS)
+        row = self._encode(log, epoch)
+        size = self._row_bytes(row)
+
+        with self._lock:
+            if hour < self._oldest_retained_hour():
+                self._expired_on_arrival += 1
+                return False
+
+            segment = self._segments.get(hour)
+            if segment is None:
+                segment = LogSegment(hour)
+                self._segments[hour] = segment
+                if not self._hours or hour > self._hours[-1]:
+                    self._hours.append(hour)
+                else:
+                    # Late arrival for an hour we have not seen yet
+                    self._hours.insert(bisect.bisect_left(self._hours, hour), hour)
+
+            segment.add(row, size)
+            self._rows += 1
+            self._bytes += size
+            self._enforce_limits()
+        return True
+
+    def extend(self, logs: List[dict]):
+        for log in logs:
+            self.append(log)
+
+    def _oldest_retained_hour(self) -> int:
+        if not self.retention_hours:
+            return -sys.maxsize
+        return int((time.time() - self.retention_hours * 3600) // SEGMENT_SECONDS)
+
+    def _evict_oldest(self):
+        hour = self._hours.popleft()
+        segment = self._segments.pop(hour)
+        self._rows -= len(segment.rows)
+        self._bytes -= segment.bytes
+        self._evicted_segments += 1
+        self._evicted_rows += len(segment.rows)
+
+    def _enforce_limits(self):
+        cutoff = self._oldest_retained_hour()
+        while self._hours and self._hours[0] < cutoff:
+            self._evict_oldest()
+        # Never evict the segment currently being written by size alone
+        while self.max_bytes and self._bytes > self.max_bytes and len(self._hours) > 1:
+            self._evict_oldest()
+
+    def enforce_retention(self):
+        """Evict expired segments (also done on every append)"""
+        with self._lock:
+            self._enforce_limits()
+
+    def clear(self):
+        with self._lock:
+            self._segments = {}
+            self._hours = deque()
+            self._rows = 0
+            self._bytes = 0
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _segments_between(self, start: Optional[float], end: Optional[float]) -> List[LogSegment]:
+        with self._lock:
+            return [self._segments[hour] for hour in self._hours
+                    if (start is None or (hour + 1) * SEGMENT_SECONDS > start)
+                    and (end is None or hour * SEGMENT_SECONDS <= end)]
+
+    def snapshot(self) -> List[Tuple[LogSegment, int]]:
+        """(segment, row_count) for every retained segment, newest first"""
+        with self._lock:
+            return [(self._segments[hour], len(self._segments[hour].rows))
+                    for hour in reversed(self._hours)]
+
+    def find(self, matcher: Callable[[LogSegment, int], Iterable[int]],
+             cursor: Optional[Tuple[int, int]] = None,
+             limit: int = 50) -> Tuple[List[dict], Optional[Tuple[int, int]]]:
+        """
+        Page through the logs picked by matcher(segment, row_count), which
+        returns row offsets below row_count. Logs come newest segment first,
+        latest row first. cursor is the (hour, offset) of the last log of
+        the previous page; the returned cursor is None on the last page.
+        """
+        logs: List[dict] = []
+        last = None
+        for segment, row_count in self.snapshot():
+            if cursor is not None:
+                if segment.hour > cursor[0]:
+                    continue
+                if segment.hour == cursor[0]:
+                    row_count = min(row_count, cursor[1])
+            for offset in sorted(set(matcher(segment, row_count)), reverse=True):
+                if len(logs) == limit:
+                    return logs, last
+                logs.append(segment.log(offset))
+                last = (segment.hour, offset)
+        return logs, None
+
+    def scan(self, start=None, end=None, source_ip: Optional[str] = None,
+             destination_ip: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yield logs with start <= event time <= end (either bound optional;
+        ISO strings, epoch seconds or datetimes). Only overlapping segments
+        are read; rows are decoded lazily. With an IP filter only the rows
+        posted under that IP in each segment's ip_index are visited.
+        """
+        start_epoch = parse_timestamp(start) if start is not None else None
+        end_epoch = parse_timestamp(end) if end is not None else None
+        for segment in self._segments_between(start_epoch, end_epoch):
+            whole = ((start_epoch is None or segment.start >= start_epoch)
+                     and (end_epoch is None or segment.end <= end_epoch))
+            rows = segment.rows
+            # Snapshot the length so concurrent appends do not extend the scan
+            row_count = len(rows)
+            if source_ip or destination_ip:
+                postings = segment.ip_index.get(source_ip or destination_ip, ())
+                offsets = [offset for offset in postings if offset < row_count]
+            else:
+                offsets = range(row_count)
+            for index in offsets:
+                row = rows[index]
+                if source_ip and row[_SOURCE_IP] != source_ip:
+                    continue
+                if destination_ip and row[_DESTINATION_IP] != destination_ip:
+                    continue
+                if whole or ((start_epoch is None or row[_EPOCH] >= start_epoch)
+                             and (end_epoch is None or row[_EPOCH] <= end_epoch)):
+                    yield self._decode(row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._hours),
+                "rows": self._rows,
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "retention_hours": self.retention_hours,
+                "oldest_segment": datetime.fromtimestamp(self._hours[0] * SEGMENT_SECONDS).isoformat() if self._hours else None,
+                "newest_segment": datetime.fromtimestamp(self._hours[-1] * SEGMENT_SECONDS).isoformat() if self._hours else None,
+                "evicted_segments": self._evicted_segments,
+                "evicted_rows": self._evicted_rows,
+                "expired_on_arrival": self._expired_on_arrival
+            }
@@ -0,0 +1,174 @@
+"""
+OPSEC PERSIST - Durable IoC / Incident / Feed Store
+===================================================
+SQLite (WAL mode) backing store for the in-memory OPSEC databases, so a
+restart can warm-start the correlation indexes instead of re-ingesting
+every CTI feed.
+
+Features:
+- Write-behind: mutations only mark keys dirty; a flusher thread writes
+  them in one transaction per interval
+- WAL journal with periodic checkpoint/compaction into the main file
+- Bulk load of every table at startup
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+
+TABLES = ("iocs", "incidents", "feeds")
+
+
+class OpsecStore:
+    """
+    Durable key -> JSON document store with one table per OPSEC database.
+    Callers mark keys dirty; flush() pulls the current document for each
+    dirty key through a loader and upserts it (or deletes it if gone).
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0, checkpoint_interval: float = 300.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty: Dict[str, Set[str]] = {table: set() for table in TABLES}
+        self._thread: Optional[threading.Thread] = None
+        self._last_checkpoint = time.monotonic()
+        self.stats = {
+            "flushes": 0,
+            "rows_written": 0,
+            "rows_deleted": 0,
+            "checkpoints": 0,
+            "last_flush": None,
+            "last_flush_seconds": 0.0,
+            "loaded_rows": 0,
+            "load_seconds": 0.0
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for table in TABLES:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    def mark(self, table: str, key: str):
+        """Record that key changed (or was deleted) in table"""
+        with self._lock:
+            self._dirty[table].add(key)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(keys) for keys in self._dirty.values())
+
+    def flush(self, loaders: Dict[str, Callable[[str], Optional[str]]]) -> Tuple[int, int]:
+        """
+        Persist every dirty key. loaders[table](key) returns the current
+        document (serialised while the caller's own lock is held) or None
+        if it was deleted. Returns (written, deleted).
+        """
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = {table: set() for table in TABLES}
+        if not any(dirty.values()):
+            return 0, 0
+
+        started = time.monotonic()
+        written = deleted = 0
+        with self._write_lock:
+            with self._conn:
+                for table, keys in dirty.items():
+                    upserts = []
+                    removals = []
+                    for key in keys:
+                        document = loaders[table](key)
+                        if document is None:
+                            removals.append((key,))
+                        else:
+                            upserts.append((key, document))
+                    if upserts:
+                        self._conn.executemany(
+                            f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)", upserts)
+                    if removals:
+                        self._conn.executemany(f"DELETE FROM {table} WHERE id = ?", removals)
+                    written += len(upserts)
+                    deleted += len(removals)
+
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += written
+        self.stats["rows_deleted"] += deleted
+        self.stats["last_flush"] = time.time()
+        self.stats["last_flush_seconds"] = round(time.monotonic() - started, 4)
+        return written, deleted
+
+    def checkpoint(self):
+        """Fold the WAL back into the main database file and truncate it"""
+        with self._write_lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._last_checkpoint = time.monotonic()
+        self.stats["checkpoints"] += 1
+
+    def compact(self):
+        """Rewrite the database without free pages, then truncate the WAL"""
+        with self._write_lock:
+            self._conn.execute("VACUUM")
+        self.checkpoint()
+
+    def start(self, loaders: Dict[str, Callable[[str], Optional[str]]]):
+        """Start the background flusher (idempotent)"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush(loaders)
+                    if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                        self.checkpoint()
+                except Exception as e:
+                    print(f"[OPSEC] Persist flush failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="opsec-persist", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Warm start
+    # ------------------------------------------------------------------
+
+    def load(self, table: str) -> Iterator[dict]:
+        """Stream every stored document of a table"""
+        started = time.monotonic()
+        count = 0
+        cursor = self._conn.execute(f"SELECT data FROM {table}")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for (data,) in rows:
+                count += 1
+                yield json.loads(data)
+        self.stats["loaded_rows"] += count
+        self.stats["load_seconds"] += round(time.monotonic() - started, 4)
+
+    def info(self) -> dict:
+        wal_path = self.path + "-wal"
+        return {
+            "path": self.path,
+            "pending": self.pending(),
+            "db_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            "flush_interval_seconds": self.flush_interval,
+            **self.stats
+        }
@@ -0,0 +1,198 @@
+"""
+OPSEC PIPELINE - Asynchronous Correlation Workers
+=================================================
+Decouples log ingest from IoC correlation with a bounded in-process queue
+drained by a pool of worker threads.
+
+Features:
+- Bounded queue sized in log entries (atomic all-or-nothing batch submit)
+- Backpressure: reject immediately or block up to a timeout
+- Configurable worker pool, started lazily on first submit
+- Queue depth, lag and worker utilisation metrics
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+
+class PipelineFull(Exception):
+    """Raised when a batch does not fit in the queue within the allowed wait"""
+
+
+class CorrelationPipeline:
+    """
+    Bounded work queue feeding `handler(item)` on a pool of daemon threads.
+    """
+
+    # Items a worker takes per lock acquisition
+    WORKER_BATCH_SIZE = 64
+
+    def __init__(self, handler: Callable[[dict], None], workers: int = 2,
+                 capacity: int = 10000, name: str = "opsec-correlation"):
+        self.handler = handler
+        self.worker_count = max(1, workers)
+        self.capacity = max(1, capacity)
+        self.name = name
+
+        self._queue: Deque[Tuple[float, dict]] = deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._in_flight = 0
+
+        self._started_at: Optional[float] = None
+        self._busy_seconds: List[float] = []
+        self._busy_since: List[Optional[float]] = []
+        self._processed = 0
+        self._rejected = 0
+        self._errors = 0
+        self._avg_wait = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker pool (idempotent)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._started_at = time.monotonic()
+            self._busy_seconds = [0.0] * self.worker_count
+            self._busy_since = [None] * self.worker_count
+            self._threads = []
+            for index in range(self.worker_count):
+                thread = threading.Thread(target=self._work, args=(index,),
+                                          name=f"{self.name}-{index}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        print(f"[OPSEC] Correlation pipeline started with {self.worker_count} workers")
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """Stop workers, optionally after the queue has been drained"""
+        if drain:
+            self.join(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted item has been processed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, items: List[dict], block: bool = False, timeout: Optional[float] = None):
+        """
+        Queue a batch atomically. Raises PipelineFull if the batch does not
+        fit (immediately when block is False, after timeout otherwise).
+        """
+        if not items:
+            return
+        if len(items) > self.capacity:
+            with self._cond:
+                self._rejected += len(items)
+            raise PipelineFull(f"batch of {len(items)} exceeds queue capacity {self.capacity}")
+
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._queue) + len(items) > self.capacity:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._rejected += len(items)
+                    raise PipelineFull(f"correlation queue full ({len(self._queue)}/{self.capacity})")
+                self._cond.wait(remaining)
+            now = time.monotonic()
+            self._queue.extend((now, item) for item in items)
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def _work(self, index: int):
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue and not self._running:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.WORKER_BATCH_SIZE, len(self._queue)))]
+                self._in_flight += len(batch)
+                # Free capacity for blocked producers
+                self._cond.notify_all()
+
+            started = time.monotonic()
+            self._busy_since[index] = started
+            errors = 0
+            wait_total = 0.0
+            for enqueued_at, item in batch:
+                wait_total += started - enqueued_at
+                try:
+                    self.handler(item)
+                except Exception as e:
+                    errors += 1
+                    print(f"[OPSEC] Correlation worker error: {e}")
+            finished = time.monotonic()
+            self._busy_since[index] = None
+
+            with self._cond:
+                self._busy_seconds[index] += finished - started
+                self._in_flight -= len(batch)
+                self._processed += len(batch)
+                self._errors += errors
+                # Exponentially weighted queue wait per item
+                self._avg_wait = 0.9 * self._avg_wait + 0.1 * (wait_total / len(batch))
+                self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> dict:
+        """Queue depth, lag and worker utilisation snapshot"""
+        now = time.monotonic()
+        with self._cond:
+            depth = len(self._queue)
+            lag = now - self._queue[0][0] if self._queue else 0.0
+            uptime = now - self._started_at if self._started_at else 0.0
+            workers = []
+            for index in range(len(self._busy_seconds)):
+                busy = self._busy_seconds[index]
+                since = self._busy_since[index]
+                if since is not None:
+                    busy += now - since
+                workers.append(round(busy / uptime, 4) if uptime else 0.0)
+
+            return {
+                "running": self._running,
+                "workers": self.worker_count,
+                "queue_depth": depth,
+                "queue_capacity": self.capacity,
+                "queue_utilisation": round(depth / self.capacity, 4),
+                "in_flight": self._in_flight,
+                "lag_seconds": round(lag, 4),
+                "avg_queue_wait_seconds": round(self._avg_wait, 4),
+                "processed": self._processed,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "worker_utilisation": workers,
+                "avg_worker_utilisation": round(sum(workers) / len(workers), 4) if workers else 0.0
+            }
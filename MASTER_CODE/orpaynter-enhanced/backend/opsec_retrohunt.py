@@ -0,0 +1,186 @@
+"""
+OPSEC RETRO-HUNT - Retroactive Correlation of New IoCs
+======================================================
+When new indicators arrive, search the logs already retained in the log
+store for them, so a freshly published IoC still fires on past activity.
+
+Features:
+- Background worker with a FIFO of hunt jobs and per-job progress
+- IP IoCs resolved through per-segment IP posting lists (no log scan)
+- CIDR IoCs matched against each segment's distinct IPs
+- Domain IoCs found with one Aho-Corasick pass per retained message
+- URL and file-hash IoCs matched through the same URL / hash indexes as
+  live correlation
+- Only logs stored before the job was queued are examined
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from opsec_index import CorrelationIndex
+from opsec_logstore import LogSegment, LogStore
+
+HUNTABLE_TYPES = ('ip', 'ip_range', 'domain', 'url', 'file_hash')
+
+
+class RetroHunter:
+    """
+    Runs hunt jobs on one daemon thread. Matches are handed to
+    on_match(log, ioc, correlation_type); get_ioc(ioc_id) returns the live
+    IoC (or None once it was removed or marked false positive).
+    """
+
+    # Finished jobs kept for progress queries
+    JOB_HISTORY = 100
+
+    def __init__(self, log_store: LogStore, get_ioc: Callable[[str], Optional[dict]],
+                 on_match: Callable[[dict, dict, str], None]):
+        self.log_store = log_store
+        self.get_ioc = get_ioc
+        self.on_match = on_match
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, iocs: List[dict]) -> Optional[str]:
+        """Queue a hunt for a batch of IoCs; returns the job id"""
+        huntable = [ioc for ioc in iocs if ioc['type'] in HUNTABLE_TYPES]
+        if not huntable:
+            return None
+        job_id = str(uuid.uuid4())[:8]
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "ioc_count": len(huntable),
+            "segments_total": 0,
+            "segments_done": 0,
+            "logs_examined": 0,
+            "matches": 0,
+            "queued_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_seconds": None,
+            "error": None
+        }
+        # Freeze the log window now so logs arriving later (which the live
+        # path correlates) are not counted twice
+        snapshot = self.log_store.snapshot()
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        self._queue.put((job_id, huntable, snapshot))
+        self._ensure_worker()
+        return job_id
+
+    def job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self) -> List[dict]:
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="opsec-retrohunt", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            job_id, iocs, snapshot = self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat()
+            started = time.monotonic()
+            try:
+                self._hunt(job, iocs, snapshot)
+                job["status"] = "completed"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                print(f"[OPSEC] Retro-hunt {job_id} failed: {e}")
+            job["finished_at"] = datetime.now().isoformat()
+            job["duration_seconds"] = round(time.monotonic() - started, 3)
+
+    def _hunt(self, job: dict, iocs: List[dict], snapshot: list):
+        index = build_hunt_index(iocs)
+        job["segments_total"] = len(snapshot)
+        for segment, row_count in snapshot:
+            hits, examined = match_segment(index, segment, row_count)
+            job["logs_examined"] += examined
+
+            for (offset, ioc_id), correlation_type in sorted(hits.items()):
+                ioc = self.get_ioc(ioc_id)
+                if ioc is None:
+                    continue
+                self.on_match(segment.log(offset), ioc, correlation_type)
+                job["matches"] += 1
+
+            job["segments_done"] += 1
+
+
+def build_hunt_index(iocs: Iterable[dict]) -> CorrelationIndex:
+    """
+    A throwaway index over just these IoCs; no Bloom filter needed. Built in
+    one rebuild() so the automaton is ready at once and no background
+    rebuild timer is armed.
+    """
+    index = CorrelationIndex(bloom_fp_rate=0)
+    index.rebuild(iocs)
+    return index
+
+
+def match_segment(index: CorrelationIndex, segment: LogSegment,
+                  row_count: int) -> Tuple[Dict[Tuple[int, str], str], int]:
+    """
+    Correlate the first row_count rows of a log segment against index.
+    Returns ({(offset, ioc_id): correlation_type}, rows_examined).
+    """
+    stats = index.stats()
+    has_ranges = stats["ip_range_prefixes"] > 0
+    has_domains = stats["domain_indicators"] > 0
+    # URL / hash IoCs may match log metadata, so those rows are decoded
+    has_log_iocs = stats["url_indicators"] > 0 or stats["hash_indicators"] > 0
+    hits: Dict[Tuple[int, str], str] = {}
+
+    for ip in index.indicator_ips():
+        ioc_id = index.lookup_ip(ip)
+        for offset in segment.ip_index.get(ip, ()):
+            if offset < row_count:
+                hits.setdefault((offset, ioc_id), "ip_match")
+
+    if has_ranges:
+        for ip, offsets in list(segment.ip_index.items()):
+            if index.lookup_ip(ip):
+                continue
+            ioc_id = index.lookup_ip_range(ip)
+            if ioc_id:
+                for offset in offsets:
+                    if offset < row_count:
+                        hits.setdefault((offset, ioc_id), "cidr_match")
+
+    if not (has_domains or has_log_iocs):
+        return hits, len({offset for offset, _ in hits})
+
+    for offset in range(row_count):
+        if has_domains:
+            for ioc_id in index.match_domains(segment.message(offset)):
+                hits.setdefault((offset, ioc_id), "domain_match")
+        if has_log_iocs:
+            log = segment.log(offset)
+            for ioc_id in index.match_urls(log):
+                hits.setdefault((offset, ioc_id), "url_match")
+            for ioc_id in index.match_hashes(log):
+                hits.setdefault((offset, ioc_id), "hash_match")
+    return hits, row_count
@@ -0,0 +1,249 @@
+"""
+OPSEC RULES - Sliding-Window Threshold Correlation
+==================================================
+Streaming rule engine for detections that no single log can trigger, e.g.
+"5+ hits on high severity IoCs from one source within 5 minutes" or
+"one destination contacted by 20+ distinct sources".
+
+Features:
+- Per-rule, per-key sliding windows over event time
+- Event counts or distinct-value counts (e.g. distinct source IPs)
+- Bounded memory: at most `threshold` entries per key, `max_keys` keys per
+  rule, and keys idle for longer than the window are evicted (oldest
+  last-seen event time first, so late events cannot shield idle keys)
+- Cooldown of one window after a rule fires for a key
+"""
+
+import heapq
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SEVERITY_RANK = {"info": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+RULE_DEFAULTS = {
+    "distinct": None,
+    "min_ioc_severity": None,
+    "severity": "high",
+    "max_keys": 100000,
+    "enabled": True
+}
+
+RULE_FIELDS = ("source_ip", "destination_ip", "source_system", "action")
+
+
+def validate_rule(rule: dict) -> dict:
+    """Fill defaults and check a rule definition; raises ValueError"""
+    rule = {**RULE_DEFAULTS, **rule}
+    for field in ("rule_id", "name", "group_by", "threshold", "window_seconds"):
+        if rule.get(field) in (None, ""):
+            raise ValueError(f"{field} is required")
+    if rule["group_by"] not in RULE_FIELDS:
+        raise ValueError(f"group_by must be one of {', '.join(RULE_FIELDS)}")
+    if rule["distinct"] is not None and rule["distinct"] not in RULE_FIELDS:
+        raise ValueError(f"distinct must be one of {', '.join(RULE_FIELDS)}")
+    for field in ("min_ioc_severity", "severity"):
+        if rule[field] is not None and rule[field] not in SEVERITY_RANK:
+            raise ValueError(f"{field} must be one of {', '.join(SEVERITY_RANK)}")
+    rule["threshold"] = int(rule["threshold"])
+    rule["window_seconds"] = float(rule["window_seconds"])
+    rule["max_keys"] = int(rule["max_keys"])
+    if rule["threshold"] < 1 or rule["window_seconds"] <= 0 or rule["max_keys"] < 1:
+        raise ValueError("threshold, window_seconds and max_keys must be positive")
+    return rule
+
+
+class _KeyWindow:
+    """Sliding window state for one rule key"""
+
+    __slots__ = ('events', 'last_seen', 'fired_at')
+
+    def __init__(self, distinct: bool, threshold: int):
+        # Counting rules keep the newest `threshold` event times; distinct
+        # rules keep value -> last time for the newest `threshold` values
+        self.events = OrderedDict() if distinct else deque(maxlen=threshold)
+        self.last_seen = 0.0
+        self.fired_at: Optional[float] = None
+
+
+class ThresholdRule:
+    """
+    One compiled rule. observe() records an event and returns the evidence
+    dict when the threshold is reached inside the window, else None.
+    """
+
+    def __init__(self, definition: dict):
+        self.definition = validate_rule(definition)
+        self.rule_id = self.definition["rule_id"]
+        self.group_by = self.definition["group_by"]
+        self.distinct = self.definition["distinct"]
+        self.threshold = self.definition["threshold"]
+        self.window = self.definition["window_seconds"]
+        self.max_keys = self.definition["max_keys"]
+        min_severity = self.definition["min_ioc_severity"]
+        self.min_rank = SEVERITY_RANK[min_severity] if min_severity else None
+        self.enabled = self.definition["enabled"]
+
+        self._keys: Dict[str, _KeyWindow] = {}
+        # (last_seen, key) min-heap; entries whose time no longer matches the
+        # key's last_seen are stale and skipped when popped
+        self._idle_heap: List[Tuple[float, str]] = []
+        self._watermark = 0.0
+        self.fired = 0
+        self.evicted_keys = 0
+
+    def observe(self, log: dict, epoch: float, ioc_rank: Optional[int]) -> Optional[dict]:
+        if self.min_rank is not None and (ioc_rank is None or ioc_rank < self.min_rank):
+            return None
+        key = log.get(self.group_by)
+        if not key:
+            return None
+        value = None
+        if self.distinct:
+            value = log.get(self.distinct)
+            if not value:
+                return None
+
+        if epoch > self._watermark:
+            self._watermark = epoch
+        self._evict_idle()
+
+        keys = self._keys
+        state = keys.get(key)
+        is_new = state is None
+        if is_new:
+            if len(keys) >= self.max_keys:
+                self._pop_oldest(None)
+            state = _KeyWindow(self.distinct is not None, self.threshold)
+            keys[key] = state
+        # Late events count as arriving with the key's newest event
+        if epoch < state.last_seen:
+            epoch = state.last_seen
+        if is_new or epoch != state.last_seen:
+            state.last_seen = epoch
+            self._push_idle(key, epoch)
+
+        events = state.events
+        if value is None:
+            events.append(epoch)
+            oldest = events[0]
+            count = len(events)
+        else:
+            if value in events:
+                events.move_to_end(value)
+            events[value] = epoch
+            if len(events) > self.threshold:
+                events.popitem(last=False)
+            oldest = next(iter(events.values()))
+            count = len(events)
+
+        if count < self.threshold or epoch - oldest > self.window:
+            return None
+        if state.fired_at is not None and epoch - state.fired_at <= self.window:
+            return None
+
+        state.fired_at = epoch
+        self.fired += 1
+        evidence = {
+            "rule_id": self.rule_id,
+            "group_by": self.group_by,
+            "key": key,
+            "count": count,
+            "window_seconds": self.window,
+            "window_start": oldest,
+            "window_end": epoch
+        }
+        if value is not None:
+            evidence["distinct_values"] = list(events)
+        return evidence
+
+    def _push_idle(self, key: str, last_seen: float):
+        heap = self._idle_heap
+        heapq.heappush(heap, (last_seen, key))
+        if len(heap) > 2 * len(self._keys) + 64:
+            heap[:] = [(state.last_seen, k) for k, state in self._keys.items()]
+            heapq.heapify(heap)
+
+    def _pop_oldest(self, horizon: Optional[float]) -> bool:
+        """Drop the key with the oldest last_seen (only if before horizon)"""
+        heap, keys = self._idle_heap, self._keys
+        while heap:
+            last_seen, key = heap[0]
+            if horizon is not None and last_seen >= horizon:
+                return False
+            heapq.heappop(heap)
+            state = keys.get(key)
+            if state is not None and state.last_seen == last_seen:
+                del keys[key]
+                self.evicted_keys += 1
+                return True
+        return False
+
+    def _evict_idle(self):
+        horizon = self._watermark - self.window
+        while self._pop_oldest(horizon):
+            pass
+
+    def stats(self) -> dict:
+        return {
+            **self.definition,
+            "enabled": self.enabled,
+            "tracked_keys": len(self._keys),
+            "evicted_keys": self.evicted_keys,
+            "fired": self.fired
+        }
+
+
+class RuleEngine:
+    """
+    Holds the active threshold rules and evaluates every ingested log
+    against them. on_fire(rule_definition, evidence, log) is called outside
+    the engine lock for each rule that trips.
+    """
+
+    def __init__(self, rules: Iterable[dict], on_fire: Callable[[dict, dict, dict], None]):
+        self.on_fire = on_fire
+        self._lock = threading.Lock()
+        self._rules: Dict[str, ThresholdRule] = {}
+        self.observed = 0
+        for rule in rules:
+            self.upsert(rule)
+
+    def upsert(self, definition: dict) -> dict:
+        """Add or replace a rule (its window state is reset)"""
+        rule = ThresholdRule(definition)
+        with self._lock:
+            self._rules[rule.rule_id] = rule
+        return rule.definition
+
+    def set_enabled(self, rule_id: str, enabled: bool) -> bool:
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            if rule is None:
+                return False
+            rule.enabled = enabled
+            return True
+
+    def observe(self, log: dict, epoch: float, ioc_severities: Iterable[str] = ()) -> List[dict]:
+        """Feed one log (with the severities of the IoCs it matched)"""
+        ioc_rank = max((SEVERITY_RANK.get(s, 0) for s in ioc_severities), default=None)
+        fired = []
+        with self._lock:
+            self.observed += 1
+            for rule in self._rules.values():
+                if rule.enabled:
+                    evidence = rule.observe(log, epoch, ioc_rank)
+                    if evidence:
+                        fired.append((rule.definition, evidence))
+        for definition, evidence in fired:
+            self.on_fire(definition, evidence, log)
+        return [evidence for _, evidence in fired]
+
+    def rules(self) -> List[dict]:
+        with self._lock:
+            return [rule.stats() for rule in self._rules.values()]
+
+    def get(self, rule_id: str) -> Optional[dict]:
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            return rule.stats() if rule else None
@@ -0,0 +1,349 @@
+"""
+OPSEC SHARD - Multi-Process Correlation Workers
+===============================================
+Moves IoC matching off the GIL: logs are sharded by source IP across a
+pool of worker processes, each holding its own replica of the correlation
+indexes, and matches are merged back into the parent in submission order.
+
+Features:
+- Stable shard assignment (CRC32 of source_ip), so one source always lands
+  on the same worker
+- Replicas built from an IoC snapshot at start (inherited copy-on-write
+  with the fork start method) and kept current by broadcast add/remove ops.
+  start() should run before the server starts other threads, since forking
+  a multithreaded process can inherit locks held mid-operation
+- A dead worker restarts the pool from a fresh snapshot; in-flight logs are
+  resent once, then released unmatched
+- Only the fields correlation reads are shipped to workers, in batches;
+  only matches come back
+- Deterministic merge: handler(log, matches) runs on one thread in exact
+  submission order, so incidents are identical to serial correlation
+- Same submit/backpressure/metrics surface as CorrelationPipeline
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from opsec_index import CorrelationIndex
+from opsec_pipeline import PipelineFull
+
+Matches = List[Tuple[str, str]]
+
+
+def shard_of(source_ip: Optional[str], shards: int) -> int:
+    """Stable across processes and restarts (unlike hash())"""
+    return zlib.crc32((source_ip or '').encode()) % shards
+
+
+def _shard_main(shard: int, iocs: List[dict], inbox, results):
+    """Worker process: apply IoC ops and correlate log batches in order"""
+    index = CorrelationIndex(bloom_fp_rate=0)
+    index.rebuild(iocs)
+    del iocs
+    while True:
+        message = inbox.get()
+        if message is None:
+            return
+        kind, payload = message
+        if kind == "add":
+            index.add(payload)
+        elif kind == "remove":
+            index.remove(payload)
+        elif kind == "logs":
+            found = []
+            errors = 0
+            for seq, source_ip, destination_ip, text, metadata in payload:
+                try:
+                    matches = index.match({"source_ip": source_ip, "destination_ip": destination_ip,
+                                           "message": text, "metadata": metadata})
+                except Exception:
+                    errors += 1
+                    continue
+                if matches:
+                    found.append((seq, matches))
+            results.put((shard, payload[-1][0], len(payload), found, errors))
+
+
+class ShardedCorrelator:
+    """
+    Process-pool counterpart of CorrelationPipeline. snapshot() returns the
+    IoCs to seed worker replicas with; update() forwards later changes.
+    """
+
+    # Logs per message sent to a worker
+    SEND_BATCH = 256
+    # Seconds between worker liveness checks while results are quiet
+    LIVENESS_INTERVAL = 1.0
+
+    def __init__(self, handler: Callable[[dict, Matches], None], snapshot: Callable[[], List[dict]],
+                 workers: int = 4, capacity: int = 10000, name: str = "opsec-shard"):
+        self.handler = handler
+        self.snapshot = snapshot
+        self.worker_count = max(1, workers)
+        self.capacity = max(1, capacity)
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._context = None
+        self._processes: list = []
+        self._inboxes: list = []
+        self._results = None
+        self._collector: Optional[threading.Thread] = None
+        # Per shard: [chunk, attempts] sent but not yet reported, in send order
+        self._inflight: List[deque] = []
+        self._restarts = 0
+
+        self._next_seq = 0
+        self._released = 0
+        self._pending: Dict[int, Tuple[float, dict]] = {}
+        self._matches: Dict[int, Matches] = {}
+        self._outstanding: List[int] = []
+        self._done: List[int] = []
+
+        self._started_at: Optional[float] = None
+        self._processed = 0
+        self._rejected = 0
+        self._errors = 0
+        self._avg_latency = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Fork the worker pool (idempotent)"""
+        with self._cond:
+            if self._running:
+                return
+            methods = multiprocessing.get_all_start_methods()
+            self._context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+            iocs = list(self.snapshot())
+            self._start_workers(iocs)
+            self._outstanding = [0] * self.worker_count
+            self._done = [-1] * self.worker_count
+            self._inflight = [deque() for _ in range(self.worker_count)]
+            self._running = True
+            self._started_at = time.monotonic()
+            self._collector = threading.Thread(target=self._collect, name=f"{self.name}-collector", daemon=True)
+            self._collector.start()
+        print(f"[OPSEC] Sharded correlation started with {self.worker_count} worker processes "
+              f"({len(iocs)} IoCs per replica)")
+
+    def _start_workers(self, iocs: List[dict]):
+        """Fresh queues and worker processes; caller holds the lock"""
+        context = self._context
+        self._results = context.Queue()
+        self._inboxes = [context.Queue() for _ in range(self.worker_count)]
+        self._processes = []
+        for shard in range(self.worker_count):
+            process = context.Process(target=_shard_main, name=f"{self.name}-{shard}",
+                                      args=(shard, iocs, self._inboxes[shard], self._results),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """Stop the worker processes, optionally after draining"""
+        if drain:
+            self.join(timeout)
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            for inbox in self._inboxes:
+                inbox.put(None)
+            processes = self._processes
+            self._processes = []
+            self._results.put(None)
+        for process in processes:
+            process.join(timeout)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted log has been handled"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def update(self, op: str, ioc: dict):
+        """Forward an IoC 'add' / 'remove' to every replica (no-op before start)"""
+        with self._cond:
+            if self._running:
+                for inbox in self._inboxes:
+                    inbox.put((op, ioc))
+
+    def submit(self, items: List[dict], block: bool = False, timeout: Optional[float] = None):
+        """
+        Shard and queue a batch atomically. Raises PipelineFull if the
+        batch does not fit (immediately when block is False, after timeout
+        otherwise).
+        """
+        if not items:
+            return
+        if len(items) > self.capacity:
+            with self._cond:
+                self._rejected += len(items)
+            raise PipelineFull(f"batch of {len(items)} exceeds queue capacity {self.capacity}")
+
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._pending) + len(items) > self.capacity:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._rejected += len(items)
+                    raise PipelineFull(f"correlation queue full ({len(self._pending)}/{self.capacity})")
+                self._cond.wait(remaining)
+
+            now = time.monotonic()
+            batches: List[list] = [[] for _ in range(self.worker_count)]
+            for log in items:
+                seq = self._next_seq
+                self._next_seq += 1
+                self._pending[seq] = (now, log)
+                source_ip = log.get('source_ip')
+                batches[shard_of(source_ip, self.worker_count)].append(
+                    (seq, source_ip, log.get('destination_ip'), log.get('message'), log.get('metadata')))
+            for shard, batch in enumerate(batches):
+                for start in range(0, len(batch), self.SEND_BATCH):
+                    chunk = batch[start:start + self.SEND_BATCH]
+                    self._outstanding[shard] += len(chunk)
+                    self._inflight[shard].append([chunk, 1])
+                    self._inboxes[shard].put(("logs", chunk))
+
+    # ------------------------------------------------------------------
+    # Merge
+    # ------------------------------------------------------------------
+
+    def _collect(self):
+        checked_at = time.monotonic()
+        while True:
+            try:
+                # Re-read each time: a pool restart replaces the queue
+                message = self._results.get(timeout=self.LIVENESS_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            with self._cond:
+                if message:
+                    shard, last_seq, count, found, errors = message
+                    self._inflight[shard].popleft()
+                    self._done[shard] = last_seq
+                    self._outstanding[shard] -= count
+                    self._errors += errors
+                    for seq, matches in found:
+                        self._matches[seq] = matches
+                if not message or time.monotonic() - checked_at >= self.LIVENESS_INTERVAL:
+                    checked_at = time.monotonic()
+                    self._restart_if_dead()
+                ready = self._release()
+
+            now = time.monotonic()
+            latency = 0.0
+            for queued_at, log, matches in ready:
+                latency += now - queued_at
+                try:
+                    self.handler(log, matches)
+                except Exception as e:
+                    self._errors += 1
+                    print(f"[OPSEC] Correlation merge error: {e}")
+
+            with self._cond:
+                if ready:
+                    self._processed += len(ready)
+                    self._avg_latency = 0.9 * self._avg_latency + 0.1 * (latency / len(ready))
+                    for _ in ready:
+                        del self._pending[self._released]
+                        self._released += 1
+                self._cond.notify_all()
+
+    def _restart_if_dead(self):
+        """
+        Replace the whole pool when a worker has died; caller holds the lock.
+        A worker killed mid-write can leave the shared results queue unusable,
+        so every queue and process is recreated. In-flight logs are resent
+        once; logs that were already resent are released unmatched.
+        """
+        if not self._running:
+            return
+        dead = [process for process in self._processes if not process.is_alive()]
+        if not dead:
+            return
+        for process in dead:
+            print(f"[OPSEC] Correlation worker {process.name} died (exit code {process.exitcode}); restarting pool")
+        self._restarts += 1
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(5)
+        for stale in [self._results] + self._inboxes:
+            stale.cancel_join_thread()
+            stale.close()
+        self._start_workers(list(self.snapshot()))
+        for shard, inflight in enumerate(self._inflight):
+            for entry in list(inflight):
+                chunk, attempts = entry
+                if attempts > 1:
+                    inflight.remove(entry)
+                    self._outstanding[shard] -= len(chunk)
+                    self._done[shard] = chunk[-1][0]
+                    self._errors += len(chunk)
+                else:
+                    entry[1] += 1
+                    self._inboxes[shard].put(("logs", chunk))
+
+    def _release(self) -> List[Tuple[float, dict, Matches]]:
+        """Logs every shard has finished with, in submission order"""
+        # A shard with work in flight has handled everything up to its
+        # last reported seq; an idle shard has handled all it was given.
+        safe = self._next_seq - 1
+        for shard in range(self.worker_count):
+            if self._outstanding[shard]:
+                safe = min(safe, self._done[shard])
+        ready = []
+        seq = self._released
+        while seq <= safe:
+            queued_at, log = self._pending[seq]
+            ready.append((queued_at, log, self._matches.pop(seq, [])))
+            seq += 1
+        return ready
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> dict:
+        with self._cond:
+            depth = len(self._pending)
+            oldest = self._pending.get(self._released)
+            return {
+                "running": self._running,
+                "workers": self.worker_count,
+                "alive_workers": sum(1 for process in self._processes if process.is_alive()),
+                "worker_restarts": self._restarts,
+                "queue_depth": depth,
+                "queue_capacity": self.capacity,
+                "queue_utilisation": round(depth / self.capacity, 4),
+                "shard_backlog": list(self._outstanding),
+                "lag_seconds": round(time.monotonic() - oldest[0], 4) if oldest else 0.0,
+                "avg_merge_latency_seconds": round(self._avg_latency, 4),
+                "processed": self._processed,
+                "rejected": self._rejected,
+                "errors": self._errors
+            }
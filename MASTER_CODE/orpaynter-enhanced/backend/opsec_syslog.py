@@ -0,0 +1,347 @@
+"""
+OPSEC SYSLOG - Asyncio Syslog Intake
+====================================
+Optional UDP / TCP syslog listener that feeds parsed records straight into
+OPSEC log ingest, skipping the per-message cost of JSON POSTs.
+
+Features:
+- RFC 5424 and RFC 3164 (BSD) parsing, with a raw-message fallback
+- TCP with LF-delimited or octet-counted framing (RFC 6587)
+- Records batched by size or flush interval before reaching the sink
+- Runs its own event loop on a daemon thread next to Flask; the sink runs
+  on a separate thread behind a bounded batch queue, so a slow sink never
+  stalls intake
+
+Usage (stand-alone, prints parsed batches):
+    python opsec_syslog.py --udp-port 5514 --tcp-port 5514
+    logger -n 127.0.0.1 -P 5514 -d "src=10.0.0.5 dst=203.0.113.9 denied"
+"""
+
+import argparse
+import asyncio
+import json
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+# Largest record accepted on either transport
+MAX_MESSAGE_BYTES = 64 * 1024
+
+RFC5424 = re.compile(
+    r'^<(?P<pri>\d{1,3})>1 (?P<timestamp>\S+) (?P<host>\S+) (?P<app>\S+) (?P<procid>\S+) (?P<msgid>\S+) '
+    r'(?P<sd>-|(?:\[(?:[^\]\\]|\\.)*\])+)(?: (?P<message>.*))?$', re.DOTALL)
+RFC3164 = re.compile(
+    r'^<(?P<pri>\d{1,3})>(?P<timestamp>[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (?P<host>\S+) '
+    r'(?:(?P<app>[^:\[\s]+)(?:\[(?P<procid>[^\]]*)\])?: ?)?(?P<message>.*)$', re.DOTALL)
+PRI_ONLY = re.compile(r'^<(?P<pri>\d{1,3})>(?P<message>.*)$', re.DOTALL)
+SD_ELEMENT = re.compile(r'\[(?P<id>[^\s\]]+)(?P<params>(?:[^\]\\]|\\.)*)\]')
+SD_PARAM = re.compile(r'(?P<name>[^\s=]+)="(?P<value>(?:[^"\\]|\\.)*)"')
+# Firewall-style key=value fields mapped onto the OPSEC log schema
+KV_FIELDS = re.compile(r'\b(?P<key>src|dst|src_ip|dst_ip|srcip|dstip|action)=(?P<value>"[^"]*"|[^\s,;]+)',
+                       re.IGNORECASE)
+KV_TARGETS = {"src": "source_ip", "src_ip": "source_ip", "srcip": "source_ip",
+              "dst": "destination_ip", "dst_ip": "destination_ip", "dstip": "destination_ip",
+              "action": "action"}
+
+
+def _nil(value: Optional[str]) -> Optional[str]:
+    return None if value in (None, '-') else value
+
+
+def parse_structured_data(sd: str) -> dict:
+    """RFC 5424 STRUCTURED-DATA -> {sd_id: {param: value}}"""
+    elements = {}
+    for element in SD_ELEMENT.finditer(sd):
+        elements[element.group('id')] = {
+            param.group('name'): re.sub(r'\\(["\\\]])', r'\1', param.group('value'))
+            for param in SD_PARAM.finditer(element.group('params'))
+        }
+    return elements
+
+
+def parse_bsd_timestamp(value: str, now: Optional[datetime] = None) -> str:
+    """RFC 3164 'Mmm dd hh:mm:ss' has no year; pick the one nearest now"""
+    now = now or datetime.now()
+    try:
+        parsed = datetime.strptime(f"{now.year} {value}", "%Y %b %d %H:%M:%S")
+    except ValueError:
+        return now.isoformat()
+    if parsed - now > timedelta(days=1):
+        parsed = parsed.replace(year=now.year - 1)
+    return parsed.isoformat()
+
+
+def parse_syslog(line: str, sender: Optional[str] = None) -> dict:
+    """
+    Parse one syslog record into an OPSEC log entry (the shape accepted by
+    /logs/ingest). Unrecognised input is kept whole as the message.
+    """
+    line = line.lstrip('\ufeff').rstrip('\r\n')
+    syslog = {"sender": sender}
+    structured = None
+
+    match = RFC5424.match(line)
+    if match:
+        timestamp = _nil(match.group('timestamp')) or datetime.now().isoformat()
+        structured = parse_structured_data(match.group('sd')) if match.group('sd') != '-' else None
+        message = (match.group('message') or '').lstrip('\ufeff')
+        syslog.update(format="rfc5424", host=_nil(match.group('host')), app=_nil(match.group('app')),
+                      procid=_nil(match.group('procid')), msgid=_nil(match.group('msgid')))
+    else:
+        match = RFC3164.match(line)
+        if match:
+            timestamp = parse_bsd_timestamp(match.group('timestamp'))
+            message = match.group('message')
+            syslog.update(format="rfc3164", host=match.group('host'), app=match.group('app'),
+                          procid=match.group('procid'))
+        else:
+            match = PRI_ONLY.match(line)
+            timestamp = datetime.now().isoformat()
+            message = match.group('message') if match else line
+            syslog["format"] = "raw"
+
+    if match and match.group('pri') is not None:
+        pri = int(match.group('pri'))
+        syslog.update(facility=pri >> 3, severity=pri & 7)
+
+    entry = {"timestamp": timestamp, "message": message}
+    for field in KV_FIELDS.finditer(message):
+        target = KV_TARGETS[field.group('key').lower()]
+        entry.setdefault(target, field.group('value').strip('"'))
+
+    metadata = {"syslog": syslog}
+    if structured:
+        metadata["structured_data"] = structured
+    entry["metadata"] = metadata
+    return entry
+
+
+class SyslogListener:
+    """
+    Listens on UDP and/or TCP and hands parsed entries to sink(entries) in
+    batches of up to batch_size, at least every flush_interval seconds.
+    The sink runs on its own thread; up to max_pending_batches wait for it
+    and further batches are dropped (and counted) rather than blocking the
+    event loop.
+    """
+
+    def __init__(self, sink: Callable[[List[dict]], None], host: str = "127.0.0.1",
+                 udp_port: Optional[int] = 5514, tcp_port: Optional[int] = 5514,
+                 batch_size: int = 500, flush_interval: float = 0.5, max_pending_batches: int = 8):
+        self.sink = sink
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._buffer: List[dict] = []
+        self._pending: "queue.Queue[Optional[List[dict]]]" = queue.Queue(max(1, max_pending_batches))
+        self._sink_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self.bound = {}
+        self.stats = {
+            "received": 0,
+            "udp_datagrams": 0,
+            "tcp_connections": 0,
+            "oversized": 0,
+            "batches": 0,
+            "flushed": 0,
+            "sink_errors": 0,
+            "dropped": 0,
+            "last_flush": None
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, timeout: float = 5.0):
+        """Bind the sockets on a background event loop (idempotent)"""
+        if self._thread is not None:
+            return
+        self._sink_thread = threading.Thread(target=self._drain, name="opsec-syslog-sink", daemon=True)
+        self._sink_thread.start()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()),
+                                        name="opsec-syslog", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._error:
+            self._thread = None
+            self._stop_sink()
+            raise self._error
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is buffered and close the sockets"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
+        self._thread = None
+        self._stop_sink(timeout)
+
+    def _stop_sink(self, timeout: float = 5.0):
+        # Blocking put: the sink drains what is queued before exiting
+        self._pending.put(None)
+        self._sink_thread.join(timeout)
+        self._sink_thread = None
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        transports = []
+        try:
+            if self.udp_port is not None:
+                transport, _ = await self._loop.create_datagram_endpoint(
+                    lambda: _SyslogDatagramProtocol(self), local_addr=(self.host, self.udp_port))
+                transports.append(transport)
+                self.bound["udp"] = transport.get_extra_info('sockname')[1]
+            if self.tcp_port is not None:
+                server = await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port)
+                transports.append(server)
+                self.bound["tcp"] = server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            for transport in transports:
+                transport.close()
+            return
+        self._ready.set()
+        print(f"[OPSEC] Syslog listener on {self.host} {self.bound}")
+
+        flusher = asyncio.ensure_future(self._flush_periodically())
+        await self._stopping.wait()
+        flusher.cancel()
+        for transport in transports:
+            transport.close()
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # Intake
+    # ------------------------------------------------------------------
+
+    def _accept(self, data: bytes, sender: Optional[str]):
+        if len(data) > MAX_MESSAGE_BYTES:
+            self.stats["oversized"] += 1
+            return
+        text = data.decode('utf-8', 'replace')
+        if not text.strip():
+            return
+        self.stats["received"] += 1
+        self._buffer.append(parse_syslog(text, sender))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["tcp_connections"] += 1
+        peer = writer.get_extra_info('peername')
+        sender = peer[0] if peer else None
+        try:
+            while True:
+                first = await reader.read(1)
+                if not first:
+                    break
+                if first.isdigit():
+                    # Octet counting: "<length> <record>"
+                    header = first + await reader.readuntil(b' ')
+                    length = int(header[:-1])
+                    if length > MAX_MESSAGE_BYTES:
+                        self.stats["oversized"] += 1
+                        break
+                    self._accept(await reader.readexactly(length), sender)
+                else:
+                    self._accept(first + await reader.readuntil(b'\n'), sender)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                self._accept(first + e.partial, sender)
+        except (asyncio.LimitOverrunError, ValueError, ConnectionError):
+            self.stats["oversized"] += 1
+        finally:
+            writer.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Queue the buffered entries for the sink thread (never blocks)"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            self._pending.put_nowait(batch)
+        except queue.Full:
+            self.stats["dropped"] += len(batch)
+
+    def _drain(self):
+        while True:
+            batch = self._pending.get()
+            if batch is None:
+                return
+            try:
+                self.sink(batch)
+            except Exception as e:
+                self.stats["sink_errors"] += 1
+                self.stats["dropped"] += len(batch)
+                print(f"[OPSEC] Syslog sink failed for {len(batch)} records: {e}")
+                continue
+            self.stats["batches"] += 1
+            self.stats["flushed"] += len(batch)
+            self.stats["last_flush"] = time.time()
+
+    def info(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "host": self.host,
+            "bound_ports": dict(self.bound),
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "buffered": len(self._buffer),
+            "pending_batches": self._pending.qsize(),
+            **self.stats
+        }
+
+
+class _SyslogDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: SyslogListener):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr):
+        self.listener.stats["udp_datagrams"] += 1
+        # Some relays pack several LF-separated records into one datagram
+        for record in data.split(b'\n'):
+            self.listener._accept(record, addr[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-alone OPSEC syslog listener (prints parsed batches)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--udp-port", type=int, default=5514)
+    parser.add_argument("--tcp-port", type=int, default=5514)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    def show(batch: List[dict]):
+        for entry in batch:
+            print(json.dumps(entry, default=str))
+
+    listener = SyslogListener(show, args.host, args.udp_port, args.tcp_port, args.batch_size, args.flush_interval)
+    listener.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()